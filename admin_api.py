@@ -0,0 +1,261 @@
+import json
+import math
+import os
+from urllib.parse import urlencode
+
+from config_cache import StaleConfigError, _thaw
+from config_patch import PatchError, item_path
+from rate_limit import limits_from_form
+from reply_rules import rules_from_form
+
+# ---------------------------
+# API للإدارة (JSON) وصفحات لوحة التحكم
+# ---------------------------
+# كل تعديل عنصر واحد يمر عبر ConfigCache.patch: سطر في config.json.journal
+# وتحديث الـ snapshot للعنصر المعني فقط، بدل إعادة بناء القوائم وكتابة
+# config.json كاملاً.
+#
+#   GET    /api/config                         الإصدار وعدد العناصر
+#   PATCH  /api/config                         {"version": 12, "ops": [...]} (config_patch.py)
+#   GET    /api/groups?q=الدعم&page=2&per_page=50
+#   GET    /api/groups/<id>
+#   POST   /api/groups                         {"id": "...", "name": "...", ...}
+#   PUT    /api/groups/<id>                    المجموعة كاملة (يمكن تغيير id)
+#   DELETE /api/groups/<id>
+#   ونفسها لـ /api/keywords (القيمة نص JSON) و/api/rules (المفتاح match)
+#
+# If-Match: <version> (أو "version" في PATCH) يرفض التعديل بـ 409 إذا تغيرت
+# الإعدادات بعدها. ADMIN_TOKEN في البيئة يفرض Authorization: Bearer <token>.
+#
+# لوحة التحكم تعرض صفحة واحدة من المجموعات والكلمات (بحث q وpage/kw_page)،
+# وform_ops يحوّل الصفوف المعروضة التي تغيرت فقط إلى تعديلات.
+
+JSON_TYPE = "application/json; charset=utf-8"
+PER_PAGE = 50
+MAX_PER_PAGE = 500
+
+VIEWS = {
+    "groups": ("allowed_groups", lambda g: f"{g.get('id', '')} {g.get('name', '')}"),
+    "keywords": ("keywords", str),
+    "rules": ("reply_rules", lambda r: f"{r.get('match', '')} {r.get('template', '')}"),
+}
+
+
+def _int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _pages(total, per_page):
+    return max(1, math.ceil(total / per_page))
+
+
+def paginate(items, q="", page=1, per_page=PER_PAGE, text=str):
+    # بحث بدون حساسية لحالة الأحرف في text(item)، ثم صفحة واحدة فقط
+    per_page = min(max(_int(per_page, PER_PAGE), 1), MAX_PER_PAGE)
+    q = (q or "").strip().casefold()
+    if q:
+        items = [item for item in items if q in text(item).casefold()]
+    pages = _pages(len(items), per_page)
+    page = min(max(_int(page, 1), 1), pages)
+    start = (page - 1) * per_page
+    return {"items": list(items[start:start + per_page]), "total": len(items),
+            "page": page, "pages": pages, "per_page": per_page}
+
+
+def _placeholder(base, taken, sep=" "):
+    # قيمة جديدة غير مستخدمة لزر الإضافة: base، base 2، base 3...
+    value, n = base, 1
+    while value in taken:
+        n += 1
+        value = f"{base}{sep}{n}"
+    return value
+
+
+def _items(snap, field):
+    if field == "allowed_groups":
+        return snap.groups.groups
+    return snap.cfg.get(field, ())
+
+
+def dashboard_view(snap, args):
+    q = (args.get("q") or "").strip()
+    return {
+        "q": q,
+        "group_page": paginate(snap.groups.groups, q, args.get("page"), args.get("per_page"),
+                               VIEWS["groups"][1]),
+        "kw_page": paginate(snap.cfg.get("keywords", ()), q, args.get("kw_page"), args.get("per_page")),
+    }
+
+
+def form_ops(form, snap):
+    # حقول اللوحة -> تعديلات للعناصر التي تغيرت فقط؛ ValueError إذا كان أحد الـ regex غير صالح
+    cfg = snap.cfg
+    ops = []
+
+    # kw_key_<i> الكلمة كما عُرضت، kw_<i> بعد التعديل
+    drop = form.get("del_kw")
+    i = 0
+    while f"kw_key_{i}" in form:
+        old = form[f"kw_key_{i}"]
+        new = form.get(f"kw_{i}", "").strip()
+        if old == drop or not new:
+            ops.append({"op": "remove", "path": item_path("keywords", old)})
+        elif new != old:
+            ops.append({"op": "replace", "path": item_path("keywords", old), "value": new})
+        i += 1
+    if "add_kw" in form:
+        # الإضافة مرة ثانية قبل تعديل الأولى لا تكرر نفس الكلمة
+        taken = set(cfg.get("keywords", ())) | {op.get("value") for op in ops}
+        ops.append({"op": "add", "path": "/keywords/-", "value": _placeholder("كلمة جديدة", taken)})
+
+    # g_key_<i> معرّف المجموعة كما عُرضت
+    drop = form.get("del_group")
+    i = 0
+    while f"g_key_{i}" in form:
+        old_id = form[f"g_key_{i}"]
+        if old_id == drop:
+            ops.append({"op": "remove", "path": item_path("allowed_groups", old_id)})
+            i += 1
+            continue
+        fields = {
+            "id": form.get(f"g_id_{i}", "").strip(),
+            "name": form.get(f"g_name_{i}", "").strip(),
+            "reply_type": form.get(f"g_type_{i}", "group"),
+            "template": form.get(f"g_tpl_{i}", "ar"),
+            "custom_reply": form.get(f"g_custom_{i}", "").strip(),
+        }
+        current = snap.groups.get(old_id)
+        if current is None or any(current.get(k, "") != v for k, v in fields.items()):
+            # حقول أخرى في المجموعة (غير موجودة في اللوحة) تبقى كما هي
+            ops.append({"op": "replace", "path": item_path("allowed_groups", old_id),
+                        "value": {**_thaw(current or {}), **fields}})
+        i += 1
+    if "add_group" in form:
+        # id مؤقت فريد (id فارغ مكرر يرفضه config_patch) حتى يُكتب المعرّف الحقيقي
+        taken = {g.get("id") for g in snap.groups.groups} | {op["value"].get("id") for op in ops
+                                                              if isinstance(op.get("value"), dict)}
+        ops.append({"op": "add", "path": "/allowed_groups/-",
+                    "value": {"id": _placeholder("new-group", taken, "-"), "name": "New Group", "reply_type": "group",
+                              "template": "ar", "custom_reply": ""}})
+
+    for name, field in (("reply_ar", "group_reply_template_ar"), ("reply_en", "group_reply_template_en")):
+        if name in form and form[name].strip() != cfg.get(field, ""):
+            ops.append({"op": "replace", "path": f"/{field}", "value": form[name].strip()})
+    if any(k.startswith("rl_") for k in form):
+        limits = limits_from_form(form)
+        if limits != _thaw(cfg.get("rate_limits", {})):
+            ops.append({"op": "replace", "path": "/rate_limits", "value": limits})
+    if "rule_match_0" in form or "add_rule" in form:
+        rules = rules_from_form(form)
+        if rules != _thaw(cfg.get("reply_rules", ())):
+            ops.append({"op": "replace", "path": "/reply_rules", "value": rules})
+    return ops
+
+
+def return_query(form, snap):
+    # نفس البحث والصفحة بعد الحفظ؛ بعد الإضافة الصفحة الأخيرة حيث العنصر الجديد
+    args = {"q": form.get("q", ""), "page": form.get("page", ""), "kw_page": form.get("kw_page", "")}
+    if "add_group" in form:
+        args.update(q="", page=_pages(len(snap.groups), PER_PAGE))
+    if "add_kw" in form:
+        args.update(q="", kw_page=_pages(len(snap.cfg.get("keywords", ())), PER_PAGE))
+    return urlencode({k: v for k, v in args.items() if v not in ("", None)})
+
+
+def _body(raw):
+    try:
+        return json.loads(raw or b"null")
+    except ValueError:
+        raise PatchError("JSON غير صالح") from None
+
+
+def _expected(headers, doc=None):
+    tag = headers.get("if-match")
+    if tag:
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if not tag.isdigit():
+            raise PatchError(f"If-Match غير صالح: {headers.get('if-match')!r}")
+        return int(tag)
+    if isinstance(doc, dict) and doc.get("version") is not None:
+        return doc["version"]
+    return None
+
+
+def _find(snap, field, key):
+    if field == "allowed_groups":
+        return snap.groups.get(key)
+    for item in snap.cfg.get(field, ()):
+        if (item if field == "keywords" else item.get("match")) == key:
+            return item
+    return None
+
+
+def handle(store, method, path, args, body=b"", headers=None):
+    # (status, payload) بدون Flask، يستخدمه أيضاً asgi_app.py؛ path بعد /api
+    # headers: أسماء بأحرف صغيرة
+    headers = headers or {}
+    token = os.environ.get("ADMIN_TOKEN")
+    if token and headers.get("authorization") != f"Bearer {token}":
+        return 401, {"error": "unauthorized"}
+    name, _, key = path.lstrip("/").partition("/")
+    snap = store.get()
+    try:
+        if name == "config" and not key:
+            if method == "GET":
+                return 200, {"version": snap.version, "groups": len(snap.groups),
+                             "keywords": len(snap.cfg.get("keywords", ())), "rules": len(snap.rules)}
+            if method != "PATCH":
+                return 405, {"error": "method not allowed"}
+            doc = _body(body)
+            ops = doc.get("ops") if isinstance(doc, dict) else doc
+            return 200, {"version": store.patch(ops, _expected(headers, doc)).version}
+        if name not in VIEWS:
+            return 404, {"error": "not found"}
+        field, text = VIEWS[name]
+        if not key:
+            if method == "GET":
+                result = paginate(_items(snap, field), args.get("q"), args.get("page"), args.get("per_page"), text)
+                result["version"] = snap.version
+                return 200, result
+            if method != "POST":
+                return 405, {"error": "method not allowed"}
+            ops = [{"op": "add", "path": f"/{field}/-", "value": _body(body)}]
+            return 201, {"version": store.patch(ops, _expected(headers)).version}
+        if method == "GET":
+            item = _find(snap, field, key)
+            if item is None:
+                return 404, {"error": "not found"}
+            return 200, {"item": item, "version": snap.version}
+        if method == "PUT":
+            ops = [{"op": "replace", "path": item_path(field, key), "value": _body(body)}]
+        elif method == "DELETE":
+            ops = [{"op": "remove", "path": item_path(field, key)}]
+        else:
+            return 405, {"error": "method not allowed"}
+        return 200, {"version": store.patch(ops, _expected(headers)).version}
+    except StaleConfigError as e:
+        return 409, {"error": str(e), "version": e.current}
+    except ValueError as e:
+        # PatchError، أو version غير رقم
+        return 400, {"error": str(e)}
+
+
+def dumps(payload):
+    # MappingProxyType من الـ snapshot تُكتب كـ object
+    return json.dumps(payload, ensure_ascii=False, default=dict)
+
+
+def register(app, store):
+    # مسارات /api/... على تطبيق Flask
+    from flask import request
+
+    def admin_api(path=""):
+        status, payload = handle(store, request.method, path, request.args, request.get_data(),
+                                 {k.lower(): v for k, v in request.headers.items()})
+        return dumps(payload), status, {"Content-Type": JSON_TYPE}
+
+    app.add_url_rule("/api/<path:path>", "admin_api", admin_api,
+                     methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
@@ -1,14 +1,22 @@
-from flask import Flask, request, render_template_string, redirect, url_for
-from twilio.rest import Client
-from twilio.twiml.messaging_response import MessagingResponse
-import json
+from flask import Flask, Response, request, redirect
 import os
+import admin_api
+from config_cache import ConfigCache, StaleConfigError, read_config, save_versioned
+from reply_templates import EMPTY_MESSAGE, EMPTY_RESPONSE, ReplyTemplate, reply_values
+from send_queue import SendQueue
+from twilio_transport import make_twilio_client
+from page_cache import PageCache
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics, watch_audit, watch_inbound, watch_outbound
+from dedupe import make_deduplicator
+from audit_log import make_audit_log
+from rate_limit import SCOPES as LIMIT_SCOPES, RateLimiter
 
 # ---------------------------
 # إعداد Flask و config
 # ---------------------------
 app = Flask(__name__)
-CONFIG_FILE = "config.json"
+# CONFIG_STORE=config.db للتخزين في SQLite (config_sqlite.py)
+CONFIG_FILE = os.environ.get("CONFIG_STORE", "config.json")
 
 def ensure_config():
     if not os.path.exists(CONFIG_FILE):
@@ -23,69 +31,95 @@ def ensure_config():
         }
         save_config(default)
         return default
-    with open(CONFIG_FILE,"r",encoding="utf-8") as f:
-        return json.load(f)
+    return read_config(CONFIG_FILE)
 
 def save_config(cfg):
-    with open(CONFIG_FILE,"w",encoding="utf-8") as f:
-        json.dump(cfg, f, ensure_ascii=False, indent=2)
-
-config = ensure_config()
-twilio_client = Client(config.get("twilio_account_sid"), config.get("twilio_auth_token"))
+    save_versioned(CONFIG_FILE, cfg)
+
+ensure_config()
+store = ConfigCache(CONFIG_FILE)
+# /api/... لتعديل عنصر واحد (admin_api.py)
+admin_api.register(app, store)
+# current وليس get(): get() يشغّل الـ watcher، ولا threads في master الـ launcher قبل fork
+_cfg = store.current.cfg
+twilio_client = make_twilio_client(_cfg.get("twilio_account_sid"), _cfg.get("twilio_auth_token"), _cfg)
+outbox = SendQueue(metrics.timed("send", twilio_client.send), dead_letter_path="dead_letters.jsonl")
+watch_outbound(outbox, twilio_client)
+NOT_UNDERSTOOD_TEXT = "📌 لم أفهم طلبك، حاول مرة أخرى."
+NOT_UNDERSTOOD = ReplyTemplate(NOT_UNDERSTOOD_TEXT).twiml({}, body=True)
+# إعادة Twilio لنفس MessageSid تأخذ الرد الأول بدون إرسال ثانٍ
+inbound = make_deduplicator(EMPTY_RESPONSE)
+watch_inbound(inbound)
+# كل رسالة واردة وكل رد في audit.jsonl (يُكتب في الخلفية)
+audit = make_audit_log()
+watch_audit(audit)
+limiter = RateLimiter()
 
 # ---------------------------
 # Webhook WhatsApp
 # ---------------------------
 @app.route("/webhook", methods=["POST"])
 def whatsapp_webhook():
-    global config
+    return inbound.run(request.values.get("MessageSid"), handle_message)
+
+def handle_message():
+    lap = metrics.stopwatch()
+    snap = store.get()
+    config = snap.cfg
     incoming_msg = request.values.get("Body","").strip()
     sender = request.values.get("From","").strip()  # رقم واتساب
-    resp = MessagingResponse()
-    msg = resp.message()
+    sid = request.values.get("MessageSid")
+    lap("parse")
+    audit.inbound(sid, sender, incoming_msg, request.values.get("ProfileName", ""))
 
     if not incoming_msg:
-        return str(resp)
-
-    # تحقق من الكلمات المفتاحية
-    matched_kw = None
-    for kw in config.get("keywords", []):
-        if kw.lower() in incoming_msg.lower():
-            matched_kw = kw
-            break
-    if not matched_kw:
-        msg.body("📌 لم أفهم طلبك، حاول مرة أخرى.")
-        return str(resp)
-
-    # البحث في allowed_groups
-    grp = next((g for g in config.get("allowed_groups", []) if g["id"]==sender), None)
-
-    if grp:
-        tpl_kind = grp.get("template","ar")
-        if tpl_kind=="custom" and grp.get("custom_reply"):
-            tpl = grp.get("custom_reply")
-        elif tpl_kind=="en":
-            tpl = config.get("group_reply_template_en")
-        else:
-            tpl = config.get("group_reply_template_ar")
-
-        reply_text = tpl.replace("{user}", sender)
-
-        if grp.get("reply_type")=="private":
-            twilio_client.messages.create(
-                body=reply_text,
-                from_=config["twilio_whatsapp_number"],
-                to=sender
-            )
-            return "", 200
-        else:
-            msg.body(reply_text)
-            return str(resp)
-    else:
-        # الرد العام إذا لم توجد مجموعة/رقم
-        reply_text = config.get("group_reply_template_ar","تفضل {user}").replace("{user}", sender)
-        msg.body(reply_text)
-        return str(resp)
+        return EMPTY_MESSAGE
+
+    # البحث في allowed_groups؛ الرد العام (العربي) إذا لم توجد مجموعة/رقم
+    grp = snap.groups.get(sender)
+    lap("lookup")
+
+    # قاعدة الرد الفائزة (كلمة أو regex) حسب الأولوية ونطاق المجموعة
+    hit = snap.rules.match(incoming_msg, grp.get("id") if grp else None)
+    lap("match")
+    if not hit:
+        metrics.inc("no_match")
+        audit.reply(sid, sender, NOT_UNDERSTOOD_TEXT)
+        return NOT_UNDERSTOOD
+    rule, matched_kw = hit
+    metrics.inc("keyword", rule.match)
+    group_id = grp.get("id") if grp else None
+    blocked = limiter.check(snap.limits, sender, group_id)
+    if blocked:
+        metrics.inc("rate_limited", blocked)
+        return EMPTY_RESPONSE
+    metrics.inc("group", grp.get("id") if grp else "none")
+    tpl = rule.template or snap.templates.for_group(grp)
+    values = reply_values(sender, request.values.get("ProfileName",""), grp, matched_kw)
+
+    if grp and grp.get("reply_type")=="private":
+        text = tpl.render(values)
+        lap("render")
+        # الإرسال في الخلفية؛ 503 يجعل Twilio يعيد المحاولة لاحقاً، فنعيد ما
+        # أخذه limiter حتى لا تمنع المهلة الإعادة
+        if not outbox.submit(
+            body=text,
+            from_=config["twilio_whatsapp_number"],
+            to=sender
+        ):
+            limiter.refund(snap.limits, sender, group_id)
+            return "", 503
+        audit.reply(sid, sender, text, rule.match)
+        return "", 200
+    audit.reply(sid, sender, tpl.render(values), rule.match)
+    lap("render")
+    xml = tpl.twiml(values, body=True)
+    lap("serialize")
+    return xml
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return metrics.render(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
 
 # ---------------------------
 # لوحة التحكم Flask
@@ -94,21 +128,46 @@ HTML = """<html lang="ar" dir="rtl">
 <head><meta charset="utf-8"><title>لوحة تحكم البوت</title></head>
 <body>
 <h3>⚙️ لوحة تحكم WhatsApp Bot</h3>
-<form method="POST" action="/save_all">
-<h4>الكلمات المفتاحية</h4>
+<form method="GET" action="/">
+<input name="q" value="{{ q }}" placeholder="بحث في المجموعات والكلمات"><button type="submit">🔍 بحث</button>
+</form>
+<form method="POST" action="/">
+<input type="hidden" name="version" value="{{ version }}">
+<input type="hidden" name="q" value="{{ q }}">
+<input type="hidden" name="page" value="{{ group_page.page }}">
+<input type="hidden" name="kw_page" value="{{ kw_page.page }}">
+<h4>الكلمات المفتاحية ({{ kw_page.total }})</h4>
 {% for kw in keywords %}
+<input type="hidden" name="kw_key_{{ loop.index0 }}" value="{{ kw }}">
 <input name="kw_{{ loop.index0 }}" value="{{ kw }}"><button name="del_kw" value="{{ kw }}">حذف</button><br>
 {% endfor %}
-<button name="add_kw" value="1">➕ إضافة كلمة</button><br><br>
+<button name="add_kw" value="1">➕ إضافة كلمة</button>
+{% if kw_page.pages > 1 %}
+{% if kw_page.page > 1 %}<a href="?q={{ q|urlencode }}&page={{ group_page.page }}&kw_page={{ kw_page.page - 1 }}">السابق</a>{% endif %}
+صفحة {{ kw_page.page }} من {{ kw_page.pages }}
+{% if kw_page.page < kw_page.pages %}<a href="?q={{ q|urlencode }}&page={{ group_page.page }}&kw_page={{ kw_page.page + 1 }}">التالي</a>{% endif %}
+{% endif %}<br><br>
+
+<h4>قواعد الرد (الأعلى أولوية يفوز، الرد الفارغ = قالب المجموعة)</h4>
+{% for r in rules %}
+<input name="rule_match_{{ loop.index0 }}" value="{{ r['match'] }}">
+<label><input type="checkbox" name="rule_regex_{{ loop.index0 }}" value="1" {% if r.get('regex') %}checked{% endif %}>regex</label>
+مجموعات: <input name="rule_groups_{{ loop.index0 }}" value="{{ r.get('groups', [])|join(',') }}" placeholder="الكل">
+أولوية: <input name="rule_priority_{{ loop.index0 }}" value="{{ r.get('priority', 0) }}" size="3">
+الرد: <input name="rule_template_{{ loop.index0 }}" value="{{ r.get('template', '') }}">
+<button name="del_rule" value="{{ loop.index0 }}">حذف</button><br>
+{% endfor %}
+<button name="add_rule" value="1">➕ إضافة قاعدة</button><br><br>
 
-<h4>المجموعات / الأشخاص</h4>
+<h4>المجموعات / الأشخاص ({{ group_page.total }})</h4>
 {% for g in groups %}
+<input type="hidden" name="g_key_{{ loop.index0 }}" value="{{ g['id'] }}">
 ID: <input name="g_id_{{ loop.index0 }}" value="{{ g['id'] }}">
 Name: <input name="g_name_{{ loop.index0 }}" value="{{ g.get('name','') }}">
 Type:
 <select name="g_type_{{ loop.index0 }}">
-<option value="group" {% if g['reply_type']=='group' %}selected{% endif %}>Group</option>
-<option value="private" {% if g['reply_type']=='private' %}selected{% endif %}>Private</option>
+<option value="group" {% if g.get('reply_type')=='group' %}selected{% endif %}>Group</option>
+<option value="private" {% if g.get('reply_type')=='private' %}selected{% endif %}>Private</option>
 </select>
 Template:
 <select name="g_tpl_{{ loop.index0 }}">
@@ -119,64 +178,62 @@ Template:
 Custom: <input name="g_custom_{{ loop.index0 }}" value="{{ g.get('custom_reply','') }}">
 <button name="del_group" value="{{ g['id'] }}">حذف</button><br>
 {% endfor %}
-<button name="add_group" value="1">➕ إضافة مجموعة</button><br><br>
+<button name="add_group" value="1">➕ إضافة مجموعة</button>
+{% if group_page.pages > 1 %}
+{% if group_page.page > 1 %}<a href="?q={{ q|urlencode }}&page={{ group_page.page - 1 }}&kw_page={{ kw_page.page }}">السابق</a>{% endif %}
+صفحة {{ group_page.page }} من {{ group_page.pages }}
+{% if group_page.page < group_page.pages %}<a href="?q={{ q|urlencode }}&page={{ group_page.page + 1 }}&kw_page={{ kw_page.page }}">التالي</a>{% endif %}
+{% endif %}<br><br>
 
 <h4>قوالب الرد العامة</h4>
 العربي:<input name="reply_ar" value="{{ reply_ar }}"><br>
 الإنجليزي:<input name="reply_en" value="{{ reply_en }}"><br><br>
 
+<h4>حدود الردود (0 = بدون حد)</h4>
+{% for scope, label in limit_scopes %}
+{% set lim = limits.get(scope, {}) %}
+{{ label }}:
+مهلة بالثواني <input name="rl_{{ scope }}_cooldown" value="{{ lim.get('cooldown', 0) }}" size="4">
+ردود في الدقيقة <input name="rl_{{ scope }}_per_minute" value="{{ lim.get('per_minute', 0) }}" size="4">
+دفعة <input name="rl_{{ scope }}_burst" value="{{ lim.get('burst', 0) }}" size="4"><br>
+{% endfor %}<br>
+
 <button type="submit">💾 حفظ التعديلات</button>
 </form>
 </body></html>
 """
 
+def dashboard_context(snap, args):
+    config = snap.cfg
+    view = admin_api.dashboard_view(snap, args)
+    return dict(keywords=view["kw_page"]["items"], groups=view["group_page"]["items"],
+                reply_ar=config.get("group_reply_template_ar",""),
+                reply_en=config.get("group_reply_template_en",""),
+                rules=config.get("reply_rules",[]),
+                limits=config.get("rate_limits",{}), limit_scopes=LIMIT_SCOPES,
+                version=snap.version, **view)
+
+# القالب يُترجم مرة واحدة، والصفحة تُحفظ حتى يتغير الـ snapshot (page_cache.py)
+PAGE = PageCache(HTML, dashboard_context)
+
 @app.route("/", methods=["GET","POST"])
 def dashboard():
-    global config
-    cfg = ensure_config()
+    snap = store.get()
     if request.method=="POST":
-        # handle keywords
-        if 'add_kw' in request.form:
-            cfg.setdefault("keywords",[]).append("كلمة جديدة")
-        if 'del_kw' in request.form:
-            val = request.form.get('del_kw')
-            cfg["keywords"] = [k for k in cfg.get("keywords",[]) if k!=val]
-        # edit keywords
-        new_keywords=[]
-        for i in range(len(cfg.get("keywords",[]))):
-            v=request.form.get(f"kw_{i}")
-            if v and v.strip(): new_keywords.append(v.strip())
-        cfg["keywords"]=new_keywords
-
-        # handle groups
-        if 'add_group' in request.form:
-            cfg.setdefault("allowed_groups",[]).append({"id":"","name":"New Group","reply_type":"group","template":"ar","custom_reply":""})
-        if 'del_group' in request.form:
-            val=request.form.get('del_group')
-            cfg["allowed_groups"]=[g for g in cfg.get("allowed_groups",[]) if g["id"]!=val]
-
-        # edit groups
-        new_groups=[]
-        for i in range(len(cfg.get("allowed_groups",[]))):
-            gid=request.form.get(f"g_id_{i}","").strip()
-            name=request.form.get(f"g_name_{i}","").strip()
-            rtype=request.form.get(f"g_type_{i}","group")
-            tpl=request.form.get(f"g_tpl_{i}","ar")
-            custom=request.form.get(f"g_custom_{i}","").strip()
-            new_groups.append({"id":gid,"name":name,"reply_type":rtype,"template":tpl,"custom_reply":custom})
-        cfg["allowed_groups"]=new_groups
-
-        # replies
-        cfg["group_reply_template_ar"]=request.form.get("reply_ar","")
-        cfg["group_reply_template_en"]=request.form.get("reply_en","")
-
-        save_config(cfg)
-        config = ensure_config()
-        return redirect(url_for("dashboard"))
-
-    return render_template_string(HTML, keywords=config.get("keywords",[]), groups=config.get("allowed_groups",[]),
-                                  reply_ar=config.get("group_reply_template_ar",""),
-                                  reply_en=config.get("group_reply_template_en",""))
+        # الصفوف المعروضة التي تغيرت فقط -> تعديلات (admin_api.form_ops)
+        try:
+            ops = admin_api.form_ops(request.form, snap)
+            if ops:
+                snap = store.patch(ops, request.form.get("version") or None)
+        except StaleConfigError:
+            return "⚠️ تم تعديل الإعدادات من مكان آخر، أعد تحميل الصفحة.", 409
+        except ValueError as e:
+            return f"⚠️ {e}", 400
+        return redirect("/?" + admin_api.return_query(request.form, snap))
+
+    status, headers, body = PAGE.respond(snap, request.args, request.headers.get("Accept-Encoding",""),
+                                         request.headers.get("If-None-Match",""))
+    return Response(body, status, headers)
 
 # ---------------------------
 # Main
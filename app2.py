@@ -1,61 +1,127 @@
-import os, json
-from flask import Flask, request, render_template_string, redirect, url_for
-from twilio.rest import Client
-from twilio.twiml.messaging_response import MessagingResponse
+import os
+from flask import Flask, Response, request, redirect
+import admin_api
+from config_cache import ConfigCache, StaleConfigError, read_config, save_versioned
+from reply_templates import EMPTY_RESPONSE, reply_values
+from send_queue import SendQueue
+from page_cache import PageCache
+from twilio_transport import make_twilio_client
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics, watch_audit, watch_inbound, watch_outbound
+from dedupe import make_state_deduplicator
+from audit_log import make_audit_log
+from rate_limit import SCOPES as LIMIT_SCOPES, blocked_by, limit_ops, refund_ops
+from runtime_state import make_runtime_state
 
 # إعداد المفاتيح من البيئة
 account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
 auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
 whatsapp_number = os.environ.get("TWILIO_WHATSAPP_NUMBER")
-twilio_client = Client(account_sid, auth_token)
+twilio_client = make_twilio_client(account_sid, auth_token)
+outbox = SendQueue(metrics.timed("send", twilio_client.send), dead_letter_path="dead_letters.jsonl")
+watch_outbound(outbox, twilio_client)
 
-CONFIG_FILE = "config.json"
+# CONFIG_STORE=config.db للتخزين في SQLite (config_sqlite.py)
+CONFIG_FILE = os.environ.get("CONFIG_STORE", "config.json")
 
 def load_config():
-    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return read_config(CONFIG_FILE)
 
 def save_config(cfg):
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(cfg, f, ensure_ascii=False, indent=2)
+    save_versioned(CONFIG_FILE, cfg)
 
+store = ConfigCache(CONFIG_FILE)
+# مهل الردود والـ MessageSid المعالجة: في الذاكرة، أو مشتركة بين عدة workers
+# مع RUNTIME_STATE=runtime_state.db (runtime_state.py)
+runtime = make_runtime_state()
+# إعادة Twilio لنفس MessageSid تأخذ الرد الأول بدون إرسال ثانٍ
+inbound = make_state_deduplicator(runtime)
+watch_inbound(inbound)
+# كل رسالة واردة وكل رد في audit.jsonl (يُكتب في الخلفية)
+audit = make_audit_log()
+watch_audit(audit)
 app = Flask(__name__)
+# /api/... لتعديل عنصر واحد (admin_api.py)
+admin_api.register(app, store)
 
 # -----------------------------
 # Webhook للواتساب
 # -----------------------------
+def reply_for(form, lap=None):
+    # منطق الرد بدون Flask، يستخدمه أيضاً asgi_app.py؛ يعيد (النص، الحالة)
+    lap = lap or metrics.stopwatch()
+    snap = store.get()
+    incoming_msg = form.get("Body", "").strip()
+    sender = form.get("From", "").strip()
+    sid = form.get("MessageSid")
+    profile = form.get("ProfileName", "")
+    lap("parse")
+
+    # القرار كله في الذاكرة أولاً ...
+    grp = hit = None
+    response = (EMPTY_RESPONSE, 200)
+    if incoming_msg:
+        grp = snap.groups.get(sender)
+        lap("lookup")
+        # قاعدة الرد الفائزة (كلمة أو regex) حسب الأولوية ونطاق المجموعة
+        hit = snap.rules.match(incoming_msg, grp.get("id") if grp else None)
+        lap("match")
+    gid = grp.get("id") if grp else None
+    if hit:
+        rule, matched_kw = hit
+        tpl = rule.template or snap.templates.for_group(grp)
+        values = reply_values(sender, profile, grp, matched_kw)
+        text = tpl.render(values)
+        lap("render")
+        private = bool(grp and grp.get("reply_type") == "private")
+        if not private:
+            response = (tpl.twiml(values), 200)
+            lap("serialize")
+        else:
+            response = ("", 200)
+
+    # ... ثم batch واحد على runtime state: حجز الـ MessageSid مع الرد وحدود
+    # الردود معاً. إعادة من Twilio أو حد يمنع = لا يُطبق شيء منه
+    batch = runtime.pipeline(all_or_nothing=True)
+    claim = inbound.claim(batch, sid, response)
+    checks = limit_ops(batch, snap.limits, sender, gid) if hit else ()
+    results = batch.execute()
+    lap("state")
+    if claim is not None and results[claim] is not None:
+        return inbound.replay(results[claim])
+    # حد منع الرد: لا يُحفظ شيء، فإعادة Twilio تُقيّم من جديد (لم يُرسل شيء)
+    blocked = None if batch.applied else blocked_by(checks, results)
+    if blocked:
+        response = (EMPTY_RESPONSE, 200)
+
+    audit.inbound(sid, sender, incoming_msg, profile)
+    if not hit:
+        if incoming_msg:
+            metrics.inc("no_match")
+        return response
+    metrics.inc("keyword", rule.match)
+    if blocked:
+        metrics.inc("rate_limited", blocked)
+        return response
+    metrics.inc("group", gid or "none")
+    # الإرسال الخاص في الخلفية؛ 503 يجعل Twilio يعيد المحاولة لاحقاً، فنعيد
+    # الحجز وحدود الردود التي أُخذت حتى لا تُمنع الإعادة
+    if private and not outbox.submit(body=text, from_=whatsapp_number, to=sender):
+        undo = runtime.pipeline()
+        inbound.release(sid, undo)
+        refund_ops(undo, batch, checks)
+        undo.execute()
+        return "", 503
+    audit.reply(sid, sender, text, rule.match)
+    return response
+
 @app.route("/webhook", methods=["POST"])
 def whatsapp_webhook():
-    config = load_config()
-    incoming_msg = request.values.get("Body", "").strip()
-    sender = request.values.get("From", "").strip()
-    resp = MessagingResponse()
-
-    if not incoming_msg:
-        return str(resp)
-
-    matched_kw = next((kw for kw in config["keywords"] if kw.lower() in incoming_msg.lower()), None)
-    if not matched_kw:
-        return str(resp)
-
-    grp = next((g for g in config["allowed_groups"] if g["id"] == sender), None)
-    if grp:
-        tpl_kind = grp.get("template", "ar")
-        tpl = (grp.get("custom_reply") if tpl_kind == "custom" and grp.get("custom_reply")
-               else config["group_reply_template_en"] if tpl_kind == "en"
-               else config["group_reply_template_ar"])
-        reply_text = tpl.replace("{user}", sender)
-
-        if grp.get("reply_type") == "private":
-            twilio_client.messages.create(body=reply_text, from_=whatsapp_number, to=sender)
-            return "", 200
-        else:
-            resp.message(reply_text)
-            return str(resp)
-    else:
-        reply_text = config["group_reply_template_ar"].replace("{user}", sender)
-        resp.message(reply_text)
-        return str(resp)
+    lap = metrics.stopwatch()
+    return reply_for(request.values, lap)
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return metrics.render(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
 
 # -----------------------------
 # لوحة التحكم
@@ -79,16 +145,25 @@ th.sticky{position:sticky;top:0;background:#0d6efd;color:#fff}
 <div class="container">
   <h3 class="text-center mb-3">⚙️ لوحة تحكم البوت</h3>
 
+  <form method="GET" action="/" class="d-flex mb-3">
+    <input class="form-control me-2" name="q" value="{{ q }}" placeholder="بحث في المجموعات والكلمات">
+    <button class="btn btn-secondary" type="submit">🔍 بحث</button>
+  </form>
+
   <form method="POST" action="/">
+  <input type="hidden" name="version" value="{{ version }}">
+  <input type="hidden" name="q" value="{{ q }}">
+  <input type="hidden" name="page" value="{{ group_page.page }}">
+  <input type="hidden" name="kw_page" value="{{ kw_page.page }}">
   <div class="card mb-3">
-    <h5>🔑 الكلمات المفتاحية</h5>
+    <h5>🔑 الكلمات المفتاحية <small class="text-muted">({{ kw_page.total }})</small></h5>
     <div class="table-scroll mt-2">
       <table class="table">
         <thead><tr class="sticky"><th>الكلمة</th><th>إجراء</th></tr></thead>
         <tbody>
         {% for kw in keywords %}
           <tr>
-            <td><input class="form-control small-input" name="kw_{{ loop.index0 }}" value="{{ kw }}"></td>
+            <td><input type="hidden" name="kw_key_{{ loop.index0 }}" value="{{ kw }}"><input class="form-control small-input" name="kw_{{ loop.index0 }}" value="{{ kw }}"></td>
             <td><button class="btn btn-sm btn-danger" name="del_kw" value="{{ kw }}">حذف</button></td>
           </tr>
         {% endfor %}
@@ -97,23 +172,54 @@ th.sticky{position:sticky;top:0;background:#0d6efd;color:#fff}
     </div>
     <div class="mt-2">
       <button class="btn btn-info" name="add_kw" value="1">➕ إضافة كلمة</button>
+      {% if kw_page.pages > 1 %}
+      <span class="ms-3">
+        {% if kw_page.page > 1 %}<a href="?q={{ q|urlencode }}&page={{ group_page.page }}&kw_page={{ kw_page.page - 1 }}">السابق</a>{% endif %}
+        صفحة {{ kw_page.page }} من {{ kw_page.pages }}
+        {% if kw_page.page < kw_page.pages %}<a href="?q={{ q|urlencode }}&page={{ group_page.page }}&kw_page={{ kw_page.page + 1 }}">التالي</a>{% endif %}
+      </span>
+      {% endif %}
     </div>
   </div>
 
   <div class="card mb-3">
-    <h5>📌 المجموعات المسموحة</h5>
+    <h5>🧭 قواعد الرد <small class="text-muted">(الأعلى أولوية يفوز، الرد الفارغ = قالب المجموعة)</small></h5>
+    <div class="table-scroll mt-2">
+      <table class="table">
+        <thead><tr class="sticky"><th>كلمة / نمط</th><th>regex</th><th>المجموعات (IDs)</th><th>أولوية</th><th>الرد</th><th>إجراء</th></tr></thead>
+        <tbody>
+        {% for r in rules %}
+          <tr>
+            <td><input class="form-control small-input" name="rule_match_{{ loop.index0 }}" value="{{ r['match'] }}"></td>
+            <td><input class="form-check-input" type="checkbox" name="rule_regex_{{ loop.index0 }}" value="1" {% if r.get('regex') %}checked{% endif %}></td>
+            <td><input class="form-control small-input" name="rule_groups_{{ loop.index0 }}" value="{{ r.get('groups', [])|join(',') }}" placeholder="الكل"></td>
+            <td><input class="form-control small-input" name="rule_priority_{{ loop.index0 }}" value="{{ r.get('priority', 0) }}"></td>
+            <td><input class="form-control small-input" name="rule_template_{{ loop.index0 }}" value="{{ r.get('template', '') }}"></td>
+            <td><button class="btn btn-sm btn-danger" name="del_rule" value="{{ loop.index0 }}">حذف</button></td>
+          </tr>
+        {% endfor %}
+        </tbody>
+      </table>
+    </div>
+    <div class="mt-2">
+      <button class="btn btn-info" name="add_rule" value="1">➕ إضافة قاعدة</button>
+    </div>
+  </div>
+
+  <div class="card mb-3">
+    <h5>📌 المجموعات المسموحة <small class="text-muted">({{ group_page.total }})</small></h5>
     <div class="table-scroll mt-2">
       <table class="table">
         <thead><tr class="sticky"><th>الاسم</th><th>ID</th><th>نوع</th><th>قالب</th><th>رد مخصص</th><th>إجراء</th></tr></thead>
         <tbody>
         {% for g in groups %}
           <tr>
-            <td><input class="form-control small-input" name="g_name_{{ loop.index0 }}" value="{{ g.get('name','') }}"></td>
+            <td><input type="hidden" name="g_key_{{ loop.index0 }}" value="{{ g['id'] }}"><input class="form-control small-input" name="g_name_{{ loop.index0 }}" value="{{ g.get('name','') }}"></td>
             <td><input class="form-control small-input" name="g_id_{{ loop.index0 }}" value="{{ g['id'] }}"></td>
             <td>
               <select class="form-select" name="g_type_{{ loop.index0 }}">
-                <option value="group" {% if g['reply_type']=='group' %}selected{% endif %}>Group</option>
-                <option value="private" {% if g['reply_type']=='private' %}selected{% endif %}>Private</option>
+                <option value="group" {% if g.get('reply_type')=='group' %}selected{% endif %}>Group</option>
+                <option value="private" {% if g.get('reply_type')=='private' %}selected{% endif %}>Private</option>
               </select>
             </td>
             <td>
@@ -132,6 +238,13 @@ th.sticky{position:sticky;top:0;background:#0d6efd;color:#fff}
     </div>
     <div class="mt-2">
       <button class="btn btn-info" name="add_group" value="1">➕ إضافة مجموعة</button>
+      {% if group_page.pages > 1 %}
+      <span class="ms-3">
+        {% if group_page.page > 1 %}<a href="?q={{ q|urlencode }}&page={{ group_page.page - 1 }}&kw_page={{ kw_page.page }}">السابق</a>{% endif %}
+        صفحة {{ group_page.page }} من {{ group_page.pages }}
+        {% if group_page.page < group_page.pages %}<a href="?q={{ q|urlencode }}&page={{ group_page.page + 1 }}&kw_page={{ kw_page.page }}">التالي</a>{% endif %}
+      </span>
+      {% endif %}
     </div>
   </div>
 
@@ -147,6 +260,24 @@ th.sticky{position:sticky;top:0;background:#0d6efd;color:#fff}
     </div>
   </div>
 
+  <div class="card mb-3">
+    <h5>⏱️ حدود الردود <small class="text-muted">(0 = بدون حد)</small></h5>
+    <table class="table">
+      <thead><tr><th>النطاق</th><th>مهلة بالثواني</th><th>ردود في الدقيقة</th><th>دفعة</th></tr></thead>
+      <tbody>
+      {% for scope, label in limit_scopes %}
+      {% set lim = limits.get(scope, {}) %}
+        <tr>
+          <td>{{ label }}</td>
+          <td><input class="form-control" name="rl_{{ scope }}_cooldown" value="{{ lim.get('cooldown', 0) }}"></td>
+          <td><input class="form-control" name="rl_{{ scope }}_per_minute" value="{{ lim.get('per_minute', 0) }}"></td>
+          <td><input class="form-control" name="rl_{{ scope }}_burst" value="{{ lim.get('burst', 0) }}"></td>
+        </tr>
+      {% endfor %}
+      </tbody>
+    </table>
+  </div>
+
   <div class="text-end mb-5">
     <button class="btn btn-success" type="submit">💾 حفظ التعديلات</button>
   </div>
@@ -158,49 +289,47 @@ th.sticky{position:sticky;top:0;background:#0d6efd;color:#fff}
 </html>
 """
 
+def save_dashboard_form(form):
+    # يعيد (رابط الرجوع، None) أو (رسالة الخطأ، الحالة)؛ يستخدمه أيضاً asgi_app.py
+    snap = store.get()
+    try:
+        ops = admin_api.form_ops(form, snap)
+        if ops:
+            snap = store.patch(ops, form.get("version") or None)
+    except StaleConfigError:
+        return "⚠️ تم تعديل الإعدادات من مكان آخر، أعد تحميل الصفحة.", 409
+    except ValueError as e:
+        return f"⚠️ {e}", 400
+    return "/?" + admin_api.return_query(form, snap), None
+
+def dashboard_context(snap, args):
+    cfg = snap.cfg
+    view = admin_api.dashboard_view(snap, args)
+    return dict(
+        keywords=view["kw_page"]["items"],
+        groups=view["group_page"]["items"],
+        reply_ar=cfg.get("group_reply_template_ar",""),
+        reply_en=cfg.get("group_reply_template_en",""),
+        rules=cfg.get("reply_rules", []),
+        limits=cfg.get("rate_limits", {}),
+        limit_scopes=LIMIT_SCOPES,
+        version=snap.version,
+        **view
+    )
+
+# القالب يُترجم مرة واحدة، والصفحة تُحفظ حتى يتغير الـ snapshot (page_cache.py)
+PAGE = PageCache(HTML, dashboard_context)
+
 @app.route("/", methods=["GET", "POST"])
 def dashboard():
-    cfg = load_config()
     if request.method == "POST":
-        if 'add_kw' in request.form:
-            cfg["keywords"].append("كلمة جديدة")
-        if 'del_kw' in request.form:
-            val = request.form.get('del_kw')
-            cfg["keywords"] = [k for k in cfg["keywords"] if k != val]
-        new_keywords = []
-        for i in range(len(cfg["keywords"])):
-            v = request.form.get(f"kw_{i}")
-            if v and v.strip():
-                new_keywords.append(v.strip())
-        cfg["keywords"] = new_keywords
-
-        if 'add_group' in request.form:
-            cfg["allowed_groups"].append({"id": "0", "name": "New Group", "reply_type": "group", "template": "ar", "custom_reply": ""})
-        if 'del_group' in request.form:
-            gid_del = request.form.get('del_group')
-            cfg["allowed_groups"] = [g for g in cfg["allowed_groups"] if g["id"] != gid_del]
-
-        new_groups = []
-        for i in range(len(cfg["allowed_groups"])):
-            gid_raw = request.form.get(f"g_id_{i}","").strip()
-            name = request.form.get(f"g_name_{i}","").strip()
-            rtype = request.form.get(f"g_type_{i}","group")
-            tpl = request.form.get(f"g_tpl_{i}","ar")
-            custom = request.form.get(f"g_custom_{i}","").strip()
-            new_groups.append({"id": gid_raw, "name": name, "reply_type": rtype, "template": tpl, "custom_reply": custom})
-        cfg["allowed_groups"] = new_groups
-
-        cfg["group_reply_template_ar"] = request.form.get("reply_ar","").strip()
-        cfg["group_reply_template_en"] = request.form.get("reply_en","").strip()
-        save_config(cfg)
-        return redirect(url_for("dashboard"))
-
-    return render_template_string(HTML,
-        keywords=cfg.get("keywords", []),
-        groups=cfg.get("allowed_groups", []),
-        reply_ar=cfg.get("group_reply_template_ar",""),
-        reply_en=cfg.get("group_reply_template_en","")
-    )
+        target, status = save_dashboard_form(request.form)
+        if status:
+            return target, status
+        return redirect(target)
+    status, headers, body = PAGE.respond(store.get(), request.args, request.headers.get("Accept-Encoding", ""),
+                                         request.headers.get("If-None-Match", ""))
+    return Response(body, status, headers)
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
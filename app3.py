@@ -1,10 +1,8 @@
-import json
 import os
 import threading
 from flask import Flask, render_template_string, request, redirect, url_for
-from pywhatkit.whats import WhatsApp
-import pyautogui
 import time
+from config_cache import read_config, save_versioned
 
 # ---------------------------
 # تحميل الإعدادات
@@ -19,15 +17,12 @@ def load_config():
             "group_reply_template_ar": "تفضل {user}، سيتم التواصل معك.",
             "group_reply_template_en": "Hi {user}, we will contact you."
         }
-        with open(CONFIG_FILE,"w",encoding="utf-8") as f:
-            json.dump(default,f,ensure_ascii=False,indent=2)
+        save_config(default)
         return default
-    with open(CONFIG_FILE,"r",encoding="utf-8") as f:
-        return json.load(f)
+    return read_config(CONFIG_FILE)
 
 def save_config(cfg):
-    with open(CONFIG_FILE,"w",encoding="utf-8") as f:
-        json.dump(cfg,f,ensure_ascii=False,indent=2)
+    save_versioned(CONFIG_FILE, cfg)
 
 config = load_config()
 
@@ -119,6 +114,9 @@ def run_flask():
 # ---------------------------
 def start_bot():
     global config
+    # pyautogui يحتاج شاشة: يُستورد عند تشغيل البوت فقط، فلوحة التحكم تعمل بدونه
+    from pywhatkit.whats import WhatsApp  # noqa: F401
+    import pyautogui  # noqa: F401
     print("⚡ شغّل البوت، افتح واتساب Web لمسح QR Code...")
     while True:
         # مسح الرسائل (مثال مبسط)
@@ -1,18 +1,17 @@
-import json
 import os
-import time
 import threading
+from functools import partial
 from flask import Flask, render_template_string, request, redirect
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from config_cache import read_config, save_versioned
+from rate_limit import SCOPES as LIMIT_SCOPES, RateLimiter, limits_from_form, parse_limits
+from wa_ingest import MessageFeed, order_chats, send_message
+from wa_browser import PROFILE_DIR, Backoff, start_browser, startup_report
+from wa_pool import BrowserPool, chrome_session
 
 CONFIG_FILE = "config.json"
-COOKIES_FILE = "cookies.json"
 driver = None
 config = {}
+limiter = RateLimiter()
 
 # ------------------- إعداد -------------------
 
@@ -28,85 +27,152 @@ def load_config():
             "reply_group_ar": "تفضل {user}، سيتم التواصل معك قريباً.",
             "reply_group_en": "Hi {user}, we will contact you shortly.",
             "enable_private": True,
-            "enable_groups": True
+            "enable_groups": True,
+            "rate_limits": {"sender_group": {"cooldown": 60, "per_minute": 0, "burst": 0}}
         }
         save_config()
     else:
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = read_config(CONFIG_FILE)
 
 def save_config():
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
-
-def save_cookies():
-    cookies = driver.get_cookies()
-    with open(COOKIES_FILE, "w", encoding="utf-8") as f:
-        json.dump(cookies, f)
-
-def load_cookies():
-    if os.path.exists(COOKIES_FILE):
-        with open(COOKIES_FILE, "r", encoding="utf-8") as f:
-            cookies = json.load(f)
-        for cookie in cookies:
-            driver.add_cookie(cookie)
+    save_versioned(CONFIG_FILE, config)
 
 def start_driver():
+    # جلسة واتساب محفوظة في chrome_profile/ ومسار chromedriver محفوظ (wa_browser.py)
     global driver
-    chrome_options = Options()
-    chrome_options.add_argument("--headless=new")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--window-size=1920,1080")
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-    driver.get("https://web.whatsapp.com")
-
-    if os.path.exists(COOKIES_FILE):
-        driver.delete_all_cookies()
-        load_cookies()
-        driver.refresh()
-        time.sleep(10)
-    else:
-        print("🔑 امسح QR Code في أول مرة (30 ثانية)...")
-        time.sleep(30)
-        save_cookies()
-        print("✅ تم حفظ الجلسة.")
+    driver, kind, timings = start_browser(config.get("chrome_profile", PROFILE_DIR))
+    print(startup_report(kind, timings))
 
 # ------------------- تشغيل البوت -------------------
 
+def message_context(msg):
+    # (المرسل، المحادثة) لآخر رسالة؛ data-pre-plain-text = "[10:21, 1/2/2024] الاسم: "
+    from selenium.webdriver.common.by import By
+    try:
+        chat = driver.find_element(By.CSS_SELECTOR, "header span[title]").get_attribute("title")
+    except Exception:
+        chat = None
+    try:
+        meta = msg.find_element(By.XPATH, "./ancestor::div[@data-pre-plain-text][1]").get_attribute("data-pre-plain-text")
+        sender = meta.split("]", 1)[-1].strip().rstrip(":").strip()
+    except Exception:
+        sender = None
+    return sender or chat, chat
+
+def choose_replies(text, sender, chat, is_group=None):
+    # نصوص الرد المسموح بها حسب الكلمات وحدود الردود؛ is_group=None للطريقة القديمة
+    if is_group is None:
+        is_group = config.get("enable_groups", True)
+    limits = parse_limits(config)
+    replies = []
+    for kw in config.get("keywords", []):
+        if kw.lower() in text.lower():
+            blocked = limiter.check(limits, sender, chat)
+            if blocked:
+                print("⏳ تم تخطي الرد (حد الردود):", blocked)
+                continue
+
+            # خاص أو مجموعة
+            if is_group:
+                replies.append(config.get("reply_group_ar", "تفضل {user}"))
+            else:
+                replies.append(config.get("reply_private_ar", "مرحباً {user}"))
+    return replies
+
+def reply_to(text, sender, chat, is_group=None):
+    # يعيد عدد الردود المرسلة
+    replies = choose_replies(text, sender, chat, is_group)
+    for reply in replies:
+        send_message(driver, reply)
+        print("✅ تم إرسال الرد:", reply)
+    return len(replies)
+
+def wanted(is_group):
+    return config.get("enable_groups", True) if is_group else config.get("enable_private", True)
+
+def decide(msg):
+    # رسالة من MessageFeed -> نصوص الرد (يستخدمها run_bot و BrowserPool)
+    if not wanted(msg["group"]):
+        return []
+    text = msg["text"].strip()
+    print("📩 رسالة:", msg["chat_title"] or msg["chat"], "-", text)
+    return choose_replies(text, msg["sender"] or msg["chat_title"], msg["chat_title"] or msg["chat"], msg["group"])
+
+def choose_chat(chats):
+    # أهم محادثة غير مقروءة: المجموعات المسموحة أولاً ثم الأكثر رسائل
+    for chat in order_chats(chats, config.get("allowed_groups", [])):
+        if wanted(chat["group"]):
+            return chat
+    return None
+
+def poll_last_message():
+    # الطريقة القديمة ("ingest": "poll"): قراءة آخر رسالة ظاهرة
+    from selenium.webdriver.common.by import By
+    idle, errors = Backoff(0.2, 3.0), Backoff(1.0, 30.0, 2.0)
+    previous = None
+    while True:
+        try:
+            messages = driver.find_elements(By.CSS_SELECTOR, "span.selectable-text")
+            if messages:
+                last_msg = messages[-1].text.strip()
+                if last_msg != previous:
+                    previous = last_msg
+                    idle.reset()
+                    print("📩 آخر رسالة:", last_msg)
+                    # نفس الرسالة في الدورة التالية لا تأخذ رداً ثانياً
+                    sender, chat = message_context(messages[-1])
+                    reply_to(last_msg, sender, chat)
+            errors.reset()
+            idle.wait()
+        except Exception as e:
+            print("⚠️ خطأ:", e)
+            errors.wait()
+
 def run_bot():
     load_config()
     start_driver()
     print("🚀 البوت شغال...")
+    if config.get("ingest", "observer") == "poll":
+        return poll_last_message()
 
+    # كل دورة: طلب واحد يعيد الرسائل الجديدة والمحادثات غير المقروءة، ثم
+    # فتح أهم محادثة غير مقروءة (المجموعات المسموحة أولاً) لتُقرأ في الدورة التالية
+    # الانتظار بين الدورات يقصر عند وجود رسائل ويطول تدريجياً حتى 3 ثوانٍ عند الهدوء
+    feed = MessageFeed(driver)
+    pending, unread = feed.install(), []
+    idle, errors = Backoff(0.2, 3.0), Backoff(1.0, 30.0, 2.0)
     while True:
         try:
-            messages = driver.find_elements(By.CSS_SELECTOR, "span.selectable-text")
-            if messages:
-                last_msg = messages[-1].text.strip()
-                print("📩 آخر رسالة:", last_msg)
-
-                # الرد حسب نوع الرسالة
-                for kw in config.get("keywords", []):
-                    if kw.lower() in last_msg.lower():
-                        box = driver.find_element(By.CSS_SELECTOR, "div[title='Type a message']")
-                        
-                        # خاص أو مجموعة
-                        if config.get("enable_groups", True):
-                            reply = config.get("reply_group_ar", "تفضل {user}")
-                        else:
-                            reply = config.get("reply_private_ar", "مرحباً {user}")
-                        
-                        box.send_keys(reply)
-                        send_btn = driver.find_element(By.CSS_SELECTOR, "span[data-icon='send']")
-                        send_btn.click()
-                        print("✅ تم إرسال الرد:", reply)
-                        time.sleep(5)
-            time.sleep(3)
+            for msg in pending:
+                for reply in decide(msg):
+                    send_message(driver, reply)
+                    print("✅ تم إرسال الرد:", reply)
+            chat = choose_chat(unread)
+            if chat:
+                feed.open_chat(chat)
+            if pending or unread:
+                idle.reset()
+            idle.wait()
+            unread, pending = feed.scan()
+            errors.reset()
         except Exception as e:
             print("⚠️ خطأ:", e)
-            time.sleep(5)
+            errors.wait()
+            pending, unread = [], []
+
+def run_pool():
+    # عدة جلسات متصفح ("browser_sessions")، كل واحدة في عملية منفصلة (wa_pool.py)
+    load_config()
+    sessions = config["browser_sessions"]
+    shard = config.get("shard_chats", False)
+    pool = BrowserPool([
+        {"name": s["name"],
+         "factory": partial(chrome_session, s.get("profile") or os.path.join(PROFILE_DIR, s["name"])),
+         "shard": (i, len(sessions)) if shard else None}
+        for i, s in enumerate(sessions)
+    ], decide, choose_chat)
+    print(f"🚀 البوت شغال على {len(sessions)} جلسات...")
+    pool.run()
 
 # ------------------- لوحة التحكم Flask -------------------
 
@@ -161,6 +227,16 @@ TEMPLATE = """
       <label><input type="checkbox" name="enable_private" {% if enable_private %}checked{% endif %}> الرد على الخاص</label>
       <label><input type="checkbox" name="enable_groups" {% if enable_groups %}checked{% endif %}> الرد على المجموعات</label>
     </div>
+    <div class="card">
+      <h3>حدود الردود (0 = بدون حد)</h3>
+      {% for scope, label in limit_scopes %}
+      {% set lim = limits.get(scope, {}) %}
+      <label>{{ label }}</label>
+      مهلة بالثواني <input type="number" name="rl_{{ scope }}_cooldown" value="{{ lim.get('cooldown', 0) }}">
+      ردود في الدقيقة <input type="number" step="any" name="rl_{{ scope }}_per_minute" value="{{ lim.get('per_minute', 0) }}">
+      دفعة <input type="number" name="rl_{{ scope }}_burst" value="{{ lim.get('burst', 0) }}">
+      {% endfor %}
+    </div>
     <button type="submit">💾 حفظ</button>
   </form>
 </body>
@@ -179,6 +255,7 @@ def dashboard():
         config["reply_group_en"] = request.form["reply_group_en"]
         config["enable_private"] = "enable_private" in request.form
         config["enable_groups"] = "enable_groups" in request.form
+        config["rate_limits"] = limits_from_form(request.form)
         save_config()
         return redirect("/")
     return render_template_string(
@@ -192,6 +269,8 @@ def dashboard():
         reply_group_en=config.get("reply_group_en", ""),
         enable_private=config.get("enable_private", True),
         enable_groups=config.get("enable_groups", True),
+        limits=config.get("rate_limits", {}),
+        limit_scopes=LIMIT_SCOPES,
     )
 
 def run_dashboard():
@@ -201,5 +280,6 @@ def run_dashboard():
 
 if __name__ == "__main__":
     load_config()
-    threading.Thread(target=run_bot, daemon=True).start()
+    bot = run_pool if len(config.get("browser_sessions", [])) > 1 else run_bot
+    threading.Thread(target=bot, daemon=True).start()
     run_dashboard()
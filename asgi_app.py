@@ -0,0 +1,133 @@
+import asyncio
+import os
+from urllib.parse import parse_qs
+
+import admin_api
+import app2
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics
+from runtime_state import MemoryState
+
+# ---------------------------
+# نسخة ASGI من app2.py (asyncio)
+# ---------------------------
+# نفس المسارات: POST /webhook ولوحة التحكم على /
+# التشغيل: uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+#
+# منطق الرد هو نفسه app2.reply_for: الإعدادات من ConfigCache (تُحدّث في
+# thread بالخلفية) والإرسال الخاص يذهب لـ SendQueue. حالة التشغيل في الذاكرة
+# (MemoryState) يُرد بها مباشرة، أما RUNTIME_STATE=... (SQLite، قد ينتظر قفل
+# الكتابة) فيعمل reply_for في thread. ما يلمس القرص (حفظ اللوحة و/api) يعمل
+# في thread منفصل أيضاً حتى لا يوقف الـ event loop.
+
+HTML_TYPE = b"text/html; charset=utf-8"
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def parse_form(raw):
+    return {k: v[0] for k, v in parse_qs(raw.decode("utf-8"), keep_blank_values=True).items()}
+
+
+async def respond(send, status, body=b"", headers=(), content_type=HTML_TYPE):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def webhook(scope, receive, send):
+    lap = metrics.stopwatch()
+    form = parse_form(await read_body(receive))
+    # مثل request.values في Flask: معاملات الرابط لها الأولوية
+    form.update(parse_form(scope.get("query_string", b"")))
+    if isinstance(app2.runtime, MemoryState):
+        body, status = app2.reply_for(form, lap)
+    else:
+        body, status = await asyncio.to_thread(app2.reply_for, form, lap)
+    await respond(send, status, body)
+
+
+async def prometheus_metrics(scope, receive, send):
+    await respond(send, 200, metrics.render(), content_type=METRICS_CONTENT_TYPE.encode())
+
+
+async def dashboard(scope, receive, send):
+    if scope["method"] == "POST":
+        form = parse_form(await read_body(receive))
+        target, status = await asyncio.to_thread(app2.save_dashboard_form, form)
+        if status:
+            return await respond(send, status, target)
+        return await respond(send, 302, headers=[(b"location", target.encode("utf-8"))])
+
+    headers = dict(scope.get("headers", ()))
+    status, page_headers, body = app2.PAGE.respond(
+        app2.store.get(), parse_form(scope.get("query_string", b"")),
+        headers.get(b"accept-encoding", b"").decode("latin-1"), headers.get(b"if-none-match", b"").decode("latin-1"))
+    raw = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in page_headers]
+    await send({"type": "http.response.start", "status": status, "headers": raw})
+    if isinstance(body, bytes):
+        return await send({"type": "http.response.body", "body": body})
+    # صفحة كبيرة: كل جزء يُرسم في thread حتى لا يتوقف الـ event loop
+    while True:
+        chunk = await asyncio.to_thread(next, body, None)
+        if chunk is None:
+            break
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def admin(scope, receive, send):
+    body = await read_body(receive)
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", ())}
+    status, payload = await asyncio.to_thread(
+        admin_api.handle, app2.store, scope["method"], scope["path"][len("/api"):],
+        parse_form(scope.get("query_string", b"")), body, headers)
+    await respond(send, status, admin_api.dumps(payload), content_type=admin_api.JSON_TYPE.encode())
+
+
+ROUTES = {
+    "/webhook": (webhook, ("POST",)),
+    "/": (dashboard, ("GET", "POST")),
+    "/metrics": (prometheus_metrics, ("GET",)),
+}
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                app2.store.get()  # يشغّل مراقبة config.json في هذه العملية
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await asyncio.to_thread(app2.outbox.join, 5)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    if scope["path"].startswith("/api/"):
+        return await admin(scope, receive, send)
+    route = ROUTES.get(scope["path"])
+    if route is None:
+        return await respond(send, 404, "Not Found")
+    handler, methods = route
+    if scope["method"] not in methods:
+        return await respond(send, 405, "Method Not Allowed")
+    await handler(scope, receive, send)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", "5000")))
@@ -0,0 +1,219 @@
+import atexit
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import deque
+
+# ---------------------------
+# سجل تدقيق للرسائل الواردة والردود (JSONL)
+# ---------------------------
+# الـ webhook يضيف السجل إلى buffer في الذاكرة ويرجع فوراً؛ thread في الخلفية
+# يحوّله إلى JSON ويكتب الدفعة كلها بـ write واحد كل flush_interval ثانية
+# (أو فوراً عند تجمع batch سجل).
+#
+#   {"ts": 1760788800.1, "dir": "in", "MessageSid": "SM..", "From": "..", "Body": "..", "ProfileName": ".."}
+#   {"ts": 1760788800.1, "dir": "out", "MessageSid": "SM..", "To": "..", "Body": "..", "rule": ".."}
+#
+# نفس حقول Twilio، فيمكن تمرير الملف مباشرة إلى replay.py (يتجاهل "out").
+#
+# التدوير: عند max_bytes أو بعد max_age ثانية يُنقل الملف إلى
+# audit.jsonl.<التاريخ> ويُضغط gzip في thread منفصل، ويبقى آخر keep ملفات
+# (مع {pid}: آخر keep لكل العمليات معاً، بما فيها عمليات أُعيد تشغيلها).
+#
+# إذا امتلأ الـ buffer (القرص بطيء أو متوقف) لا ينتظر الـ webhook أبداً: السجل
+# الجديد يُهمل ويُعد في dropped، وأول كتابة بعدها تضيف سطراً
+# {"dir": "gap", "dropped": N} حتى تظهر الفجوة في السجل نفسه.
+#
+#   AUDIT_LOG=audit.jsonl (الافتراضي)، AUDIT_LOG=off للإيقاف، و{pid} في
+#   المسار لملف لكل عملية مع launcher.py
+
+DEFAULT_PATH = "audit.jsonl"
+
+
+class AuditLog:
+    def __init__(self, path=DEFAULT_PATH, maxsize=10_000, batch=500, flush_interval=1.0,
+                 max_bytes=64 << 20, max_age=86400.0, keep=30, compress=True):
+        self.path_template = path
+        self.path = None
+        self.maxsize = maxsize
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.keep = keep
+        self.compress = compress
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._buffer = deque()
+        self._gap = 0
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        # dropped/_gap من threads الطلبات؛ قفل منفصل حتى لا ينتظر الـ webhook الكتابة
+        self._gap_lock = threading.Lock()
+        self._file = None
+        self._opened_at = 0.0
+        self._pid = None
+
+    def log(self, record):
+        # record: dict جديد لا يُعدّل بعدها؛ False إذا أُهمل لأن الـ buffer ممتلئ
+        if self.path_template is None:
+            return True
+        if self._pid != os.getpid():
+            self.start()
+        if len(self._buffer) >= self.maxsize:
+            with self._gap_lock:
+                self.dropped += 1
+                self._gap += 1
+            return False
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch:
+            self._wake.set()
+        return True
+
+    def inbound(self, sid, sender, body, profile_name=""):
+        return self.log({"ts": time.time(), "dir": "in", "MessageSid": sid, "From": sender,
+                         "Body": body, "ProfileName": profile_name})
+
+    def reply(self, sid, to, body, rule=None):
+        return self.log({"ts": time.time(), "dir": "out", "MessageSid": sid, "To": to,
+                         "Body": body, "rule": rule})
+
+    def pending(self):
+        return len(self._buffer)
+
+    def start(self):
+        # الـ threads لا تنتقل مع fork، لذلك نشغلها مرة في كل عملية
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.path = self.path_template.format(pid=self._pid)
+            self._file = None
+            self._buffer.clear()
+        threading.Thread(target=self._run, name="audit-log", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print("⚠️ تعذرت كتابة سجل التدقيق:", e)
+
+    def flush(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            buf = self._buffer
+            records = [buf.popleft() for _ in range(len(buf))]
+            with self._gap_lock:
+                gap, self._gap = self._gap, 0
+            if gap:
+                records.append({"ts": time.time(), "dir": "gap", "dropped": gap})
+            if not records:
+                if self._file is not None and time.time() - self._opened_at >= self.max_age:
+                    self._rotate()
+                return
+            data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records).encode("utf-8")
+            f = self._open()
+            f.write(data)
+            f.flush()
+            self.written += len(records) - (1 if gap else 0)
+            if f.tell() >= self.max_bytes or time.time() - self._opened_at >= self.max_age:
+                self._rotate()
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+            # عمر الملف من أول سطر فيه، حتى بعد إعادة التشغيل
+            try:
+                with open(self.path, "rb") as f:
+                    first = json.loads(f.readline() or "{}")
+                self._opened_at = float(first.get("ts", time.time()))
+            except (OSError, ValueError, TypeError, AttributeError):
+                self._opened_at = time.time()
+        return self._file
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        target = f"{self.path}.{stamp}"
+        n = 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target = f"{self.path}.{stamp}-{n}"
+            n += 1
+        os.replace(self.path, target)
+        self.rotations += 1
+        threading.Thread(target=self._finish_segment, args=(target,), name="audit-gzip", daemon=True).start()
+
+    def _finish_segment(self, segment):
+        try:
+            if self.compress:
+                with open(segment, "rb") as src, gzip.open(segment + ".gz.tmp", "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                # وقت آخر كتابة في المقطع وليس وقت الضغط (ترتيب _prune)
+                st = os.stat(segment)
+                os.utime(segment + ".gz.tmp", ns=(st.st_atime_ns, st.st_mtime_ns))
+                os.replace(segment + ".gz.tmp", segment + ".gz")
+                os.remove(segment)
+            self._prune()
+        except OSError as e:
+            print("⚠️ تعذر ضغط سجل التدقيق:", segment, e)
+
+    def _prune(self):
+        # آخر keep مقاطع لكل العمليات معاً حسب وقت التعديل (الترتيب بالاسم يضع
+        # "-1" قبل المقطع الأصلي)، ومعها ملفات عمليات {pid} انتهت ولم تُدوّر
+        directory = os.path.dirname(os.path.abspath(self.path))
+        head, pid, tail = os.path.basename(self.path_template).partition("{pid}")
+        pattern = re.compile(re.escape(head) + (r"(\d+)" if pid else "()") + re.escape(tail)
+                             + r"(\.\d{8}-\d{6}(?:-(\d+))?.*|\..+)?")
+        segments = []
+        for name in os.listdir(directory):
+            m = pattern.fullmatch(name)
+            if m is None or name.endswith(".tmp"):
+                continue
+            if m.group(2) is None and (not m.group(1) or _alive(int(m.group(1)))):
+                continue
+            try:
+                # نفس الوقت (دقة نظام الملفات): رقم -N يحدد الأحدث
+                segments.append((os.stat(os.path.join(directory, name)).st_mtime_ns, int(m.group(3) or 0), name))
+            except OSError:
+                pass
+        segments.sort()
+        for _, _, name in segments[:max(0, len(segments) - self.keep)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def make_audit_log():
+    path = os.environ.get("AUDIT_LOG", DEFAULT_PATH)
+    return AuditLog(None if path.lower() in ("", "off", "0") else path,
+                    maxsize=int(os.environ.get("AUDIT_BUFFER", "10000")),
+                    max_bytes=int(float(os.environ.get("AUDIT_MAX_MB", "64")) * (1 << 20)))
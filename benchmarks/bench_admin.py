@@ -0,0 +1,109 @@
+# تعديل مجموعة واحدة في config كبير: قبل (الإعدادات كاملة، store.save ثم
+# reload كما كانت لوحة التحكم) وبعد (store.patch: سطر في config.json.journal)،
+# وعملية ثانية تلتقط التعديل: reload كامل مقابل check (الأسطر الجديدة فقط).
+# ثم صفحة واحدة من بحث /api/groups، وزمن snapshot.patched() وحده (في الذاكرة):
+# الكتابة O(التعديل) لكن الـ snapshot الجديدة تنسخ فهارس المجموعات (O(عدد
+# المجموعات)) أو تعيد بناء القواعد كلها عند تعديل كلمة (O(عدد الكلمات)).
+#   python benchmarks/bench_admin.py [--groups 1000 10000 100000] [--keywords 200] [--edits 50]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from admin_api import paginate, VIEWS  # noqa: E402
+from config_cache import ConfigCache, read_config, write_config  # noqa: E402
+from config_patch import normalize  # noqa: E402
+
+
+def make_config(path, groups, keywords):
+    write_config(path, {
+        "keywords": ["مرحبا", "Hello", "مساعدة"] + [f"kw{i}" for i in range(keywords)],
+        "allowed_groups": [
+            {"id": f"{i:09d}-123456@g.us", "name": f"group {i}", "reply_type": "group",
+             "template": "ar" if i % 2 else "en", "custom_reply": ""}
+            for i in range(groups)
+        ],
+        "group_reply_template_ar": "تفضل {user}، سيتم التواصل معك.",
+        "group_reply_template_en": "Hi {user}, we will contact you shortly.",
+    })
+
+
+def edit(i, groups):
+    gid = f"{(i * 7919) % groups:09d}-123456@g.us"
+    return gid, {"id": gid, "name": f"renamed {i}", "reply_type": "group", "template": "custom",
+                 "custom_reply": f"رد {i}"}
+
+
+def ms(seconds, n):
+    return seconds / n * 1000
+
+
+def run(groups, keywords, edits):
+    path = os.path.join(tempfile.mkdtemp(), "config.json")
+    make_config(path, groups, keywords)
+    writer, reader = ConfigCache(path), ConfigCache(path)
+    # بدون دمج أثناء القياس
+    writer.storage.compact_bytes = float("inf")
+
+    save = reload = 0.0
+    for i in range(edits):
+        gid, grp = edit(i, groups)
+        t0 = time.perf_counter()
+        cfg = read_config(path)
+        cfg["allowed_groups"] = [grp if g["id"] == gid else g for g in cfg["allowed_groups"]]
+        writer.save(cfg)
+        t1 = time.perf_counter()
+        reader.reload()
+        t2 = time.perf_counter()
+        save += t1 - t0
+        reload += t2 - t1
+
+    patch = check = 0.0
+    for i in range(edits):
+        gid, grp = edit(i + edits, groups)
+        t0 = time.perf_counter()
+        writer.patch([{"op": "replace", "path": f"/allowed_groups/{gid}", "value": grp}])
+        t1 = time.perf_counter()
+        reader.check()
+        t2 = time.perf_counter()
+        patch += t1 - t0
+        check += t2 - t1
+    assert reader.current.to_dict() == writer.current.to_dict() == read_config(path)
+
+    snap = reader.current
+    t0 = time.perf_counter()
+    page = paginate(snap.groups.groups, "group 99", 2, 50, VIEWS["groups"][1])
+    search = time.perf_counter() - t0
+
+    group_ops = normalize([{"op": "replace", "path": f"/allowed_groups/{edit(0, groups)[0]}",
+                            "value": edit(0, groups)[1]}])
+    keyword_ops = normalize([{"op": "replace", "path": "/keywords/kw7", "value": "kw7-renamed"}])
+    in_memory = {}
+    for label, ops in (("group", group_ops), ("keyword", keyword_ops)):
+        t0 = time.perf_counter()
+        for _ in range(edits):
+            snap.patched(ops)
+        in_memory[label] = ms(time.perf_counter() - t0, edits)
+    print(f"{groups:>7} groups: save {ms(save, edits):8.2f} ms -> patch {ms(patch, edits):6.2f} ms | "
+          f"reload {ms(reload, edits):8.2f} ms -> check {ms(check, edits):6.2f} ms | "
+          f"search {search * 1000:6.2f} ms ({page['total']} hits)")
+    print(f"{'':>16}patched() in memory: group edit {in_memory['group']:6.2f} ms, "
+          f"keyword edit {in_memory['keyword']:6.2f} ms ({len(snap.cfg['keywords'])} keywords)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="config edit cost: full save vs journal patch")
+    parser.add_argument("--groups", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--keywords", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=50)
+    args = parser.parse_args()
+    for groups in args.groups:
+        run(groups, args.keywords, args.edits)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# مقارنة حمل: app2.py (Flask dev server) مقابل asgi_app.py (uvicorn)
+# كل سيرفر في عملية منفصلة، والعميل عدة threads باتصالات keep-alive
+# التشغيل: python benchmarks/bench_asgi.py [--clients 16] [--seconds 5]
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "flask": [sys.executable, "-c", "import sys, app2; app2.app.run(port=int(sys.argv[1]), threaded=True)"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi_app:app", "--log-level", "warning", "--port"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on {port} did not start")
+
+
+def make_config(path, groups=1000):
+    cfg = {
+        "keywords": ["مرحبا", "Hello", "مساعدة"],
+        "allowed_groups": [{"id": f"whatsapp:+1{i:010d}", "name": f"g{i}", "reply_type": "group",
+                            "template": "ar", "custom_reply": ""} for i in range(groups)],
+        "group_reply_template_ar": "تفضل {user}، سيتم التواصل معك.",
+        "group_reply_template_en": "Hi {user}, we will contact you shortly.",
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cfg, f, ensure_ascii=False)
+
+
+def load(port, clients, seconds):
+    latencies = []
+    errors = [0]
+    stop = time.perf_counter() + seconds
+
+    def client(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        local = []
+        i = 0
+        while time.perf_counter() < stop:
+            body = urlencode({"Body": "مرحبا أريد مساعدة", "From": f"whatsapp:+1{(n * 7919 + i) % 1000:010d}"})
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", "/webhook", body, headers)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status != 200:
+                    errors[0] += 1
+            except (OSError, http.client.HTTPException):
+                errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port)
+                continue
+            local.append(time.perf_counter() - t0)
+            i += 1
+        latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000 if latencies else 0
+    return len(latencies) / elapsed, pct(50), pct(99), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    make_config(os.path.join(workdir, "config.json"))
+    env = dict(os.environ, PYTHONPATH=ROOT, TWILIO_ACCOUNT_SID="AC" + "0" * 32, TWILIO_AUTH_TOKEN="x")
+    for name, cmd in SERVERS.items():
+        port = free_port()
+        proc = subprocess.Popen(cmd + [str(port)], cwd=workdir, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(port)
+            rps, p50, p99, errors = load(port, args.clients, args.seconds)
+            print(f"{name:>6}: {rps:8.0f} req/s  p50 {p50:6.2f} ms  p99 {p99:7.2f} ms  errors {errors}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
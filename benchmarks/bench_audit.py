@@ -0,0 +1,96 @@
+# سجل التدقيق (audit_log.py) مقابل الكتابة المباشرة داخل الـ webhook
+# التشغيل: python benchmarks/bench_audit.py [--records 200000]
+#
+#   record only        بناء السجل فقط (الأساس للمقارنة)
+#   sync open/append   فتح الملف وكتابة السطر لكل رسالة
+#   sync write+flush   ملف مفتوح، json.dumps + write + flush لكل رسالة
+#   AuditLog.log       إضافة للـ buffer فقط (الكتابة في الخلفية)
+# ثم: زمن تفريغ كل السجلات، التدوير والضغط (max_bytes صغير)، وسلوك الـ
+# buffer الممتلئ عندما يتوقف القرص (thread الكتابة لا يعمل).
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audit_log import AuditLog  # noqa: E402
+
+
+def record(i):
+    return {"ts": time.time(), "dir": "in", "MessageSid": f"SM{i:032d}", "From": "whatsapp:+201000000000",
+            "Body": f"رسالة رقم {i} أحتاج مساعدة", "ProfileName": "Sara"}
+
+
+def per_call(label, fn, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(record(i))
+    us = (time.perf_counter() - t0) / n * 1e6
+    print(f"{label:>20}: {us:7.2f} us per message (including building the record)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="audit log benchmark")
+    parser.add_argument("--records", type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.records
+    tmp = tempfile.mkdtemp()
+
+    per_call("record only", lambda r: None, n)
+
+    path = os.path.join(tmp, "sync1.jsonl")
+
+    def open_append(r):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    per_call("sync open/append", open_append, min(n, 50_000))
+
+    f = open(os.path.join(tmp, "sync2.jsonl"), "a", encoding="utf-8")
+
+    def write_flush(r):
+        f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        f.flush()
+    per_call("sync write+flush", write_flush, n)
+    f.close()
+
+    audit = AuditLog(os.path.join(tmp, "audit.jsonl"), maxsize=n + 1)
+    per_call("AuditLog.log", audit.log, n)
+    t0 = time.perf_counter()
+    while audit.pending():
+        time.sleep(0.01)
+    audit.close()
+    print(f"background flush caught up {time.perf_counter() - t0:.2f} s after the last record, "
+          f"{audit.written} written, {audit.dropped} dropped")
+
+    rot = AuditLog(os.path.join(tmp, "rot", "audit.jsonl"), maxsize=n + 1, max_bytes=2 << 20, keep=5)
+    os.makedirs(os.path.join(tmp, "rot"))
+    for i in range(n):
+        rot.log(record(i))
+    while rot.pending():
+        time.sleep(0.01)
+    rot.close()
+    time.sleep(1.0)  # الضغط في thread منفصل
+    files = sorted(os.listdir(os.path.join(tmp, "rot")))
+    sizes = sum(os.path.getsize(os.path.join(tmp, "rot", x)) for x in files if x.endswith(".gz"))
+    print(f"rotation at 2 MB: {rot.rotations} rotations, kept {len(files)} files "
+          f"({sum(x.endswith('.gz') for x in files)} gzip, {sizes / 1e6:.2f} MB compressed)")
+
+    full = AuditLog(os.path.join(tmp, "full.jsonl"), maxsize=1000, flush_interval=3600)
+    full._pid = os.getpid()  # بدون thread الكتابة: القرص "متوقف"
+    t0 = time.perf_counter()
+    accepted = sum(full.log(record(i)) for i in range(5000))
+    us = (time.perf_counter() - t0) / 5000 * 1e6
+    full.path = full.path_template
+    full.close()
+    with open(full.path, encoding="utf-8") as f:
+        last = json.loads(f.readlines()[-1])
+    print(f"full buffer: {accepted} accepted, {full.dropped} dropped, {us:.2f} us per call, "
+          f"last line {last['dir']} dropped={last.get('dropped')}")
+
+
+if __name__ == "__main__":
+    main()
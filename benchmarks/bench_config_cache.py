@@ -0,0 +1,58 @@
+# عدد الطلبات في الثانية على /webhook مع config فيه 5k مجموعة:
+# قبل (قراءة config.json وتجهيزه في كل طلب كما كان app2.py) وبعد (ConfigCache)
+# التشغيل: python benchmarks/bench_config_cache.py
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+GROUPS = 5000
+REQUESTS = 2000
+
+
+def make_config(path):
+    cfg = {
+        "keywords": ["مرحبا", "Hello", "مساعدة"] + [f"kw{i}" for i in range(200)],
+        "allowed_groups": [
+            {"id": f"{i:09d}-123456@g.us", "name": f"group {i}", "reply_type": "group",
+             "template": "ar" if i % 2 else "en", "custom_reply": ""}
+            for i in range(GROUPS)
+        ],
+        "group_reply_template_ar": "تفضل {user}، سيتم التواصل معك.",
+        "group_reply_template_en": "Hi {user}, we will contact you shortly.",
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cfg, f, ensure_ascii=False, indent=2)
+
+
+def run(client, label):
+    forms = [{"Body": "مرحبا، أريد مساعدة", "From": f"{i % GROUPS:09d}-123456@g.us"} for i in range(REQUESTS)]
+    t0 = time.perf_counter()
+    for form in forms:
+        client.post("/webhook", data=form)
+    dt = time.perf_counter() - t0
+    print(f"{label:>28}: {REQUESTS / dt:8.0f} req/s")
+
+
+def main():
+    os.environ.setdefault("TWILIO_ACCOUNT_SID", "AC00000000000000000000000000000000")
+    os.environ.setdefault("TWILIO_AUTH_TOKEN", "x")
+    os.chdir(tempfile.mkdtemp())
+    make_config("config.json")
+    import app2
+    from config_cache import ConfigSnapshot
+
+    client = app2.app.test_client()
+    cached_get = app2.store.get
+    app2.store.get = lambda: ConfigSnapshot(app2.load_config())
+    run(client, "before (parse per request)")
+    app2.store.get = cached_get
+    run(client, "after (ConfigCache)")
+
+
+if __name__ == "__main__":
+    main()
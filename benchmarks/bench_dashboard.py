@@ -0,0 +1,80 @@
+# GET / للوحة app2 مع config فيه --groups مجموعة:
+# قبل (render_template_string في كل طلب) وبعد (PageCache: نفس الصفحة من
+# الكاش، 304 مع If-None-Match، gzip)، ثم صفحة كبيرة (per_page=500) تُرسل stream.
+#   python benchmarks/bench_dashboard.py [--groups 10000] [--requests 500]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config_cache import write_config  # noqa: E402
+
+
+def make_config(path, groups):
+    write_config(path, {
+        "keywords": ["مرحبا", "Hello", "مساعدة"] + [f"kw{i}" for i in range(2000)],
+        "allowed_groups": [
+            {"id": f"{i:09d}-123456@g.us", "name": f"group {i}", "reply_type": "group",
+             "template": "ar" if i % 2 else "en", "custom_reply": ""}
+            for i in range(groups)
+        ],
+        "group_reply_template_ar": "تفضل {user}، سيتم التواصل معك.",
+        "group_reply_template_en": "Hi {user}, we will contact you shortly.",
+    })
+
+
+def run(client, label, requests, url="/", headers=None):
+    t0 = time.perf_counter()
+    for _ in range(requests):
+        r = client.get(url, headers=headers or {})
+        r.get_data()
+    dt = time.perf_counter() - t0
+    print(f"{label:>34}: {requests / dt:8.0f} req/s  status {r.status_code}, {len(r.get_data()):7d} bytes")
+    return r
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dashboard GET: render per request vs PageCache")
+    parser.add_argument("--groups", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    os.environ.setdefault("TWILIO_ACCOUNT_SID", "AC00000000000000000000000000000000")
+    os.environ.setdefault("TWILIO_AUTH_TOKEN", "x")
+    os.environ.setdefault("AUDIT_LOG", "off")
+    os.chdir(tempfile.mkdtemp())
+    make_config("config.json", args.groups)
+    import app2
+    from flask import render_template_string
+
+    client = app2.app.test_client()
+    with app2.app.test_request_context():
+        t0 = time.perf_counter()
+        for _ in range(args.requests):
+            render_template_string(app2.HTML, **app2.dashboard_context(app2.store.get(), {}))
+        dt = time.perf_counter() - t0
+    print(f"{'before (render_template_string)':>34}: {args.requests / dt:8.0f} req/s")
+    r = run(client, "after (cached page)", args.requests)
+    run(client, "after (gzip)", args.requests, headers={"Accept-Encoding": "gzip"})
+    run(client, "after (If-None-Match -> 304)", args.requests, headers={"If-None-Match": r.headers["ETag"]})
+
+    # per_page=500: أكثر من stream_rows (100) صف
+    app2.PAGE.size = 0  # بدون كاش: كل طلب يُرسم ويُرسل أثناء الرسم
+    first = []
+    for _ in range(20):
+        t0 = time.perf_counter()
+        r = client.get("/?per_page=500", buffered=False)
+        next(iter(r.response))
+        first.append(time.perf_counter() - t0)
+        r.get_data()
+    first.sort()
+    print(f"{'stream per_page=500':>34}: first chunk p50 {first[len(first) // 2] * 1000:6.2f} ms, "
+          f"{len(r.get_data())} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# استقبال الرسائل في app4 على fixtures/whatsapp_web.html (3 محادثات):
+#   poll last message  القراءة القديمة: find_elements + آخر رسالة، والرد بـ
+#                      find_element + send_keys + click
+#   MutationObserver   feed.poll() للمحادثة المفتوحة فقط
+#   batched scan       feed.scan() + فتح المحادثات غير المقروءة + send_message
+# يحتاج selenium و Chrome، أو --fake لتشغيل MessageFeed على whatsapp_stub.FakeDriver
+# (بدون الطريقة القديمة، فهي تقرأ عناصر الصفحة مباشرة):
+#   python benchmarks/bench_ingest.py [--rounds 200] [--burst 3] [--fake]
+#
+# لكل طريقة: طلبات WebDriver لكل رسالة معالجة (قراءة + رد)، الرسائل الفائتة،
+# والرسائل المعالجة مرتين. الرسائل تصل لمحادثات عشوائية.
+# في النهاية: إعادة تشغيل MessageFeed بنفس ملف الحالة لا تعيد أي رسالة،
+# وما وصل أثناء التوقف يُستلم مرة واحدة.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wa_ingest import OPEN_JS, MessageFeed, order_chats, send_message  # noqa: E402
+from whatsapp_stub import FakeDriver  # noqa: E402
+
+FIXTURE = "file://" + os.path.join(ROOT, "fixtures", "whatsapp_web.html")
+CHATS = ("120363000000000001@g.us", "120363000000000002@g.us", "201000000004@c.us")
+
+
+def make_driver():
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    driver = webdriver.Chrome(options=options)
+    # كل أمر WebDriver (ومنها أوامر WebElement) يمر عبر driver.execute
+    driver.calls = 0
+    execute = driver.execute
+
+    def counted(*args, **kwargs):
+        driver.calls += 1
+        return execute(*args, **kwargs)
+    driver.execute = counted
+    return driver
+
+
+def add_messages(driver, rnd, burst, counter, chats=CHATS):
+    texts = []
+    for _ in range(rnd.randint(0, burst)):
+        counter[0] += 1
+        text = f"msg {counter[0]} مساعدة"
+        if isinstance(driver, FakeDriver):
+            driver.receive(rnd.choice(chats), "User", text)
+        else:
+            driver.execute_script("window.waFixture.receive(arguments[0], arguments[1], 'User')",
+                                  rnd.choice(chats), text)
+        texts.append(text)
+    return texts
+
+
+def run_legacy(driver, rounds, burst, seed):
+    from selenium.webdriver.common.by import By
+    driver.get(FIXTURE)
+    rnd, counter = random.Random(seed), [0]
+    added, handled = [], []
+    calls = 0
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        added += add_messages(driver, rnd, burst, counter)
+        before = driver.calls
+        messages = driver.find_elements(By.CSS_SELECTOR, "span.selectable-text")
+        if messages:
+            text = messages[-1].text.strip()
+            handled.append(text)
+            if "مساعدة" in text:
+                box = driver.find_element(By.CSS_SELECTOR, "div[title='Type a message']")
+                box.send_keys("تفضل")
+                driver.find_element(By.CSS_SELECTOR, "span[data-icon='send']").click()
+        calls += driver.calls - before
+    return summary("poll last message", added, handled, calls, time.perf_counter() - t0)
+
+
+def run_observer(driver, rounds, burst, seed, state_path):
+    driver.get(FIXTURE)
+    rnd, counter = random.Random(seed), [0]
+    added, handled = [], []
+    feed = MessageFeed(driver, state_path)
+    feed.install()
+    calls = 0
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        added += add_messages(driver, rnd, burst, counter)
+        before = driver.calls
+        for msg in feed.poll():
+            handled.append(msg["text"].strip())
+            send_message(driver, "تفضل")
+        calls += driver.calls - before
+    return summary("MutationObserver", added, handled, calls, time.perf_counter() - t0)
+
+
+def run_batched(driver, rounds, burst, seed, state_path):
+    driver.get(FIXTURE)
+    rnd, counter = random.Random(seed), [0]
+    added, handled = [], []
+    feed = MessageFeed(driver, state_path)
+    feed.install()
+    unread, calls = [], 0
+    t0 = time.perf_counter()
+    for i in range(rounds + 10):
+        if i < rounds:  # آخر 10 دورات لقراءة ما بقي في المحادثات غير المقروءة
+            added += add_messages(driver, rnd, burst, counter)
+        before = driver.calls
+        unread, messages = feed.scan()
+        for msg in messages:
+            handled.append(msg["text"].strip())
+            send_message(driver, "تفضل")
+        if unread:
+            feed.open_chat(order_chats(unread)[0])
+        calls += driver.calls - before
+    result = summary("batched scan", added, handled, calls, time.perf_counter() - t0)
+
+    # إعادة تشغيل: نفس الصفحة، MessageFeed جديد بنفس ملف الحالة
+    if isinstance(driver, FakeDriver):
+        driver.execute_script(OPEN_JS, driver.titles[CHATS[0]])
+    else:
+        driver.execute_script("window.waFixture.openChat(arguments[0])", CHATS[0])
+    again = MessageFeed(driver, state_path).install()
+    offline = add_messages(driver, random.Random(seed + 1), burst + 2, counter, chats=CHATS[:1])
+    backlog = [m["text"].strip() for m in MessageFeed(driver, state_path).install()]
+    print(f"restart: {len(again)} messages repeated; {len(offline)} arrived while stopped, "
+          f"{len(backlog)} received after restart ({'ok' if backlog == offline else 'MISMATCH'})")
+    return result
+
+
+def summary(label, added, handled, calls, seconds):
+    wanted = set(added)
+    processed = len(wanted & set(handled))
+    missed = len(wanted) - processed
+    duplicates = len(handled) - len(set(handled))
+    per = calls / processed if processed else float("inf")
+    return (f"{label:>20}: {calls:6d} WebDriver calls, {per:6.2f} per processed message, "
+            f"{missed:5d} missed of {len(added)}, {duplicates:5d} processed again, {seconds:6.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="app4 message ingestion benchmark")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--burst", type=int, default=3, help="max messages arriving between two polls")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--fake", action="store_true", help="whatsapp_stub.FakeDriver instead of Chrome")
+    args = parser.parse_args()
+
+    state = os.path.join(tempfile.mkdtemp(), "ingest_state.json")
+    if args.fake:
+        # FakeDriver يحتفظ بالتاريخ بعد get() كواتساب الحقيقي، والـ fixture يبدأ فارغاً: driver لكل طريقة
+        print(run_observer(FakeDriver(), args.rounds, args.burst, args.seed, state + ".observer"))
+        print(run_batched(FakeDriver(), args.rounds, args.burst, args.seed, state))
+        return
+    driver = make_driver()
+    try:
+        print(run_legacy(driver, args.rounds, args.burst, args.seed))
+        print(run_observer(driver, args.rounds, args.burst, args.seed, state + ".observer"))
+        print(run_batched(driver, args.rounds, args.burst, args.seed, state))
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
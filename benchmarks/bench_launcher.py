@@ -0,0 +1,66 @@
+# زمن بدء launcher.py وذاكرة كل worker مع config كبير
+# التشغيل: python benchmarks/bench_launcher.py [--groups 50000] [--keywords 5000] [--workers 4]
+import argparse
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_config(path, groups, keywords):
+    rnd = random.Random(1)
+    letters = "ابتثجحخدذرزسشصضطظعغفقكلمنهويabcdefghijklmnopqrstuvwxyz"
+    cfg = {
+        "keywords": sorted({"".join(rnd.choice(letters) for _ in range(rnd.randint(4, 10))) for _ in range(keywords)}),
+        "allowed_groups": [{"id": f"{i:012d}-123456@g.us", "name": f"مجموعة {i}", "reply_type": "group",
+                            "template": ("ar", "en", "custom")[i % 3], "custom_reply": f"أهلاً {{user}} في {{group}} #{i}"}
+                           for i in range(groups)],
+        "group_reply_template_ar": "تفضل {user}، سيتم التواصل معك.",
+        "group_reply_template_en": "Hi {user}, we will contact you shortly.",
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cfg, f, ensure_ascii=False)
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--groups", type=int, default=50000)
+    parser.add_argument("--keywords", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    size = make_config(os.path.join(workdir, "config.json"), args.groups, args.keywords)
+    print(f"config.json: {size / 1e6:.1f} MB, {args.groups} groups, {args.keywords} keywords")
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, PYTHONPATH=ROOT, TWILIO_ACCOUNT_SID="AC" + "0" * 32, TWILIO_AUTH_TOKEN="x")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "launcher.py"), "--host", "127.0.0.1",
+                             "--port", str(port), "--workers", str(args.workers)],
+                            cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        lines = 0
+        for line in proc.stdout:
+            print(line.rstrip())
+            lines += 1
+            if lines == 3 + args.workers:
+                break
+        print(f"wall time to report: {(time.perf_counter() - t0) * 1000:.0f} ms")
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
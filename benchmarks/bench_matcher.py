@@ -0,0 +1,59 @@
+# مقارنة الحلقة القديمة مع KeywordMatcher عند 10 و 1k و 10k كلمة
+# التشغيل: python benchmarks/bench_matcher.py
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from keyword_matcher import KeywordMatcher
+
+AR = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+EN = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_keywords(n, rnd):
+    kws = set()
+    while len(kws) < n:
+        alpha = AR if rnd.random() < 0.5 else EN
+        kws.add("".join(rnd.choice(alpha) for _ in range(rnd.randint(4, 12))))
+    return list(kws)
+
+
+def make_messages(keywords, rnd, count=200):
+    msgs = []
+    for _ in range(count):
+        words = ["".join(rnd.choice(AR + EN) for _ in range(rnd.randint(2, 8))) for _ in range(12)]
+        if rnd.random() < 0.3:
+            words.insert(rnd.randrange(len(words)), rnd.choice(keywords).upper())
+        msgs.append(" ".join(words))
+    return msgs
+
+
+def old_loop(keywords, incoming_msg):
+    for kw in keywords:
+        if kw.lower() in incoming_msg.lower():
+            return kw
+    return None
+
+
+def main():
+    rnd = random.Random(42)
+    print(f"{'keywords':>9} {'loop us/msg':>12} {'matcher us/msg':>15} {'build ms':>9}")
+    for n in (10, 1000, 10000):
+        keywords = make_keywords(n, rnd)
+        msgs = make_messages(keywords, rnd)
+        t0 = timeit.default_timer()
+        m = KeywordMatcher(keywords)
+        build = (timeit.default_timer() - t0) * 1000
+        for msg in msgs:
+            assert m.first(msg) == old_loop(keywords, msg)
+        reps = 3 if n >= 10000 else 20
+        loop = timeit.timeit(lambda: [old_loop(keywords, x) for x in msgs], number=reps)
+        fast = timeit.timeit(lambda: [m.first(x) for x in msgs], number=reps)
+        per = reps * len(msgs)
+        print(f"{n:>9} {loop / per * 1e6:>12.1f} {fast / per * 1e6:>15.1f} {build:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# BrowserPool (wa_pool.py) مع FakeDriver بدل Chrome، فلا يحتاج selenium:
+#   python benchmarks/bench_pool.py [--messages 240] [--seconds 4] [--latency 0.02]
+#
+# كل جلسة حساب مستقل يستقبل نصيب من نفس الرسائل على 3 محادثات، وكل طلب
+# WebDriver يأخذ --latency ثانية كما في Chrome حقيقي. لكل عدد جلسات: ردود في
+# الثانية، زمن الرد (من وصول الرسالة حتى الإرسال) p50/p95، والردود المكررة.
+# في النهاية: جلسة تنهار عمليتها بعد --crash-after طلب، والـ supervisor يعيدها
+# ويكمل من ingest_state.<name>.json بدون تكرار أي رد. الـ watermark يُحفظ قبل
+# الرد، فالرسائل المستلمة التي لم يُرسل ردها لحظة الانهيار تضيع (missed).
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from functools import partial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config_cache import write_config  # noqa: E402
+from wa_pool import BrowserPool  # noqa: E402
+from whatsapp_stub import DEFAULT_CHATS, fake_session  # noqa: E402
+
+KEYWORD = "مساعدة"
+
+
+def decide(msg):
+    return ["تفضل"] if KEYWORD in msg["text"] else []
+
+
+def make_traffic(count, seconds, seed):
+    # رسالة قديمة في كل محادثة قبل البداية (بوت كان يعمل سابقاً ومعه watermark)
+    rnd = random.Random(seed)
+    chats = list(DEFAULT_CHATS)
+    history = [(-1.0 + i / 10, jid, "User", "hello") for i, jid in enumerate(chats)]
+    return history + sorted((rnd.uniform(0, seconds), rnd.choice(chats), "User", f"msg {i} {KEYWORD}")
+                            for i in range(count))
+
+
+def seed_state(state_dir, name, traffic):
+    # نفس صيغة ids في FakeDriver
+    marks = {}
+    for i, (offset, jid, _, _) in enumerate(traffic):
+        if offset < 0:
+            suffix = "_201000000009@c.us" if jid.endswith("@g.us") else ""
+            marks[jid] = f"false_{jid}_FAKE{i}{suffix}"
+    write_config(os.path.join(state_dir, f"ingest_state.{name}.json"), marks)
+
+
+def run(sessions, messages, seconds, latency, seed, crash_after=None, timeout=60.0):
+    # الرسائل تبدأ بعد ثانيتين حتى تجهز العمليات
+    start = time.time() + 2.0
+    state_dir = tempfile.mkdtemp()
+    traffic = {}
+    specs = []
+    for i in range(sessions):
+        name = f"s{i}"
+        traffic[name] = make_traffic(messages // sessions, seconds, seed + i)
+        seed_state(state_dir, name, traffic[name])
+        crash = crash_after if i == 0 else None
+        specs.append({"name": name, "factory": partial(fake_session, traffic[name], start, latency, crash)})
+
+    sent, delays = [], []
+
+    def on_sent(name, payload):
+        index = int(re.search(r"FAKE(\d+)", payload["message_id"]).group(1))
+        sent.append((name, payload["message_id"]))
+        delays.append(time.time() - start - traffic[name][index][0])
+
+    expected = sessions * (messages // sessions)
+    pool = BrowserPool(specs, decide, state_dir=state_dir, heartbeat_timeout=5.0, on_sent=on_sent)
+    pool.start()
+    try:
+        deadline = time.time() + timeout
+        last = (0, time.time())
+        while len(sent) < expected and time.time() < deadline:
+            pool.supervise_once()
+            if crash_after and pool.restarts["s0"]:
+                # انهيار واحد يكفي: الإعادة التالية بدون crash_after
+                pool.sessions["s0"]["factory"] = partial(fake_session, traffic["s0"], start, latency)
+            if len(sent) != last[0]:
+                last = (len(sent), time.time())
+            elif time.time() > max(start + seconds, last[1]) + 5:
+                break  # ردود ضاعت مع الانهيار ولن تصل
+            time.sleep(0.1)
+        elapsed = (last[1] if len(sent) == last[0] else time.time()) - start
+    finally:
+        pool.stop()
+
+    delays.sort()
+    p50 = delays[len(delays) // 2] if delays else float("nan")
+    p95 = delays[int(len(delays) * 0.95)] if delays else float("nan")
+    return {
+        "sessions": sessions, "sent": len(sent), "expected": expected, "seconds": elapsed,
+        "rate": len(sent) / elapsed, "p50": p50, "p95": p95,
+        "duplicates": len(sent) - len(set(sent)), "missed": expected - len(set(sent)), "restarts": sum(pool.restarts.values()),
+    }
+
+
+def report(r):
+    return (f"{r['sessions']} session(s): {r['sent']:4d}/{r['expected']} replies in {r['seconds']:5.2f} s, "
+            f"{r['rate']:6.1f} replies/s, latency p50 {r['p50'] * 1000:6.0f} ms p95 {r['p95'] * 1000:6.0f} ms, "
+            f"{r['duplicates']} duplicates, {r['missed']} missed, {r['restarts']} restarts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="app4 browser pool benchmark (fake WhatsApp driver)")
+    parser.add_argument("--messages", type=int, default=240)
+    parser.add_argument("--seconds", type=float, default=4.0, help="messages arrive spread over this window")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per WebDriver call")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--crash-after", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for n in args.sessions:
+        print(report(run(n, args.messages, args.seconds, args.latency, args.seed)))
+    r = run(2, args.messages, args.seconds, args.latency, args.seed, crash_after=args.crash_after)
+    print("crash:", report(r))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# كم رداً يُرسل في مجموعات نشطة مع وبدون حدود الردود، وزمن الفحص الواحد
+# التشغيل: python benchmarks/bench_rate_limit.py
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rate_limit import RateLimiter, parse_limits  # noqa: E402
+
+GROUPS = 200
+SENDERS = 5000
+MESSAGES = 200_000          # رسائل فيها كلمة مفتاحية
+SECONDS = 3600              # خلال ساعة
+
+LIMITS = {
+    "sender": {"cooldown": 30},
+    "group": {"per_minute": 6, "burst": 3},
+    "sender_group": {"cooldown": 300},
+}
+
+
+def traffic(seed=1):
+    rnd = random.Random(seed)
+    # توزيع غير متساوٍ: قلة من المجموعات والأشخاص يكتبون أغلب الرسائل
+    groups = [f"{i:09d}-123456@g.us" for i in range(GROUPS)]
+    senders = [f"whatsapp:+9665{i:08d}" for i in range(SENDERS)]
+    times = sorted(rnd.uniform(0, SECONDS) for _ in range(MESSAGES))
+    return [(t, senders[min(SENDERS - 1, int(rnd.paretovariate(1.2)) - 1)],
+             groups[min(GROUPS - 1, int(rnd.paretovariate(1.1)) - 1)]) for t in times]
+
+
+def main():
+    msgs = traffic()
+    for label, cfg in (("no limits", {}), ("with limits", {"rate_limits": LIMITS})):
+        limits = parse_limits(cfg)
+        limiter = RateLimiter()
+        t0 = time.perf_counter()
+        sent = sum(1 for now, sender, group in msgs if limiter.check(limits, sender, group, now=1000.0 + now) is None)
+        dt = time.perf_counter() - t0
+        print(f"{label:>12}: {sent:7d} replies of {len(msgs)} ({sent / len(msgs):6.1%}), "
+              f"{dt / len(msgs) * 1e6:5.2f} us/check, {len(limiter)} tracked keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# replay.py على سجل مولّد: رسائل في الثانية لكل عملية ولكل العمليات
+# التشغيل: python benchmarks/bench_replay.py [--messages 1000000] [--rules 200] [--distinct 20000]
+#
+# السجل: 30% من الرسائل فيها كلمة من القواعد، والمرسلون من 1000 مجموعة
+# نصفها في allowed_groups. مرة بنصوص كلها مختلفة، ومرة بنصوص تتكرر (--distinct
+# نص بتوزيع Zipf، أقرب لسجل حقيقي). المقارنة مع نسخة يتغير فيها قالب ربع
+# القواعد وتُحذف عُشرها.
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from replay import replay  # noqa: E402
+
+AR = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+EN = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_config(rules, groups, rnd):
+    words = ["".join(rnd.choice(AR if rnd.random() < 0.5 else EN) for _ in range(rnd.randint(4, 10)))
+             for _ in range(rules)]
+    cfg = {
+        "keywords": words[:10],
+        "allowed_groups": [{"id": g, "name": f"group {i}", "reply_type": "group", "template": "ar"}
+                           for i, g in enumerate(groups[::2])],
+        "group_reply_template_ar": "تفضل {user}",
+        "reply_rules": [{"match": w, "priority": rnd.randint(0, 50), "template": f"رد {i} {{name}}",
+                         "groups": [rnd.choice(groups)] if rnd.random() < 0.2 else []}
+                        for i, w in enumerate(words[10:])],
+    }
+    return cfg, words
+
+
+def make_text(words, rnd):
+    text = " ".join("".join(rnd.choice(AR + EN) for _ in range(rnd.randint(2, 8))) for _ in range(8))
+    if rnd.random() < 0.3:
+        text += " " + rnd.choice(words)
+    return text
+
+
+def write_log(path, count, words, groups, rnd, distinct=0):
+    # distinct=0: كل نص مختلف؛ غير ذلك نصوص من مجموعة بهذا الحجم بتوزيع Zipf
+    pool = [make_text(words, rnd) for _ in range(distinct)]
+    cum, total = [], 0.0
+    for i in range(distinct):
+        total += 1 / (i + 1)
+        cum.append(total)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            text = rnd.choices(pool, cum_weights=cum)[0] if pool else make_text(words, rnd)
+            f.write(json.dumps({"Body": text, "From": rnd.choice(groups), "ProfileName": f"user {i % 500}",
+                                "MessageSid": f"SM{i:032d}"}, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="offline replay throughput")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--rules", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    tmp = tempfile.mkdtemp()
+    groups = [f"1203630{i:011d}@g.us" for i in range(1000)]
+    cfg, words = make_config(args.rules, groups, rnd)
+    old, new, log = (os.path.join(tmp, n) for n in ("old.json", "new.json", "messages.jsonl"))
+    with open(old, "w", encoding="utf-8") as f:
+        json.dump(cfg, f, ensure_ascii=False)
+    for rule in cfg["reply_rules"][::4]:
+        rule["template"] = "رد جديد {name}"
+    del cfg["reply_rules"][::10]
+    with open(new, "w", encoding="utf-8") as f:
+        json.dump(cfg, f, ensure_ascii=False)
+    for distinct in (0, args.distinct):
+        write_log(log, args.messages, words, groups, rnd, distinct)
+        print(f"log: {args.messages} messages, {distinct or 'all'} distinct texts, "
+              f"{os.path.getsize(log) / 1e6:.0f} MB, {args.rules} rules")
+        for workers in sorted({1, args.workers}):
+            for configs in ([old], [old, new]):
+                t0 = time.perf_counter()
+                result = replay(log, configs, workers)
+                seconds = time.perf_counter() - t0
+                rate = result["messages"] / seconds
+                print(f"  {workers:2d} process(es), {len(configs)} config(s): {seconds:6.2f} s, "
+                      f"{rate:10,.0f} msg/s ({rate / workers:9,.0f} per process), {result['diffs']} diffs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# قواعد الرد (reply_rules.py) مقابل المرور على القواعد واحدة واحدة
+# التشغيل: python benchmarks/bench_rules.py
+#
+# لكل عدد قواعد (10% منها regex وربعها مقيد بمجموعات): زمن اختيار القاعدة
+# الفائزة لكل رسالة. الطريقة البسيطة ترتب القواعد حسب الأولوية وتجرب كل
+# واحدة (in أو re.search) حتى أول قاعدة تنطبق.
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reply_rules import RuleSet  # noqa: E402
+
+AR = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+EN = "abcdefghijklmnopqrstuvwxyz"
+GROUPS = [f"1203630000000{i:05d}@g.us" for i in range(50)]
+
+
+def make_rules(n, rnd):
+    rules = []
+    for i in range(n):
+        alpha = AR if rnd.random() < 0.5 else EN
+        word = "".join(rnd.choice(alpha) for _ in range(rnd.randint(4, 10)))
+        regex = rnd.random() < 0.1
+        rules.append({
+            "match": word + r"\s*#?\d+" if regex else word,
+            "regex": regex,
+            "groups": rnd.sample(GROUPS, 2) if rnd.random() < 0.25 else [],
+            "priority": rnd.randint(0, 100),
+            "template": f"reply {i}",
+        })
+    return rules
+
+
+def make_messages(rules, rnd, count=200):
+    msgs = []
+    for _ in range(count):
+        words = ["".join(rnd.choice(AR + EN) for _ in range(rnd.randint(2, 8))) for _ in range(12)]
+        if rnd.random() < 0.3:
+            rule = rnd.choice(rules)
+            word = rule["match"].split("\\")[0] + " #12" if rule["regex"] else rule["match"]
+            words.insert(rnd.randrange(len(words)), word.upper())
+        msgs.append((" ".join(words), rnd.choice(GROUPS + [None] * 10)))
+    return msgs
+
+
+def naive(rules):
+    ordered = sorted(rules, key=lambda r: -r["priority"])
+    compiled = [(re.compile(r["match"], re.I) if r["regex"] else r["match"].lower(), set(r["groups"]), r)
+                for r in ordered]
+
+    def match(text, group_id):
+        low = text.lower()
+        for m, groups, r in compiled:
+            if groups and group_id not in groups:
+                continue
+            if (m.search(text) if r["regex"] else m in low):
+                return r
+        return None
+    return match
+
+
+def main():
+    rnd = random.Random(1)
+    for n in (10, 100, 1000):
+        rules = make_rules(n, rnd)
+        msgs = make_messages(rules, rnd)
+        ruleset = RuleSet({"reply_rules": rules})
+        loop = naive(rules)
+        for text, gid in msgs:
+            a, b = ruleset.match(text, gid), loop(text, gid)
+            assert (a[0].template.text if a else None) == (b["template"] if b else None), text
+        number = 5
+        t_loop = timeit.timeit(lambda: [loop(t, g) for t, g in msgs], number=number) / (number * len(msgs))
+        t_set = timeit.timeit(lambda: [ruleset.match(t, g) for t, g in msgs], number=number) / (number * len(msgs))
+        print(f"{n:5d} rules: loop {t_loop * 1e6:8.1f} us/msg, RuleSet {t_set * 1e6:8.1f} us/msg "
+              f"({t_loop / t_set:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# حالة التشغيل لكل webhook (حجز MessageSid + 3 نطاقات حدود):
+#   batch واحد مقابل عملية لكل مفتاح، في الذاكرة وفي SQLite
+# ثم --workers عمليات على نفس ملف SQLite وكل رسالة تصل مرتين (إعادة Twilio)
+# لـ workers مختلفة: لا يجب أن يُرد على نفس الـ MessageSid مرتين.
+#   python benchmarks/bench_runtime_state.py [--messages 20000] [--workers 4]
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rate_limit import RateLimiter, blocked_by, limit_ops, parse_limits  # noqa: E402
+from runtime_state import MemoryState, SqliteState  # noqa: E402
+
+LIMITS = parse_limits({"rate_limits": {
+    "sender": {"cooldown": 30},
+    "group": {"per_minute": 6, "burst": 3},
+    "sender_group": {"cooldown": 300},
+}})
+RESPONSE = ['<?xml version="1.0" encoding="UTF-8"?><Response><Message>تفضل، سيتم التواصل معك.</Message></Response>', 200]
+
+
+def traffic(count, seed=1):
+    rnd = random.Random(seed)
+    times = sorted(rnd.uniform(0, 3600) for _ in range(count))
+    return [(f"SM{i:032x}", 1000.0 + t, f"whatsapp:+9665{min(4999, int(rnd.paretovariate(1.2)) - 1):08d}",
+             f"{min(199, int(rnd.paretovariate(1.1)) - 1):09d}-123456@g.us") for i, t in enumerate(times)]
+
+
+# الوقت يتقدم مع الحركة المحاكاة (ساعة كاملة) وليس مع الساعة الحقيقية
+NOW = [0.0]
+
+
+def clock():
+    return NOW[0]
+
+
+def counting(state):
+    # عدد مرات الوصول للتخزين (round trips)
+    execute = state._execute
+
+    def wrapper(ops, all_or_nothing):
+        state.trips += 1
+        return execute(ops, all_or_nothing)
+    state.trips = 0
+    state._execute = wrapper
+    return state
+
+
+def batched(state, sid, now, sender, group):
+    NOW[0] = now
+    batch = state.pipeline(all_or_nothing=True)
+    batch.set_nx(f"inbound:{sid}", RESPONSE, 3600)
+    checks = limit_ops(batch, LIMITS, sender, group, now)
+    results = batch.execute()
+    if results[0] is not None:
+        return "duplicate"
+    return None if batch.applied else blocked_by(checks, results)
+
+
+def separate(state, sid, now, sender, group):
+    # نفس العمل عملية بعملية (كما لو كان لكل مكوّن طلبه الخاص)
+    NOW[0] = now
+    if state.set_nx(f"inbound:{sid}", RESPONSE, 3600) is not None:
+        return "duplicate"
+    for scope, key in (("sender", sender), ("group", group), ("sender_group", f"{sender}|{group}")):
+        limit = LIMITS[scope]
+        if limit.cooldown and state.get(f"cd:{scope}:{key}") is not None:
+            return scope
+        if limit.rate:
+            window = limit.burst / limit.rate
+            if (state.get(f"rl:{scope}:{key}:{int(now // window)}") or 0) >= limit.burst:
+                return scope
+    for scope, key in (("sender", sender), ("group", group), ("sender_group", f"{sender}|{group}")):
+        limit = LIMITS[scope]
+        if limit.cooldown:
+            state.set(f"cd:{scope}:{key}", 1, limit.cooldown)
+        if limit.rate:
+            window = limit.burst / limit.rate
+            state.incr(f"rl:{scope}:{key}:{int(now // window)}", ttl=window)
+    return None
+
+
+def run(label, state, fn, msgs):
+    state = counting(state)
+    t0 = time.perf_counter()
+    sent = sum(1 for m in msgs if fn(state, *m) is None)
+    dt = time.perf_counter() - t0
+    print(f"{label:>26}: {dt / len(msgs) * 1e6:7.1f} us/webhook, {state.trips / len(msgs):4.2f} trips/webhook, "
+          f"{sent} replies")
+    return sent
+
+
+def worker(args):
+    path, msgs = args
+    state = SqliteState(path, clock=clock)
+    results = [(m[0], batched(state, *m)) for m in msgs]
+    return [sid for sid, r in results if r is None], sum(r == "duplicate" for _, r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="runtime state: one batch per webhook, memory vs SQLite")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    msgs = traffic(args.messages)
+    directory = tempfile.mkdtemp()
+
+    limiter = RateLimiter()
+    bucket = sum(1 for _, now, s, g in msgs if limiter.check(LIMITS, s, g, now=now) is None)
+    print(f"{'RateLimiter (token bucket)':>26}: {bucket} replies")
+    run("memory, batch", MemoryState(clock=clock), batched, msgs)
+    run("memory, op per key", MemoryState(clock=clock), separate, msgs)
+    run("sqlite, batch", SqliteState(os.path.join(directory, "a.db"), clock=clock), batched, msgs)
+    run("sqlite, op per key", SqliteState(os.path.join(directory, "b.db"), clock=clock), separate, msgs)
+
+    # كل رسالة مرتين، لـ worker مختلف في كل مرة
+    path = os.path.join(directory, "shared.db")
+    SqliteState(path)
+    shares = [[] for _ in range(args.workers)]
+    for i, m in enumerate(msgs):
+        shares[i % args.workers].append(m)
+        shares[(i + 1) % args.workers].append(m)
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        out = pool.map(worker, [(path, share) for share in shares])
+    dt = time.perf_counter() - t0
+    replied = [sid for o in out for sid in o[0]]
+    dups = sum(o[1] for o in out)
+    print(f"{f'sqlite, {args.workers} workers':>26}: {2 * len(msgs) / dt:7.0f} webhooks/s, {len(replied)} replies, "
+          f"{len(replied) - len(set(replied))} replied twice, {dups} retries answered from the claim")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# زمن بدء كل نقطة دخول في عملية جديدة:
+#   import   -X importtime: الزمن التراكمي لاستيراد الوحدة وأثقل ما تستورده
+#   first    من تشغيل العملية حتى أول رد (POST /webhook أو GET / لـ app3 و app4)
+# وأي مكتبة ثقيلة (twilio، selenium، pyautogui...) تم تحميلها حتى تلك اللحظة.
+# --root لمقارنة نسخة أخرى من المشروع (مثلاً git worktree قبل التعديل).
+#   python benchmarks/bench_startup.py [--runs 5] [--root PATH] [--top 5]
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = ("app", "app1", "app2", "asgi_app", "app3", "app4")
+HEAVY = ("twilio", "requests", "selenium", "webdriver_manager", "pyautogui", "pywhatkit")
+
+# يعمل داخل العملية الجديدة: يستورد الوحدة ويرسل أول طلب
+FIRST_RESPONSE = r"""
+import asyncio, sys
+sys.path.insert(0, ROOT)
+import importlib
+m = importlib.import_module(NAME)
+if NAME == "asgi_app":
+    out = []
+    async def receive():
+        return {"body": b"Body=hello&From=whatsapp%3A%2B10000000000"}
+    async def send(message):
+        out.append(message)
+    asyncio.run(m.app({"type": "http", "method": "POST", "path": "/webhook", "query_string": b""}, receive, send))
+    status = out[0]["status"]
+else:
+    client = getattr(m, "app", None) or m.flask_app
+    client = client.test_client()
+    if NAME in ("app3", "app4"):
+        status = client.get("/").status_code
+    else:
+        status = client.post("/webhook", data={"Body": "hello", "From": "whatsapp:+10000000000"}).status_code
+print(status, ",".join(h for h in HEAVY if h in sys.modules), flush=True)
+"""
+
+
+def environment(directory):
+    env = dict(os.environ)
+    env.update({"TWILIO_ACCOUNT_SID": "AC00000000000000000000000000000000", "TWILIO_AUTH_TOKEN": "x",
+                "AUDIT_LOG": "off"})
+    env.pop("RUNTIME_STATE", None)
+    return env
+
+
+def import_time(root, name, directory, env, top):
+    # أسطر importtime: "import time: self | cumulative | name"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import sys; sys.path.insert(0, {root!r}); import {name}"],
+                          cwd=directory, env=env, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.rstrip()))
+    total = next((us for us, module in rows if module.strip() == name), 0)
+    # الوحدات التي يستوردها name مباشرة (مستوى أول تحت الجذر)
+    depth = min((len(m) - len(m.lstrip()) for _, m in rows), default=0)
+    direct = sorted(((us, m.strip()) for us, m in rows if len(m) - len(m.lstrip()) == depth + 2), reverse=True)
+    return total / 1000, direct[:top]
+
+
+def first_response(root, name, directory, env):
+    code = FIRST_RESPONSE.replace("ROOT", repr(root)).replace("NAME", repr(name)).replace("HEAVY", repr(HEAVY))
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], cwd=directory, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if proc.returncode:
+        return None, proc.stderr.strip().splitlines()[-1]
+    status, _, heavy = proc.stdout.strip().rpartition("\n")[-1].partition(" ")
+    return elapsed * 1000, f"{status} loaded: {heavy or '-'}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="import time and time to first response per entry point")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--root", default=ROOT)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS))
+    args = parser.parse_args()
+    root = os.path.abspath(args.root)
+    # .pyc جاهزة في النسختين حتى لا يُقاس زمن الترجمة
+    subprocess.run([sys.executable, "-m", "compileall", "-q", root], check=True)
+
+    directory = tempfile.mkdtemp()
+    if os.path.exists(os.path.join(ROOT, "config.json")):
+        shutil.copy(os.path.join(ROOT, "config.json"), directory)
+    env = environment(directory)
+    for name in args.modules:
+        imports = [import_time(root, name, directory, env, args.top) for _ in range(args.runs)]
+        firsts = [first_response(root, name, directory, env) for _ in range(args.runs)]
+        if firsts[0][0] is None:
+            print(f"{name:>9}: failed: {firsts[0][1]}")
+            continue
+        total = statistics.median(t for t, _ in imports)
+        first = statistics.median(t for t, _ in firsts)
+        print(f"{name:>9}: import {total:7.1f} ms  first response {first:7.1f} ms  ({firsts[0][1]})")
+        print("           " + ", ".join(f"{m} {us / 1000:.0f}" for us, m in imports[-1][1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# config.json مقابل SQLite (config_sqlite.py) مع --groups مجموعة:
+#   load     قراءة الإعدادات كاملة (بدء العملية أو إعادة التحميل)
+#   save     حفظ كامل (save_versioned)
+#   patch    تعديل مجموعة واحدة (ConfigCache.patch)
+#   check    عملية أخرى تلتقط التعديل
+# ثم thread يقرأ من SQLite (مجموعة بالـ id + poll) أثناء حفظ كامل في thread آخر:
+# أطول قراءة يجب أن تبقى بالميلي ثانية (WAL: القارئ لا ينتظر الكاتب).
+#   python benchmarks/bench_storage.py [--groups 100000] [--edits 20]
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config_cache import ConfigCache, open_storage, read_config, write_config  # noqa: E402
+from config_sqlite import SQLiteStorage  # noqa: E402
+
+
+def make_config(groups):
+    return {
+        "keywords": ["مرحبا", "Hello", "مساعدة"] + [f"kw{i}" for i in range(2000)],
+        "allowed_groups": [
+            {"id": f"{i:09d}-123456@g.us", "name": f"group {i}", "reply_type": "group",
+             "template": "ar" if i % 2 else "en", "custom_reply": ""}
+            for i in range(groups)
+        ],
+        "group_reply_template_ar": "تفضل {user}، سيتم التواصل معك.",
+        "group_reply_template_en": "Hi {user}, we will contact you shortly.",
+        "rate_limits": {"sender": {"cooldown": 30, "per_minute": 0, "burst": 0}},
+    }
+
+
+def timed(fn, n=1):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - t0) / n * 1000
+
+
+def run(label, path, cfg, groups, edits):
+    storage = open_storage(path)
+    save = timed(lambda i: storage.save(dict(cfg)), 3)
+    load = timed(lambda i: storage.load(), 3)
+    writer, reader = ConfigCache(path), ConfigCache(path)
+    if hasattr(writer.storage, "compact_bytes"):
+        writer.storage.compact_bytes = float("inf")
+    patch = check = 0.0
+    for i in range(edits):
+        gid = f"{(i * 7919) % groups:09d}-123456@g.us"
+        grp = {"id": gid, "name": f"renamed {i}", "reply_type": "private", "template": "ar", "custom_reply": ""}
+        patch += timed(lambda _: writer.patch([{"op": "replace", "path": f"/allowed_groups/{gid}", "value": grp}]))
+        check += timed(lambda _: reader.check())
+    assert reader.current.to_dict() == writer.current.to_dict() == read_config(path)
+    print(f"{label:>7}: load {load:8.1f} ms  save {save:8.1f} ms  patch {patch / edits:6.2f} ms  "
+          f"check {check / edits:6.2f} ms  ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+def readers_during_save(path, cfg, groups):
+    storage = SQLiteStorage(path)
+    stop = threading.Event()
+    worst = [0.0]
+    reads = [0]
+
+    def reader():
+        db = storage._db()
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            db.execute("SELECT data FROM groups WHERE id = ?", (f"{reads[0] % groups:09d}-123456@g.us",)).fetchone()
+            storage.poll(-1)
+            worst[0] = max(worst[0], time.perf_counter() - t0)
+            reads[0] += 1
+
+    t = threading.Thread(target=reader)
+    t.start()
+    t0 = time.perf_counter()
+    storage.save(dict(cfg))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    t.join()
+    print(f"   sqlite reader during a {elapsed * 1000:.0f} ms full save: {reads[0]} reads, "
+          f"worst {worst[0] * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="config storage: JSON file vs SQLite")
+    parser.add_argument("--groups", type=int, default=100_000)
+    parser.add_argument("--edits", type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    cfg = make_config(args.groups)
+    write_config(os.path.join(directory, "config.json"), cfg)
+    run("json", os.path.join(directory, "config.json"), cfg, args.groups, args.edits)
+    run("sqlite", os.path.join(directory, "config.db"), cfg, args.groups, args.edits)
+    readers_during_save(os.path.join(directory, "config.db"), cfg, args.groups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# تكلفة بناء الرد: replace + MessagingResponse (القديم) مقابل ReplyTemplate.twiml
+# ويتحقق أن الناتج مطابق حرفياً لمكتبة twilio
+# التشغيل: python benchmarks/bench_templates.py
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from twilio.twiml.messaging_response import MessagingResponse
+from reply_templates import ReplyTemplate
+
+TEMPLATES = [
+    "تفضل {user}، سيتم التواصل معك.",
+    "Hi {user}, we will contact you shortly.",
+    "<b>{user}</b> & co > \"quotes\" 'single' {unknown} {user}{user}",
+    "ثابت بدون متغيرات",
+    "",
+]
+
+
+def old_twiml(tpl, sender, body):
+    resp = MessagingResponse()
+    if body:
+        resp.message().body(tpl.replace("{user}", sender))
+    else:
+        resp.message(tpl.replace("{user}", sender))
+    return str(resp)
+
+
+def check(rnd):
+    alphabet = "ab <>&\"'؟مرحبا\n\t{}😀"
+    for _ in range(2000):
+        sender = "".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 12)))
+        for text in TEMPLATES:
+            tpl = ReplyTemplate(text)
+            for body in (False, True):
+                new = tpl.twiml({"user": sender}, body=body)
+                assert new == old_twiml(text, sender, body), (text, sender, body)
+
+
+def main():
+    check(random.Random(7))
+    print("output identical to twilio MessagingResponse ✔")
+    sender = "whatsapp:+201234567890"
+    n = 50000
+    for text in TEMPLATES[:2]:
+        tpl = ReplyTemplate(text)
+        old = timeit.timeit(lambda: old_twiml(text, sender, True), number=n) / n
+        new = timeit.timeit(lambda: tpl.twiml({"user": sender}, body=True), number=n) / n
+        print(f"{text[:24]!r:>28}: old {old * 1e6:6.2f} us  new {new * 1e6:6.2f} us  ({old / new:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
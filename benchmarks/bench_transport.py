@@ -0,0 +1,60 @@
+# زمن الإرسال p50/p99 مع وبدون pool عبر سيرفر Twilio المحلي (twilio_stub.py)
+# التشغيل: python benchmarks/bench_transport.py [--sends 1000] [--threads 8]
+# ملاحظة: السيرفر المحلي HTTP بدون TLS، لذلك الفرق الحقيقي مع api.twilio.com أكبر
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from twilio.http.http_client import TwilioHttpClient
+from twilio.rest import Client
+from twilio_stub import start_stub
+from twilio_http import PooledHttpClient
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(label, http_client, base_url, sends, threads):
+    client = Client("AC00000000000000000000000000000000", "token", http_client=http_client)
+    client.api.base_url = base_url
+
+    def send(i):
+        t0 = time.perf_counter()
+        client.messages.create(body=f"رسالة {i}", from_="whatsapp:+10000000000", to=f"whatsapp:+1{i:010d}")
+        return time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        latencies = list(pool.map(send, range(sends)))
+    total = time.perf_counter() - t0
+    line = (f"{label:>10}: p50 {percentile(latencies, 50) * 1000:6.2f} ms  "
+            f"p99 {percentile(latencies, 99) * 1000:6.2f} ms  {sends / total:7.0f} msg/s")
+    if hasattr(http_client, "stats"):
+        st = http_client.stats.snapshot()
+        line += f"  connections {st['connections']}  reuse {st['reuse_ratio']:.1%}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sends", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.0, help="server-side delay per request")
+    args = parser.parse_args()
+
+    srv = start_stub(delay=args.delay)
+    before = srv.state.connections
+    run("no pool", TwilioHttpClient(pool_connections=False), srv.base_url, args.sends, args.threads)
+    print(f"{'':>10}  server saw {srv.state.connections - before} connections")
+    before = srv.state.connections
+    run("pooled", PooledHttpClient(pool_size=args.threads), srv.base_url, args.sends, args.threads)
+    print(f"{'':>10}  server saw {srv.state.connections - before} connections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# اختبار حمل /webhook بطلبات Twilio واقعية (Body, From, To, MessageSid)
+#
+# داخل العملية (Flask test_client، بدون شبكة):
+#   python benchmarks/webhook_load.py --app app2 --requests 20000
+# عبر الشبكة على سيرفر شغال (يجب أن يكون --config نفس ملف السيرفر):
+#   python benchmarks/webhook_load.py --url http://127.0.0.1:5000 --config config.json --concurrency 16
+#
+# --hit-rate     نسبة الرسائل التي تحتوي كلمة مفتاحية
+# --member-rate  نسبة الرسائل القادمة من مجموعة/رقم موجود في allowed_groups
+# النتيجة تُحفظ JSON في bench_results/ مع رقم الـ commit، و --compare يقارن بنتيجة سابقة.
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+AR_CORPUS = [
+    "السلام عليكم ورحمة الله", "كيف حالكم جميعاً", "متى موعد الاجتماع القادم؟",
+    "أرسلت الملف على الإيميل", "شكراً جزيلاً على المساعدة", "هل من شخص يعرف طريقة التسجيل؟",
+    "الرجاء مراجعة الطلب رقم 4521", "صباح الخير يا شباب", "ممكن رقم خدمة العملاء",
+    "تم الدفع اليوم والحمد لله", "أين أجد الفاتورة؟", "المنتج وصل بحالة ممتازة",
+]
+EN_CORPUS = [
+    "good morning everyone", "is the meeting still on for today?", "please check order #4521",
+    "thanks a lot for the quick reply", "where can I find the invoice", "can someone share the link",
+    "the delivery arrived today", "what time does the shop open", "I sent the file by email",
+    "any update on my ticket?", "see you tomorrow", "ok 👍",
+]
+TWILIO_NUMBER = "whatsapp:+14155238886"
+
+
+def make_config(groups=2000, keywords=300, private_rate=0.0, seed=1):
+    rnd = random.Random(seed)
+    base = ["مرحبا", "Hello", "مساعدة", "help", "سعر", "price", "طلب", "order"]
+    extra = [f"كلمة{i}" if i % 2 else f"keyword{i}" for i in range(max(0, keywords - len(base)))]
+    return {
+        "keywords": (base + extra)[:keywords],
+        "allowed_groups": [
+            {"id": f"whatsapp:+9665{i:08d}" if i % 2 else f"{i:09d}-{rnd.randint(100000, 999999)}@g.us",
+             "name": f"group {i}", "reply_type": "private" if rnd.random() < private_rate else "group",
+             "template": ("ar", "en", "custom")[i % 3], "custom_reply": "أهلاً {user} في {group}"}
+            for i in range(groups)
+        ],
+        "group_reply_template_ar": "تفضل {user}، سيتم التواصل معك.",
+        "group_reply_template_en": "Hi {user}, we will contact you shortly.",
+    }
+
+
+def make_traffic(cfg, count, hit_rate, member_rate, seed=2):
+    rnd = random.Random(seed)
+    keywords = cfg.get("keywords") or ["مرحبا"]
+    members = [g["id"] for g in cfg.get("allowed_groups", []) if isinstance(g, dict)] or [None]
+    forms = []
+    for _ in range(count):
+        text = rnd.choice(AR_CORPUS if rnd.random() < 0.5 else EN_CORPUS)
+        if rnd.random() < hit_rate:
+            words = text.split()
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(keywords))
+            text = " ".join(words)
+        sender = rnd.choice(members) if rnd.random() < member_rate else None
+        if sender is None:
+            sender = f"whatsapp:+2010{rnd.randrange(10 ** 8):08d}"
+        forms.append({
+            "Body": text,
+            "From": sender,
+            "To": TWILIO_NUMBER,
+            "MessageSid": "SM%032x" % rnd.getrandbits(128),
+            "ProfileName": "مستخدم" if rnd.random() < 0.5 else "User",
+            "NumMedia": "0",
+        })
+    return forms
+
+
+def summarize(latencies, elapsed, statuses):
+    latencies = sorted(latencies)
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000 if latencies else 0.0
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(pct(50), 3),
+        "p95_ms": round(pct(95), 3),
+        "p99_ms": round(pct(99), 3),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def run_in_process(module, forms, cfg):
+    # config مؤقت + سيرفر Twilio محلي حتى لا يخرج أي إرسال حقيقي
+    from twilio_stub import start_stub
+    workdir = tempfile.mkdtemp()
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(cfg, f, ensure_ascii=False)
+    stub = start_stub()
+    os.environ.update(TWILIO_API_BASE_URL=stub.base_url, TWILIO_WHATSAPP_NUMBER=TWILIO_NUMBER)
+    os.environ.setdefault("TWILIO_ACCOUNT_SID", "AC" + "0" * 32)
+    os.environ.setdefault("TWILIO_AUTH_TOKEN", "x")
+    os.chdir(workdir)
+    mod = __import__(module)
+    client = mod.app.test_client()
+
+    for form in forms[:100]:  # تسخين
+        client.post("/webhook", data=form)
+    latencies, statuses = [], {}
+    t0 = time.perf_counter()
+    for form in forms:
+        t = time.perf_counter()
+        status = client.post("/webhook", data=form).status_code
+        latencies.append(time.perf_counter() - t)
+        statuses[status] = statuses.get(status, 0) + 1
+    return summarize(latencies, time.perf_counter() - t0, statuses)
+
+
+def run_over_socket(url, forms, concurrency):
+    parts = urlsplit(url)
+    path = (parts.path.rstrip("/") or "") + "/webhook"
+    headers = {"Content-Type": "application/x-www-form-urlencoded"}
+    bodies = [urlencode(f) for f in forms]
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    counter = iter(range(len(bodies)))
+
+    def worker():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        local, local_status = [], {}
+        for i in counter:
+            t = time.perf_counter()
+            try:
+                conn.request("POST", path, bodies[i], headers)
+                resp = conn.getresponse()
+                resp.read()
+                status = resp.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+                status = "error"
+            local.append(time.perf_counter() - t)
+            local_status[status] = local_status.get(status, 0) + 1
+        with lock:
+            latencies.extend(local)
+            for k, v in local_status.items():
+                statuses[k] = statuses.get(k, 0) + v
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, time.perf_counter() - t0, statuses)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(result, previous_path):
+    with open(previous_path, encoding="utf-8") as f:
+        prev = json.load(f)
+    print(f"\ncompared with {prev.get('commit')} ({previous_path}):")
+    for key in ("throughput", "p50_ms", "p95_ms", "p99_ms"):
+        old, new = prev["result"][key], result["result"][key]
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"  {key:>10}: {old:10.2f} -> {new:10.2f}  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the /webhook endpoint")
+    parser.add_argument("--app", default="app2", help="module for in-process mode (app, app1, app2)")
+    parser.add_argument("--url", help="run over sockets against a running server instead")
+    parser.add_argument("--config", help="config.json of the target (default: generated)")
+    parser.add_argument("--groups", type=int, default=2000)
+    parser.add_argument("--keywords", type=int, default=300)
+    parser.add_argument("--private-rate", type=float, default=0.0)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hit-rate", type=float, default=0.3)
+    parser.add_argument("--member-rate", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=2)
+    parser.add_argument("--out", help="result file (default bench_results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="previous result file to compare with")
+    args = parser.parse_args()
+
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            cfg = json.load(f)
+    else:
+        cfg = make_config(args.groups, args.keywords, args.private_rate)
+    forms = make_traffic(cfg, args.requests, args.hit_rate, args.member_rate, args.seed)
+
+    if args.url:
+        res = run_over_socket(args.url, forms, args.concurrency)
+        mode = "socket"
+    else:
+        res = run_in_process(args.app, forms, cfg)
+        mode = "in-process"
+
+    commit = git_commit()
+    result = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mode": mode,
+        "params": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "result": res,
+    }
+    print(f"{mode}: {res['requests']} requests, {res['throughput']:.0f} req/s, "
+          f"p50 {res['p50_ms']:.2f} ms, p95 {res['p95_ms']:.2f} ms, p99 {res['p99_ms']:.2f} ms, "
+          f"statuses {res['statuses']}")
+
+    out = args.out or os.path.join(ROOT, "bench_results", f"{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print("saved", out)
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
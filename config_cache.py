@@ -0,0 +1,451 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from types import MappingProxyType
+
+from config_patch import PatchError, apply_ops, normalize, to_json
+from group_index import GroupIndex
+from reply_templates import TemplateSet
+from rate_limit import parse_limits
+from reply_rules import RuleSet
+
+try:
+    import fcntl
+except ImportError:  # ويندوز: نكتفي بالقفل داخل العملية
+    fcntl = None
+
+# ---------------------------
+# كاش الإعدادات مع إعادة التحميل التلقائي
+# ---------------------------
+# config.json يُقرأ ويُجهّز (الكلمات، فهرس المجموعات) مرة واحدة، ثم يراقب
+# thread في الخلفية mtime/size ويعيد القراءة فقط إذا تغيّر الملف فعلاً.
+# مسار الطلب يقرأ snapshot جاهزة من الذاكرة بدون أي قراءة من القرص.
+#
+# الكتابة تتم في ملف مؤقت ثم fsync ثم rename، فلا يرى أي قارئ ملفاً ناقصاً.
+# كل حفظ يزيد config_version بواحد، ولوحة التحكم ترسل الرقم الذي عدّلت عليه
+# ليُرفض الحفظ إذا سبقها تعديل آخر.
+#
+# التعديل الجزئي (patch، من admin_api.py) لا يعيد كتابة config.json: يُضاف
+# سطر واحد إلى config.json.journal ({"version": N, "ops": [...]}) ويُطبق على
+# الـ snapshot الحالية، والعمليات الأخرى تقرأ الأسطر الجديدة فقط من آخر موضع.
+# عند تجاوز الملف compact_bytes يُكتب config.json كاملاً ويُحذف الـ journal.
+# الكتابة وحدها O(التعديل)؛ بناء الـ snapshot الجديدة في الذاكرة ليس كذلك (patched).
+# read_config يطبق الـ journal دائماً، فمن يقرأ الملف يرى آخر نسخة.
+#
+# مسار ينتهي بـ .db/.sqlite يُخزن في SQLite بدل JSON (config_sqlite.py)، بنفس
+# الواجهة: read_config وsave_versioned وConfigCache.
+
+VERSION_KEY = "config_version"
+JOURNAL_SUFFIX = ".journal"
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+class StaleConfigError(Exception):
+    def __init__(self, expected, current):
+        super().__init__(f"config changed: editing version {expected}, current is {current}")
+        self.expected = expected
+        self.current = current
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, MappingProxyType):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+# رقم لكل snapshot في العملية: تعديل يدوي على config.json يُقرأ بنفس version
+_serials = itertools.count(1)
+
+
+class ConfigSnapshot:
+    # نسخة للقراءة فقط؛ لا تُعدّل بعد إنشائها بل تُستبدل كاملة
+    __slots__ = ("cfg", "version", "serial", "rules", "groups", "templates", "limits")
+
+    def __init__(self, cfg):
+        cfg = _freeze(cfg)
+        object.__setattr__(self, "cfg", cfg)
+        object.__setattr__(self, "version", cfg.get(VERSION_KEY, 0))
+        object.__setattr__(self, "serial", next(_serials))
+        object.__setattr__(self, "rules", RuleSet(cfg))
+        object.__setattr__(self, "groups", GroupIndex(cfg.get("allowed_groups", ())))
+        object.__setattr__(self, "templates", TemplateSet(cfg, self.groups))
+        object.__setattr__(self, "limits", parse_limits(cfg))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is read-only")
+
+    def to_dict(self):
+        # نسخة قابلة للتعديل (للوحة التحكم أو json.dump)
+        return _thaw(self.cfg)
+
+    def patched(self, ops):
+        # snapshot جديدة برقم إصدار أعلى بواحد؛ ops من config_patch.normalize.
+        # ما لم يتغير يُؤخذ كما هو من هذه النسخة (القواعد لا تُبنى من جديد
+        # عند تعديل مجموعة، والمجموعات تتغير بالمعرّف فقط).
+        # التكلفة ليست O(التعديل): تعديل مجموعة ينسخ قواميس الفهارس (O(عدد
+        # المجموعات)، نسخ في C بدون المرور على كل مجموعة في Python)، وتعديل كلمة أو
+        # قاعدة يعيد بناء القائمة وكل RuleSet (O(عدد الكلمات)). bench_admin.py:
+        # 100k مجموعة ~7-10 ms للمجموعة، و10k كلمة ~60 ms للكلمة.
+        if any(field == "allowed_groups" and key is None for _, field, key, _ in ops):
+            cfg = self.to_dict()
+            apply_ops(cfg, ops)
+            cfg[VERSION_KEY] = self.version + 1
+            return ConfigSnapshot(cfg)
+
+        live = {}
+
+        def exists(gid):
+            return live[gid] if gid in live else gid in self.groups.by_id
+
+        changes = []
+        other = []
+        for op in ops:
+            kind, field, key, value = op
+            if field != "allowed_groups":
+                other.append(op)
+            elif kind == "add":
+                if exists(key):
+                    raise PatchError(f"{key!r} موجود مسبقاً في allowed_groups")
+                changes.append((None, _freeze(value)))
+                live[key] = True
+            elif not exists(key):
+                raise PatchError(f"{key!r} غير موجود في allowed_groups")
+            elif kind == "remove":
+                changes.append((key, None))
+                live[key] = False
+            else:
+                if value["id"] != key and exists(value["id"]):
+                    raise PatchError(f"{value['id']!r} موجود مسبقاً في allowed_groups")
+                changes.append((key, _freeze(value)))
+                live[key] = False
+                live[value["id"]] = True
+
+        cfg = dict(self.cfg)
+        fields = {field for _, field, _, _ in other}
+        if other:
+            part = {f: _thaw(cfg[f]) for f in fields if f in cfg}
+            apply_ops(part, other)
+            for f in fields:
+                if f in part:
+                    cfg[f] = _freeze(part[f])
+                else:
+                    cfg.pop(f, None)
+        groups = self.groups
+        if changes:
+            groups = groups.updated(changes)
+            cfg["allowed_groups"] = groups.groups
+        cfg[VERSION_KEY] = self.version + 1
+        cfg = MappingProxyType(cfg)
+
+        if fields & {"group_reply_template_ar", "group_reply_template_en"}:
+            templates = TemplateSet(cfg, groups)
+        elif changes:
+            templates = self.templates.updated(changes)
+        else:
+            templates = self.templates
+        snap = object.__new__(ConfigSnapshot)
+        object.__setattr__(snap, "cfg", cfg)
+        object.__setattr__(snap, "version", cfg[VERSION_KEY])
+        object.__setattr__(snap, "serial", next(_serials))
+        object.__setattr__(snap, "rules", RuleSet(cfg) if fields & {"keywords", "reply_rules"} else self.rules)
+        object.__setattr__(snap, "groups", groups)
+        object.__setattr__(snap, "templates", templates)
+        object.__setattr__(snap, "limits", parse_limits(cfg) if "rate_limits" in fields else self.limits)
+        return snap
+
+
+def _signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def read_journal(path, pos=0, ino=None):
+    # ([(version, ops)], الموضع بعد آخر سطر كامل، inode)
+    # ملف جديد (inode آخر بعد الدمج) يُقرأ من أوله
+    try:
+        f = open(path + JOURNAL_SUFFIX, "rb")
+    except FileNotFoundError:
+        return [], 0, None
+    with f:
+        st = os.fstat(f.fileno())
+        if st.st_ino != ino or st.st_size < pos:
+            pos = 0
+        f.seek(pos)
+        data = f.read()
+    # سطر بدون \n ما زال يُكتب: يُقرأ في المرة القادمة
+    end = data.rfind(b"\n") + 1
+    entries = []
+    for line in data[:end].splitlines():
+        entry = json.loads(line)
+        entries.append((entry["version"], normalize(entry["ops"])))
+    return entries, pos + end, st.st_ino
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = json.load(f)
+    entries, pos, ino = read_journal(path)
+    for version, ops in entries:
+        if version <= cfg.get(VERSION_KEY, 0):
+            continue  # موجود في config.json (دمج لم يكتمل حذف الـ journal بعده)
+        try:
+            apply_ops(cfg, ops)
+        except PatchError as e:
+            print(f"⚠️ تعديل {version} في {path}{JOURNAL_SUFFIX} لا ينطبق على config.json:", e)
+        cfg[VERSION_KEY] = version
+    return cfg, pos, ino
+
+
+def open_storage(path):
+    # config.db / config.sqlite -> SQLite (config_sqlite.py)، وغير ذلك ملف JSON
+    if path.endswith(SQLITE_SUFFIXES):
+        from config_sqlite import SQLiteStorage
+        return SQLiteStorage(path)
+    return JsonStorage(path)
+
+
+def read_config(path):
+    if path.endswith(SQLITE_SUFFIXES):
+        return open_storage(path).load()
+    return _load(path)[0]
+
+
+def write_config(path, cfg):
+    # ملف مؤقت في نفس المجلد + fsync + rename ذري
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cfg, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def _locked(path):
+    # قفل الكتابة بين الـ threads وبين العمليات
+    with _write_lock, open(path + ".lock", "a") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _drop_journal(path):
+    try:
+        os.remove(path + JOURNAL_SUFFIX)
+    except FileNotFoundError:
+        pass
+
+
+def _save_json(path, cfg, expected_version=None):
+    with _locked(path):
+        try:
+            current = read_config(path).get(VERSION_KEY, 0) if os.path.exists(path) else 0
+        except ValueError:
+            current = 0
+        if expected_version is not None and int(expected_version) != current:
+            raise StaleConfigError(int(expected_version), current)
+        cfg[VERSION_KEY] = max(current, cfg.get(VERSION_KEY, 0)) + 1
+        write_config(path, cfg)
+        # cfg كامل الآن؛ الـ journal القديم لم يعد له معنى
+        _drop_journal(path)
+        return cfg[VERSION_KEY]
+
+
+def save_versioned(path, cfg, expected_version=None):
+    # يرفع StaleConfigError إذا تغيّر الملف بعد expected_version
+    if path.endswith(SQLITE_SUFFIXES):
+        return open_storage(path).save(cfg, expected_version)
+    return _save_json(path, cfg, expected_version)
+
+
+# ---------------------------
+# التخزين: ConfigCache يتعامل مع أي كائن فيه
+# ---------------------------
+#   load()                -> الإعدادات كاملة (dict)
+#   poll(version)         -> None إذا لم يتغير شيء، RELOAD للقراءة الكاملة،
+#                            أو [(version, ops)] التعديلات بعد version
+#   writing()             -> context manager: قفل الكتابة بين العمليات
+#   append(snap, ops)     -> حفظ تعديل جزئي (داخل writing)
+#   save(cfg, expected)   -> حفظ الإعدادات كاملة، يعيد رقم الإصدار
+
+RELOAD = "reload"
+
+
+class JsonStorage:
+    # حجم config.json.journal الذي يُدمج بعده في config.json
+    compact_bytes = 1 << 20
+
+    def __init__(self, path):
+        self.path = path
+        self._sig = None
+        self._jpos = 0
+        self._jino = None
+
+    def load(self):
+        sig = _signature(self.path)
+        cfg, pos, ino = _load(self.path)
+        self._sig = sig
+        self._jpos, self._jino = pos, ino
+        return cfg
+
+    def poll(self, version):
+        if _signature(self.path) != self._sig:
+            return RELOAD
+        # الأسطر الجديدة في الـ journal فقط
+        try:
+            st = os.stat(self.path + JOURNAL_SUFFIX)
+        except FileNotFoundError:
+            return None
+        if st.st_ino == self._jino and st.st_size == self._jpos:
+            return None
+        entries, self._jpos, self._jino = read_journal(self.path, self._jpos, self._jino)
+        return [(v, ops) for v, ops in entries if v > version]
+
+    def writing(self):
+        return _locked(self.path)
+
+    def append(self, snap, ops):
+        line = json.dumps({"version": snap.version, "ops": to_json(ops)}, ensure_ascii=False) + "\n"
+        with open(self.path + JOURNAL_SUFFIX, "ab") as f:
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            self._jpos, self._jino = f.tell(), os.fstat(f.fileno()).st_ino
+        if self._jpos >= self.compact_bytes:
+            # config.json أولاً ثم حذف الـ journal؛ من يقرأ بينهما يتجاهل أسطر
+            # الـ journal التي رقمها ليس أعلى من config_version
+            write_config(self.path, snap.to_dict())
+            _drop_journal(self.path)
+            self._sig = _signature(self.path)
+            self._jpos, self._jino = 0, None
+
+    def save(self, cfg, expected_version=None):
+        return _save_json(self.path, cfg, expected_version)
+
+
+class ConfigCache:
+    def __init__(self, path, interval=1.0):
+        # path: مسار (open_storage) أو كائن تخزين جاهز
+        self.storage = open_storage(path) if isinstance(path, str) else path
+        self.path = self.storage.path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._snap = None
+        self._pid = None
+        # دوال تُستدعى بعد كل حفظ (launcher.py يستخدمها لإبلاغ بقية العمليات)
+        self.on_save = []
+        self.reload()
+
+    def get(self):
+        # الـ thread لا ينتقل مع fork، لذلك نشغله من جديد في كل عملية
+        if self._pid != os.getpid():
+            self._start_watcher()
+        return self._snap
+
+    @property
+    def current(self):
+        # مثل get() لكن بدون تشغيل الـ watcher (للـ master قبل fork)
+        return self._snap
+
+    def reload(self):
+        with self._lock:
+            return self._reload()
+
+    def _reload(self):
+        snap = ConfigSnapshot(self.storage.load())
+        # إسناد واحد: القراء يرون النسخة القديمة أو الجديدة كاملة
+        self._snap = snap
+        return snap
+
+    def save(self, cfg, expected_version=None):
+        self.storage.save(cfg, expected_version)
+        snap = self.reload()
+        for callback in self.on_save:
+            callback(snap)
+        return snap
+
+    def patch(self, ops, expected_version=None):
+        # تعديل جزئي: سطر في الـ journal (أو صفوف SQLite) بدل حفظ الإعدادات كاملة
+        # PatchError إذا كان التعديل غير صالح، وStaleConfigError كما في save
+        ops = normalize(ops)
+        with self.storage.writing():
+            self.check()
+            snap = self._snap
+            if expected_version is not None and int(expected_version) != snap.version:
+                raise StaleConfigError(int(expected_version), snap.version)
+            new = snap.patched(ops)
+            with self._lock:
+                self.storage.append(new, ops)
+                self._snap = new
+        for callback in self.on_save:
+            callback(new)
+        return new
+
+    def check(self):
+        # يعيد القراءة فقط إذا تغيّر شيء، وبعد تعديل جزئي يطبق التعديلات الجديدة فقط
+        try:
+            with self._lock:
+                changes = self.storage.poll(self._snap.version)
+                if not changes:
+                    return False
+                if changes != RELOAD:
+                    snap = self._snap
+                    for version, ops in changes:
+                        if version != snap.version + 1:
+                            break
+                        try:
+                            snap = snap.patched(ops)
+                        except PatchError:
+                            break
+                    else:
+                        self._snap = snap
+                        return True
+                # تسلسل غير متوقع (تعديل يدوي مثلاً): قراءة كاملة
+                self._reload()
+                return True
+        except (OSError, ValueError, sqlite3.Error) as e:
+            # ملف محذوف أو غير صالح: نبقي النسخة السابقة ونحاول لاحقاً
+            print("⚠️ تعذر تحميل الإعدادات:", e)
+        return False
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def _watch(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.interval)
+            self.check()
@@ -0,0 +1,156 @@
+import re
+
+# ---------------------------
+# تعديلات جزئية على الإعدادات (مثل JSON Patch لكن بالمفتاح)
+# ---------------------------
+#   [{"op": "add", "path": "/allowed_groups/-", "value": {"id": "1203@g.us", "name": "الدعم"}},
+#    {"op": "replace", "path": "/allowed_groups/1203@g.us", "value": {"id": "1203@g.us", ...}},
+#    {"op": "remove", "path": "/keywords/سعر"},
+#    {"op": "replace", "path": "/group_reply_template_ar", "value": "تفضل {user}"}]
+#
+# العنصر في القوائم يُحدد بمفتاحه لا برقمه: id المجموعة، نص الكلمة، match القاعدة،
+# فلا يتغير معنى التعديل إذا أُضيف أو حُذف عنصر قبله. "~1" في المسار = "/"
+# و"~0" = "~" (RFC 6901). المسار بدون مفتاح يستبدل الحقل كله.
+#
+# التعديلات تُحوّل إلى (op, field, key, value): add/replace/remove لعنصر، أو
+# key=None لحقل كامل.
+
+COLLECTIONS = {"allowed_groups": "id", "keywords": None, "reply_rules": "match"}
+OPS = ("add", "replace", "remove")
+READ_ONLY = ("config_version",)
+
+
+class PatchError(ValueError):
+    pass
+
+
+def item_key(field, item):
+    key_field = COLLECTIONS[field]
+    return item if key_field is None else item.get(key_field)
+
+
+def escape(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(part):
+    return part.replace("~1", "/").replace("~0", "~")
+
+
+def item_path(field, key=None):
+    return f"/{field}" if key is None else f"/{field}/{escape(key)}"
+
+
+def _clean_item(field, value):
+    if field == "keywords":
+        if not isinstance(value, str) or not value.strip():
+            raise PatchError("الكلمة يجب أن تكون نصاً غير فارغ")
+        return value.strip()
+    if not isinstance(value, dict):
+        raise PatchError(f"عنصر {field} يجب أن يكون object")
+    value = dict(value)
+    if field == "allowed_groups":
+        if not isinstance(value.get("id", ""), str):
+            raise PatchError("id المجموعة يجب أن يكون نصاً")
+        value["id"] = value.get("id", "").strip()
+        return value
+    match = value.get("match")
+    if not isinstance(match, str) or not match.strip():
+        raise PatchError("القاعدة تحتاج match")
+    value["match"] = match.strip()
+    if value.get("regex"):
+        try:
+            re.compile(value["match"])
+        except re.error as e:
+            raise PatchError(f"regex غير صالح {value['match']!r}: {e}") from None
+    return value
+
+
+def _clean_field(field, value):
+    if field in COLLECTIONS:
+        if not isinstance(value, list):
+            raise PatchError(f"{field} يجب أن يكون قائمة")
+        return [_clean_item(field, v) for v in value]
+    return value
+
+
+def normalize(ops):
+    # يتحقق من الشكل فقط؛ وجود المفاتيح يُفحص عند التطبيق
+    if not isinstance(ops, list):
+        raise PatchError("التعديلات يجب أن تكون قائمة")
+    out = []
+    for raw in ops:
+        if not isinstance(raw, dict) or raw.get("op") not in OPS or not isinstance(raw.get("path"), str):
+            raise PatchError(f"تعديل غير صالح: {raw!r}")
+        op = raw["op"]
+        if not raw["path"].startswith("/") or raw["path"] == "/":
+            raise PatchError(f"مسار غير صالح: {raw['path']!r}")
+        field, _, rest = raw["path"][1:].partition("/")
+        if field in READ_ONLY:
+            raise PatchError(f"{field} للقراءة فقط")
+        if op != "remove" and "value" not in raw:
+            raise PatchError(f"{op} {raw['path']} يحتاج value")
+        value = raw.get("value")
+        if field not in COLLECTIONS:
+            if rest:
+                raise PatchError(f"{field} ليس قائمة عناصر")
+            out.append(("remove" if op == "remove" else "replace", field, None, value))
+        elif op == "add" and rest in ("", "-"):
+            value = _clean_item(field, value)
+            out.append(("add", field, item_key(field, value), value))
+        elif not rest:
+            if op == "add":
+                raise PatchError(f"add {raw['path']} يحتاج /- في آخر المسار")
+            out.append((op, field, None, None if op == "remove" else _clean_field(field, value)))
+        elif op == "add":
+            raise PatchError(f"add يكون على /{field}/- فقط")
+        else:
+            out.append((op, field, _unescape(rest), None if op == "remove" else _clean_item(field, value)))
+    return out
+
+
+def to_json(ops):
+    # عكس normalize (هذا ما يُكتب في ملف التعديلات)
+    out = []
+    for op, field, key, value in ops:
+        path = f"/{field}/-" if op == "add" else item_path(field, key)
+        out.append({"op": op, "path": path} if op == "remove" else {"op": op, "path": path, "value": value})
+    return out
+
+
+def _find(items, field, key):
+    for i, item in enumerate(items):
+        if item_key(field, item) == key:
+            return i
+    return None
+
+
+def apply_ops(cfg, ops):
+    # على dict عادي (config.json كما هو)؛ يُعدّل مكانه ويعيد الحقول التي تغيرت
+    changed = set()
+    for op, field, key, value in ops:
+        changed.add(field)
+        if key is None and op != "add":
+            if op == "remove":
+                cfg.pop(field, None)
+            else:
+                cfg[field] = value
+            continue
+        items = cfg.setdefault(field, [])
+        i = _find(items, field, key)
+        if op == "add":
+            if i is not None:
+                raise PatchError(f"{key!r} موجود مسبقاً في {field}")
+            items.append(value)
+            continue
+        if i is None:
+            raise PatchError(f"{key!r} غير موجود في {field}")
+        if op == "remove":
+            # كل العناصر بنفس المفتاح (أول عنصر فقط كان مستخدماً على أي حال)
+            items[:] = [item for item in items if item_key(field, item) != key]
+            continue
+        new_key = item_key(field, value)
+        if new_key != key and _find(items, field, new_key) is not None:
+            raise PatchError(f"{new_key!r} موجود مسبقاً في {field}")
+        items[i] = value
+    return changed
@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from config_cache import RELOAD, VERSION_KEY, StaleConfigError, read_config, write_config
+from config_patch import normalize, to_json
+
+# ---------------------------
+# تخزين الإعدادات في SQLite (WAL)
+# ---------------------------
+# نفس واجهة JsonStorage في config_cache.py، فيكفي مسار config.db:
+#   CONFIG_STORE=config.db python app2.py
+#
+# الجداول:
+#   groups    (pos، id فريد، name مفهرس، data = المجموعة كاملة JSON)
+#   keywords  (pos، keyword فريد)
+#   rules     (pos، match، data)
+#   templates (name، body)     group_reply_template_ar / _en
+#   settings  (key، value JSON) بقية الحقول ومنها config_version
+#   changes   (version، ops)    آخر التعديلات، ops فارغة = حفظ كامل
+#
+# الترتيب من pos (rowid)، فالتعديل بـ UPDATE يبقي العنصر في مكانه. التعديل
+# الجزئي يلمس صفوف العنصر فقط ويُسجل في changes، والعمليات الأخرى تقرأ
+# التعديلات بعد config_version الذي عندها فقط. في WAL القارئ لا ينتظر الكاتب
+# أبداً (يرى آخر commit قبل بدء قراءته). كل thread له اتصال خاص به.
+#
+# نقل الإعدادات الحالية مرة واحدة:
+#   python config_sqlite.py import config.json config.db
+#   python config_sqlite.py export config.db config.json
+# معرّف مجموعة أو كلمة مكررة في config.json يرفع ValueError بدل أن يُحذف.
+
+TEMPLATE_FIELDS = ("group_reply_template_ar", "group_reply_template_en")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (pos INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, name TEXT, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS groups_name ON groups (name);
+CREATE TABLE IF NOT EXISTS keywords (pos INTEGER PRIMARY KEY, keyword TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS rules (pos INTEGER PRIMARY KEY, match TEXT NOT NULL, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS rules_match ON rules (match);
+CREATE TABLE IF NOT EXISTS templates (name TEXT PRIMARY KEY, body TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS changes (version INTEGER PRIMARY KEY, ops TEXT);
+"""
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _group_row(g):
+    # app4.py يحفظ المجموعات أسماءً فقط ("allowed_groups": ["اسم"])
+    if isinstance(g, str):
+        return (g, g or None, _dumps(g))
+    return (g.get("id") or "", g.get("name") or None, _dumps(g))
+
+
+def _unique(field, keys):
+    # id وkeyword فريدة في الجدول: المكرر يُرفض بدل أن يسقط بصمت
+    seen, dups = set(), []
+    for key in keys:
+        if key in seen and key not in dups:
+            dups.append(key)
+        seen.add(key)
+    if dups:
+        raise ValueError(f"{', '.join(map(repr, dups))} مكرر في {field}")
+
+
+class SQLiteStorage:
+    def __init__(self, path, keep_changes=1000):
+        self.path = path
+        # التعديلات المحفوظة في changes لمن تأخر (أقدم منها = قراءة كاملة)
+        self.keep_changes = keep_changes
+        self._local = threading.local()
+        # اتصالات من قبل fork: لا تُغلق في العملية الابن (SQLite لا يدعم ذلك)
+        self._inherited = []
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        # الاتصال لا ينتقل مع fork ولا بين threads
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            if getattr(local, "db", None) is not None:
+                self._inherited.append(local.db)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+    def _version(self, db):
+        row = db.execute("SELECT value FROM settings WHERE key = ?", (VERSION_KEY,)).fetchone()
+        return json.loads(row[0]) if row else 0
+
+    def load(self):
+        db = self._db()
+        # قراءة واحدة متسقة لكل الجداول (أو داخل writing() إذا كانت مفتوحة)
+        own = not db.in_transaction
+        if own:
+            db.execute("BEGIN")
+        try:
+            cfg = {key: json.loads(value) for key, value in db.execute("SELECT key, value FROM settings")}
+            cfg.update(db.execute("SELECT name, body FROM templates"))
+            cfg["keywords"] = [k for (k,) in db.execute("SELECT keyword FROM keywords ORDER BY pos")]
+            cfg["allowed_groups"] = [json.loads(d) for (d,) in db.execute("SELECT data FROM groups ORDER BY pos")]
+            cfg["reply_rules"] = [json.loads(d) for (d,) in db.execute("SELECT data FROM rules ORDER BY pos")]
+        finally:
+            if own:
+                db.execute("COMMIT")
+        cfg.setdefault(VERSION_KEY, 0)
+        return cfg
+
+    def poll(self, version):
+        db = self._db()
+        if self._version(db) == version:
+            return None
+        rows = db.execute("SELECT version, ops FROM changes WHERE version > ? ORDER BY version", (version,)).fetchall()
+        if not rows or rows[0][0] != version + 1 or any(ops is None for _, ops in rows):
+            return RELOAD
+        return [(v, normalize(json.loads(ops))) for v, ops in rows]
+
+    @contextmanager
+    def writing(self):
+        # BEGIN IMMEDIATE: كاتب واحد في كل مرة، والقراء يكملون من WAL
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _set(self, db, field, value):
+        if field in TEMPLATE_FIELDS:
+            db.execute("INSERT OR REPLACE INTO templates (name, body) VALUES (?, ?)", (field, value))
+        else:
+            db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (field, _dumps(value)))
+
+    def _insert(self, db, field, items):
+        if field == "allowed_groups":
+            rows = [_group_row(g) for g in items]
+            _unique(field, (row[0] for row in rows))
+            db.executemany("INSERT INTO groups (id, name, data) VALUES (?, ?, ?)", rows)
+        elif field == "keywords":
+            _unique(field, items)
+            db.executemany("INSERT INTO keywords (keyword) VALUES (?)", ((k,) for k in items))
+        else:
+            db.executemany("INSERT INTO rules (match, data) VALUES (?, ?)", ((r.get("match", ""), _dumps(r)) for r in items))
+
+    def _apply(self, db, ops):
+        # نفس معنى config_patch.apply_ops، على الصفوف المعنية فقط
+        for op, field, key, value in ops:
+            if field not in ("allowed_groups", "keywords", "reply_rules"):
+                if op == "remove":
+                    db.execute("DELETE FROM templates WHERE name = ?", (field,))
+                    db.execute("DELETE FROM settings WHERE key = ?", (field,))
+                else:
+                    self._set(db, field, value)
+            elif key is None and op != "add":
+                db.execute({"allowed_groups": "DELETE FROM groups", "keywords": "DELETE FROM keywords",
+                            "reply_rules": "DELETE FROM rules"}[field])
+                if op != "remove":
+                    self._insert(db, field, value)
+            elif op == "add":
+                self._insert(db, field, [value])
+            elif field == "allowed_groups":
+                if op == "remove":
+                    db.execute("DELETE FROM groups WHERE id = ?", (key,))
+                else:
+                    db.execute("UPDATE groups SET id = ?, name = ?, data = ? WHERE id = ?", (*_group_row(value), key))
+            elif field == "keywords":
+                if op == "remove":
+                    db.execute("DELETE FROM keywords WHERE keyword = ?", (key,))
+                else:
+                    db.execute("UPDATE keywords SET keyword = ? WHERE keyword = ?", (value, key))
+            elif op == "remove":
+                db.execute("DELETE FROM rules WHERE match = ?", (key,))
+            else:
+                db.execute("UPDATE rules SET match = ?, data = ? WHERE pos = (SELECT min(pos) FROM rules WHERE match = ?)",
+                           (value["match"], _dumps(value), key))
+
+    def _commit_version(self, db, version, ops):
+        db.execute("INSERT OR REPLACE INTO changes (version, ops) VALUES (?, ?)",
+                   (version, None if ops is None else _dumps(to_json(ops))))
+        db.execute("DELETE FROM changes WHERE version <= ?", (version - self.keep_changes,))
+        self._set(db, VERSION_KEY, version)
+
+    def append(self, snap, ops):
+        # داخل writing(): التعديلات صالحة (تحقق منها snap.patched)
+        db = self._db()
+        self._apply(db, ops)
+        self._commit_version(db, snap.version, ops)
+
+    def save(self, cfg, expected_version=None):
+        with self.writing() as db:
+            current = self._version(db)
+            if expected_version is not None and int(expected_version) != current:
+                raise StaleConfigError(int(expected_version), current)
+            version = max(current, cfg.get(VERSION_KEY, 0)) + 1
+            for table in ("groups", "keywords", "rules", "templates", "settings"):
+                db.execute(f"DELETE FROM {table}")
+            for field, value in cfg.items():
+                if field in ("allowed_groups", "keywords", "reply_rules"):
+                    self._insert(db, field, value or ())
+                elif field != VERSION_KEY:
+                    self._set(db, field, value)
+            self._commit_version(db, version, None)
+        cfg[VERSION_KEY] = version
+        return version
+
+    def close(self):
+        # اتصال هذا الـ thread فقط
+        local = self._local
+        if getattr(local, "pid", None) == os.getpid():
+            local.db.close()
+            local.db = local.pid = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy settings between config.json and an SQLite config store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="config.json -> SQLite")
+    imp.add_argument("source")
+    imp.add_argument("target")
+    exp = sub.add_parser("export", help="SQLite -> config.json")
+    exp.add_argument("source")
+    exp.add_argument("target")
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        cfg = read_config(args.source)
+        try:
+            version = SQLiteStorage(args.target).save(cfg)
+        except ValueError as e:
+            print(f"⚠️ {args.source}: {e}", file=sys.stderr)
+            return 1
+        print(f"{len(cfg.get('allowed_groups') or ())} groups, {len(cfg.get('keywords') or ())} keywords "
+              f"-> {args.target} (version {version})")
+    else:
+        cfg = SQLiteStorage(args.source).load()
+        write_config(args.target, cfg)
+        print(f"{len(cfg['allowed_groups'])} groups, {len(cfg['keywords'])} keywords -> {args.target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------------------
+# منع تكرار معالجة نفس الرسالة (MessageSid)
+# ---------------------------
+# Twilio يعيد إرسال الطلب إذا تأخر الرد، فكنا نرد مرتين ونرسل مرتين.
+# أول طلب لكل MessageSid يُعالج ويُحفظ رده، وأي إعادة بعده تأخذ نفس الرد
+# بدون المرور على المطابقة أو الإرسال.
+#
+# التخزين في الذاكرة (LRU + TTL بحد أقصى للعدد)، أو ملف SQLite مشترك حتى
+# تتشارك عدة workers على نفس الجهاز:
+#   DEDUPE_DB=/tmp/inbound.db  DEDUPE_TTL=3600  DEDUPE_MAX=200000
+#
+# app2.py يستخدم StateDeduplicator على runtime_state.py بدلاً من ذلك: القرار
+# يُحسب أولاً ثم يُحجز الـ MessageSid مع الرد نفسه في نفس الـ batch مع حدود
+# الردود، فلا حاجة لـ "pending" ثم complete.
+
+PENDING = "pending"
+
+
+class TTLCache:
+    # LRU بحد أقصى للعدد؛ المنتهي يُحذف عند الوصول إليه أو من أول القائمة
+    def __init__(self, maxsize=200_000, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, now=None):
+        now = now or time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def add(self, key, value, now=None):
+        # يضيف إذا لم يكن موجوداً ويعيد None، وإلا يعيد القيمة الموجودة
+        now = now or time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                return entry[1]
+            self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            self._trim(now)
+            return None
+
+    def set(self, key, value, now=None):
+        now = now or time.monotonic()
+        with self._lock:
+            self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            self._trim(now)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def _trim(self, now):
+        data = self._data
+        while data:
+            expires = next(iter(data.values()))[0]
+            if expires > now and len(data) <= self.maxsize:
+                break
+            data.popitem(last=False)
+
+
+class MemoryStore:
+    def __init__(self, maxsize=200_000, ttl=3600.0):
+        self.cache = TTLCache(maxsize, ttl)
+
+    def claim(self, sid):
+        return self.cache.add(sid, PENDING)
+
+    def complete(self, sid, response):
+        self.cache.set(sid, response)
+
+    def release(self, sid):
+        self.cache.pop(sid)
+
+
+class SqliteStore:
+    # ملف واحد لكل workers الجهاز؛ INSERT OR IGNORE يجعل الحجز ذرياً بينهم
+    def __init__(self, path, ttl=3600.0, cleanup_every=1000):
+        self.path = path
+        self.ttl = ttl
+        self.cleanup_every = cleanup_every
+        self._tls = threading.local()
+        self._claims = 0
+        db = self._db()
+        db.execute("CREATE TABLE IF NOT EXISTS inbound ("
+                   "sid TEXT PRIMARY KEY, response TEXT, expires REAL NOT NULL) WITHOUT ROWID")
+
+    def _db(self):
+        db = getattr(self._tls, "db", None)
+        if db is None or self._tls.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._tls.db = db
+            self._tls.pid = os.getpid()
+        return db
+
+    def claim(self, sid):
+        db = self._db()
+        now = time.time()
+        self._claims += 1
+        if self._claims % self.cleanup_every == 0:
+            db.execute("DELETE FROM inbound WHERE expires <= ?", (now,))
+        cur = db.execute("INSERT OR IGNORE INTO inbound VALUES (?, NULL, ?)", (sid, now + self.ttl))
+        if cur.rowcount == 1:
+            return None
+        row = db.execute("SELECT response, expires FROM inbound WHERE sid = ?", (sid,)).fetchone()
+        if row is None or row[1] <= now:
+            # انتهت صلاحيته: نأخذه من جديد (UPDATE مشروط حتى لا يأخذه اثنان)
+            cur = db.execute("UPDATE inbound SET response = NULL, expires = ? WHERE sid = ? AND expires <= ?",
+                             (now + self.ttl, sid, now))
+            return None if cur.rowcount == 1 else PENDING
+        return PENDING if row[0] is None else tuple(json.loads(row[0]))
+
+    def complete(self, sid, response):
+        self._db().execute("UPDATE inbound SET response = ? WHERE sid = ?",
+                           (json.dumps(list(response), ensure_ascii=False), sid))
+
+    def release(self, sid):
+        self._db().execute("DELETE FROM inbound WHERE sid = ?", (sid,))
+
+
+def _as_response(result):
+    # Flask يقبل "نص" أو (نص، حالة)؛ نحفظ دائماً (نص، حالة)
+    if isinstance(result, tuple):
+        return result[0], result[1]
+    return result, 200
+
+
+class Deduplicator:
+    def __init__(self, store, pending_response):
+        self.store = store
+        # ما نرد به على إعادة وصلت والطلب الأول ما زال قيد المعالجة
+        self.pending_response = pending_response
+        self.duplicates = 0
+        # run() من threads الطلبات: += ليس ذرياً
+        self._lock = threading.Lock()
+
+    def run(self, sid, handler):
+        if not sid:
+            return _as_response(handler())
+        hit = self.store.claim(sid)
+        if hit is not None:
+            with self._lock:
+                self.duplicates += 1
+            return self.pending_response if hit == PENDING else hit
+        try:
+            response = _as_response(handler())
+        except BaseException:
+            self.store.release(sid)
+            raise
+        if response[1] >= 500:
+            # 503 (طابور الإرسال ممتلئ) معناه "أعد المحاولة"، فلا نحفظه
+            self.store.release(sid)
+        else:
+            self.store.complete(sid, response)
+        return response
+
+
+class StateDeduplicator:
+    def __init__(self, state, ttl=3600.0):
+        self.state = state
+        self.ttl = ttl
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    def _key(self, sid):
+        return f"inbound:{sid}"
+
+    def claim(self, batch, sid, response):
+        # يضيف الحجز إلى batch ويعيد رقمه فيه (None بدون MessageSid)
+        if not sid:
+            return None
+        batch.set_nx(self._key(sid), list(_as_response(response)), self.ttl)
+        return len(batch.ops) - 1
+
+    def replay(self, hit):
+        with self._lock:
+            self.duplicates += 1
+        return tuple(hit)
+
+    def release(self, sid, batch=None):
+        # batch: مع عمليات أخرى في نفس الطلب (app2.py يعيد معه حدود الردود)
+        if sid:
+            if batch is None:
+                self.state.delete(self._key(sid))
+            else:
+                batch.delete(self._key(sid))
+
+
+def make_state_deduplicator(state):
+    return StateDeduplicator(state, float(os.environ.get("DEDUPE_TTL", "3600")))
+
+
+def make_deduplicator(pending_response):
+    ttl = float(os.environ.get("DEDUPE_TTL", "3600"))
+    if os.environ.get("DEDUPE_DB"):
+        store = SqliteStore(os.environ["DEDUPE_DB"], ttl)
+    else:
+        store = MemoryStore(int(os.environ.get("DEDUPE_MAX", "200000")), ttl)
+    return Deduplicator(store, pending_response)
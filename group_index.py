@@ -0,0 +1,97 @@
+# ---------------------------
+# فهرس المجموعات المسموحة
+# ---------------------------
+# يُبنى مرة واحدة عند تحميل الإعدادات بدل البحث الخطي في كل رسالة.
+# الفهرس لا يتغير بعد بنائه، وعند الحفظ يُبنى فهرس جديد ويُستبدل بإسناد
+# واحد، لذلك القراءة من عدة threads آمنة بدون قفل.
+#
+# تعديل مجموعة واحدة (updated) ينسخ القواميس ويغير المجموعات المعنية فقط
+# بدل المرور على كل المجموعات من جديد. النسخ نفسه O(عدد المجموعات) (dict و
+# tuple في C، ~7 ms لـ 100k مجموعة في bench_admin.py)، وليس O(التعديل).
+
+
+class GroupIndex:
+    __slots__ = ("groups", "by_id", "by_name", "name_count")
+
+    def __init__(self, groups):
+        self.groups = tuple(groups)
+        by_id = {}
+        by_name = {}
+        for g in self.groups:
+            # أول مجموعة بنفس المعرّف تفوز (نفس نتيجة next(...) القديمة)
+            by_id.setdefault(g.get("id"), g)
+            name = g.get("name")
+            if name:
+                by_name.setdefault(name, g)
+        self.by_id = by_id
+        self.by_name = by_name
+        count = {}
+        for g in by_id.values():
+            name = g.get("name")
+            if name:
+                count[name] = count.get(name, 0) + 1
+        self.name_count = count
+
+    def updated(self, changes):
+        # changes: [(المعرّف القديم أو None للإضافة، المجموعة الجديدة أو None للحذف)]
+        # يعيد فهرساً جديداً؛ هذا الفهرس لا يتغير. المعرّفات المكررة تُختصر لأولها.
+        # الاسم الذي لم يعد مستخدماً يبقى بقيمة None بدل حذفه: نسخ dict حُذف منه
+        # عنصر أبطأ بكثير في المرة التالية.
+        by_id = dict(self.by_id)
+        by_name = dict(self.by_name)
+        count = dict(self.name_count)
+        rescan = set()
+        for old_id, grp in changes:
+            old = by_id.get(old_id) if old_id is not None else None
+            if old is not None:
+                name = old.get("name")
+                if name:
+                    count[name] -= 1
+                    if by_name.get(name) is old:
+                        by_name[name] = None
+                        if count[name]:
+                            rescan.add(name)
+            if grp is None:
+                by_id.pop(old_id, None)
+            elif old is None or grp.get("id") == old_id:
+                by_id[grp.get("id")] = grp
+            else:
+                # معرّف جديد في نفس المكان: بناء القاموس من جديد (نادر)
+                by_id = {(grp.get("id") if k == old_id else k): (grp if k == old_id else v)
+                         for k, v in by_id.items()}
+            name = grp.get("name") if grp is not None else None
+            if name:
+                count[name] = count.get(name, 0) + 1
+                if count[name] == 1:
+                    by_name[name] = grp
+                    rescan.discard(name)
+                else:
+                    rescan.add(name)
+        if rescan:
+            # اسم مشترك بين عدة مجموعات: الأولى في الترتيب تفوز
+            for g in by_id.values():
+                name = g.get("name")
+                if name in rescan:
+                    by_name[name] = g
+                    rescan.discard(name)
+                    if not rescan:
+                        break
+        index = object.__new__(GroupIndex)
+        index.groups = tuple(by_id.values())
+        index.by_id = by_id
+        index.by_name = by_name
+        index.name_count = count
+        return index
+
+    def get(self, gid):
+        return self.by_id.get(gid)
+
+    def get_by_name(self, name):
+        return self.by_name.get(name)
+
+    def lookup(self, key):
+        # بالمعرّف أولاً ثم بالاسم (مثل dm.js)
+        return self.by_id.get(key) or self.by_name.get(key)
+
+    def __len__(self):
+        return len(self.groups)
@@ -0,0 +1,87 @@
+from collections import deque
+
+# ---------------------------
+# مطابقة الكلمات المفتاحية (Aho-Corasick)
+# ---------------------------
+# يُبنى مرة واحدة عند تحميل الإعدادات، ثم يمر على الرسالة مرة واحدة فقط
+# مهما كان عدد الكلمات. الرسالة تُحوّل لحروف صغيرة مرة واحدة.
+
+# تحت هذا العدد تكون الحلقة العادية (in المكتوبة بـ C) أسرع من الأوتوماتون
+SMALL_LIST = 32
+
+
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self.keywords = tuple(keywords)
+        folded = [kw.lower() for kw in self.keywords]
+        self._folded = tuple(folded)
+        # الكلمة الفارغة تطابق أي رسالة (نفس سلوك "" in msg)
+        self._empty = next((i for i, kw in enumerate(folded) if not kw), None)
+        self._small = len(folded) <= SMALL_LIST
+        if not self._small:
+            self._build(folded)
+
+    def _build(self, folded):
+        goto = [{}]
+        out = [()]
+        for idx, kw in enumerate(folded):
+            if not kw:
+                continue
+            node = 0
+            for ch in kw:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                node = nxt
+            out[node] = out[node] + (idx,)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                f = goto[f].get(ch, 0)
+                fail[nxt] = f if f != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def _indices(self, text):
+        text = text.lower()
+        if self._small:
+            return {i for i, kw in enumerate(self._folded) if kw in text}
+        hits = set()
+        if self._empty is not None:
+            hits.add(self._empty)
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                hits.update(out[node])
+        return hits
+
+    def positions(self, text):
+        # أرقام الكلمات المطابقة مرتبة (للربط مع جدول خارجي مثل reply_rules)
+        return sorted(self._indices(text))
+
+    def find_all(self, text):
+        # كل الكلمات المطابقة بترتيبها في config
+        return [self.keywords[i] for i in sorted(self._indices(text))]
+
+    def first(self, text):
+        # أول كلمة مطابقة حسب ترتيب config (نفس نتيجة الحلقة القديمة)
+        hits = self._indices(text)
+        return self.keywords[min(hits)] if hits else None
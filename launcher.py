@@ -0,0 +1,169 @@
+import argparse
+import gc
+import importlib
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+# ---------------------------
+# تشغيل الإنتاج: master + عدة workers (pre-fork)
+# ---------------------------
+# الـ master يقرأ config.json ويجهّز كل شيء (الكلمات، فهرس المجموعات،
+# القوالب) مرة واحدة قبل fork، فتتشارك العمليات هذه الصفحات copy-on-write.
+# gc.freeze() يمنع الـ GC من لمس هذه الكائنات فتبقى الصفحات مشتركة.
+#
+#   python launcher.py --app app2 --workers 4 --port 5000
+#
+# عند الحفظ من لوحة التحكم يرسل الـ worker إشارة SIGHUP للـ master، فيعيد
+# التحميل ويرسل SIGUSR1 لكل الـ workers ليعيدوا التحميل فوراً (store.check:
+# بعد تعديل جزئي تُقرأ أسطر config.json.journal الجديدة فقط).
+# الـ worker الذي يتوقف يُعاد تشغيله تلقائياً.
+#
+# مع أكثر من worker تكون حالة التشغيل (مهل الردود، MessageSid المعالجة)
+# مشتركة في runtime_state.db ما لم يُحدد RUNTIME_STATE غيره، ولكل worker
+# ملف audit.<pid>.jsonl خاص به (AUDIT_LOG): التدوير بـ os.replace في عملية
+# واحدة كان يجعل الأخرى تكتب في ملف قديم يُضغط ثم يُحذف.
+
+
+def memory_kb(pid):
+    # RSS من /proc/<pid>/status و PSS (حصة الصفحات المشتركة) من smaps_rollup
+    out = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    out["rss"] = int(line.split()[1])
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith(("Pss:", "Shared_Clean:", "Shared_Dirty:")):
+                    key, value = line.split()[:2]
+                    out[key.rstrip(":").lower()] = int(value)
+    except OSError:
+        pass
+    return out
+
+
+class Master:
+    def __init__(self, module, host, port, workers):
+        self.module_name = module
+        self.host = host
+        self.port = port
+        self.count = workers
+        self.workers = {}
+        self.running = True
+
+    def start(self):
+        if self.count > 1:
+            os.environ.setdefault("RUNTIME_STATE", "runtime_state.db")
+            os.environ.setdefault("AUDIT_LOG", "audit.{pid}.jsonl")
+        t0 = time.perf_counter()
+        self.mod = importlib.import_module(self.module_name)
+        compiled = time.perf_counter() - t0
+        # لا threads في الـ master قبل fork: الـ watcher يعمل داخل كل worker
+        gc.collect()
+        gc.freeze()
+
+        self.sock = socket.create_server((self.host, self.port), backlog=1024)
+        self.sock.set_inheritable(True)
+        self.ready_r, self.ready_w = os.pipe()
+
+        signal.signal(signal.SIGHUP, self._reload_all)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        for slot in range(self.count):
+            self._spawn(slot)
+        ready = 0
+        while ready < self.count:
+            ready += len(os.read(self.ready_r, self.count - ready))
+        started = time.perf_counter() - t0
+
+        snap = self.mod.store.current
+        print(f"🚀 {self.count} workers on http://{self.host}:{self.port} "
+              f"({len(snap.groups)} groups, {len(snap.rules)} reply rules)")
+        print(f"⏱️ compile {compiled * 1000:.0f} ms, all workers ready {started * 1000:.0f} ms")
+        self.report_memory()
+        self._supervise()
+
+    def report_memory(self):
+        m = memory_kb(os.getpid())
+        print(f"   master   pid {os.getpid():>6}: rss {m.get('rss', 0) / 1024:7.1f} MB")
+        for pid, slot in sorted(self.workers.items(), key=lambda kv: kv[1]):
+            m = memory_kb(pid)
+            print(f"   worker {slot} pid {pid:>6}: rss {m.get('rss', 0) / 1024:7.1f} MB  "
+                  f"pss {m.get('pss', 0) / 1024:7.1f} MB  "
+                  f"shared {(m.get('shared_clean', 0) + m.get('shared_dirty', 0)) / 1024:7.1f} MB")
+
+    def _spawn(self, slot):
+        # thread في الـ master (مثلاً store.get() عند الاستيراد) قد يحمل قفلاً لحظة
+        # fork، فيرث الـ worker قفلاً لا يُفتح أبداً
+        if threading.active_count() != 1:
+            names = ", ".join(t.name for t in threading.enumerate() if t is not threading.current_thread())
+            raise RuntimeError(f"{self.module_name}: threads running in the master before fork: {names}")
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = slot
+            return
+        try:
+            self._worker(slot)
+        finally:
+            os._exit(0)
+
+    def _worker(self, slot):
+        master = os.getppid()
+        store = self.mod.store
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        signal.signal(signal.SIGUSR1, lambda *_: store.check())
+        store.on_save.append(lambda snap: os.kill(master, signal.SIGHUP))
+        os.close(self.ready_r)
+
+        server = make_server(self.host, self.port, self.mod.app, threaded=True, fd=self.sock.fileno())
+        os.write(self.ready_w, b"1")
+        server.serve_forever()
+
+    def _reload_all(self, *_):
+        # نسخة الـ master تُستخدم للـ workers الجدد بعد أي إعادة تشغيل
+        self.mod.store.check()
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGUSR1)
+            except ProcessLookupError:
+                pass
+
+    def _stop(self, *_):
+        self.running = False
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _supervise(self):
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            slot = self.workers.pop(pid, None)
+            if slot is not None and self.running:
+                print(f"⚠️ worker {slot} (pid {pid}) توقف، إعادة تشغيل...")
+                self._spawn(slot)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fork launcher for the webhook apps")
+    parser.add_argument("--app", default="app2", help="module with `app` and `store` (app, app1, app2)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+    Master(args.app, args.host, args.port, args.workers).start()
@@ -0,0 +1,197 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+# ---------------------------
+# قياسات مسار الـ webhook (Prometheus)
+# ---------------------------
+# كل thread يكتب في عداداته الخاصة بدون أي قفل، وعند طلب /metrics تُجمع
+# عدادات كل الـ threads. عدادات الـ threads المنتهية (السيرفر يفتح thread
+# لكل اتصال) تُدمج في مجموع ثابت وتُحذف حتى لا تكبر الذاكرة.
+#
+#   lap = metrics.stopwatch()
+#   ... قراءة الطلب ...
+#   lap("parse")          # يسجل الزمن منذ آخر lap في histogram المرحلة
+#   metrics.inc("keyword", matched_kw)
+
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# اسم العداد -> (اسم Prometheus، اسم الـ label، الوصف)
+COUNTERS = {
+    "keyword": ("webhook_keyword_matches_total", "keyword", "Messages matched per keyword"),
+    "group": ("webhook_group_replies_total", "group", "Replies per allowed group id (none = general reply)"),
+    "no_match": ("webhook_no_match_total", None, "Messages with no keyword (fallback reply)"),
+    "rate_limited": ("webhook_rate_limited_total", "scope", "Replies skipped by the cooldown / rate limits"),
+    "dashboard": ("dashboard_responses_total", "result", "Dashboard GETs by page cache result (hit, miss, not_modified, stream)"),
+}
+
+
+class _Local:
+    __slots__ = ("hist", "counters")
+
+    def __init__(self):
+        # المرحلة -> [عدادات الـ buckets..., +Inf, المجموع]
+        self.hist = {}
+        self.counters = {}
+
+
+def _merge(into, local):
+    # list(...) نسخة ذرية؛ الـ thread صاحب العدادات قد يضيف مفتاحاً أثناء الجمع
+    for stage, h in list(local.hist.items()):
+        acc = into.hist.get(stage)
+        if acc is None:
+            into.hist[stage] = list(h)
+        else:
+            for i, v in enumerate(h):
+                acc[i] += v
+    for key, v in list(local.counters.items()):
+        into.counters[key] = into.counters.get(key, 0) + v
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    def __init__(self):
+        self._tls = threading.local()
+        self._threads = []
+        self._retired = _Local()
+        self._lock = threading.Lock()
+        self._gauges = {}
+
+    def _local(self):
+        try:
+            return self._tls.store
+        except AttributeError:
+            store = self._tls.store = _Local()
+            with self._lock:
+                if len(self._threads) > 256:
+                    self._collect_dead()
+                self._threads.append((weakref.ref(threading.current_thread()), store))
+            return store
+
+    def _collect_dead(self):
+        alive = []
+        for ref, store in self._threads:
+            t = ref()
+            if t is None or not t.is_alive():
+                _merge(self._retired, store)
+            else:
+                alive.append((ref, store))
+        self._threads = alive
+
+    def observe(self, stage, seconds):
+        hist = self._local().hist
+        h = hist.get(stage)
+        if h is None:
+            h = hist[stage] = [0] * (len(BUCKETS) + 2)
+        h[bisect_left(BUCKETS, seconds)] += 1
+        h[-1] += seconds
+
+    def stopwatch(self):
+        last = [time.perf_counter()]
+
+        def lap(stage):
+            now = time.perf_counter()
+            self.observe(stage, now - last[0])
+            last[0] = now
+        return lap
+
+    def timed(self, stage, fn):
+        # يغلف دالة (مثل messages.create) ويقيس زمنها حتى لو فشلت
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.observe(stage, time.perf_counter() - t0)
+        return wrapper
+
+    def inc(self, name, label=None, value=1):
+        counters = self._local().counters
+        key = (name, label)
+        counters[key] = counters.get(key, 0) + value
+
+    def gauge(self, name, fn, help_text="", kind="gauge"):
+        # قيمة تُقرأ وقت الـ scrape فقط (طول الطابور، إعادة استخدام الاتصالات...)
+        # kind="counter" للمجاميع التي لا تنقص إلا عند إعادة التشغيل
+        self._gauges[name] = (fn, help_text, kind)
+
+    def counter(self, name, fn, help_text=""):
+        self.gauge(name, fn, help_text, "counter")
+
+    def snapshot(self):
+        total = _Local()
+        with self._lock:
+            self._collect_dead()
+            _merge(total, self._retired)
+            stores = [store for _, store in self._threads]
+        for store in stores:
+            _merge(total, store)
+        return total
+
+    def render(self):
+        total = self.snapshot()
+        out = []
+        if total.hist:
+            out.append("# HELP webhook_stage_seconds Latency of each whatsapp_webhook stage")
+            out.append("# TYPE webhook_stage_seconds histogram")
+        for stage in sorted(total.hist):
+            h = total.hist[stage]
+            cumulative = 0
+            for bound, count in zip(BUCKETS, h):
+                cumulative += count
+                out.append(f'webhook_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            cumulative += h[len(BUCKETS)]
+            out.append(f'webhook_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative}')
+            out.append(f'webhook_stage_seconds_sum{{stage="{stage}"}} {h[-1]:.9f}')
+            out.append(f'webhook_stage_seconds_count{{stage="{stage}"}} {cumulative}')
+
+        for name, (metric, label, help_text) in COUNTERS.items():
+            out.append(f"# HELP {metric} {help_text}")
+            out.append(f"# TYPE {metric} counter")
+            rows = sorted((k[1], v) for k, v in total.counters.items() if k[0] == name)
+            if label is None:
+                out.append(f"{metric} {sum(v for _, v in rows)}")
+            else:
+                for value, count in rows:
+                    out.append(f'{metric}{{{label}="{_label(value)}"}} {count}')
+
+        for name, (fn, help_text, kind) in sorted(self._gauges.items()):
+            if help_text:
+                out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.append(f"{name} {fn()}")
+        return "\n".join(out) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+metrics = Metrics()
+
+
+def watch_outbound(outbox, twilio_client=None):
+    # قيم طابور الإرسال واتصالات Twilio تظهر في /metrics
+    metrics.gauge("twilio_send_queue_pending", outbox.pending, "Private replies waiting to be sent")
+    metrics.counter("twilio_sent_messages_total", lambda: outbox.sent, "Private replies sent since start")
+    metrics.counter("twilio_dead_letters_total", lambda: outbox.failed, "Private replies that failed permanently")
+    # LazyClient (twilio_transport.py) يعطي stats بدون بناء Client
+    stats = getattr(twilio_client, "stats", None) or getattr(getattr(twilio_client, "http_client", None), "stats", None)
+    if stats is not None:
+        metrics.gauge("twilio_connection_reuse_ratio", lambda: stats.snapshot()["reuse_ratio"],
+                      "Share of Twilio requests that reused a pooled connection")
+
+
+def watch_inbound(inbound):
+    metrics.counter("webhook_duplicate_retries_total", lambda: inbound.duplicates,
+                    "Twilio retries answered from the MessageSid cache")
+
+
+def watch_audit(audit):
+    metrics.gauge("audit_log_pending", audit.pending, "Audit records waiting in the write buffer")
+    metrics.counter("audit_log_written_total", lambda: audit.written, "Audit records written since start")
+    metrics.counter("audit_log_dropped_total", lambda: audit.dropped,
+                    "Audit records dropped because the buffer was full")
@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from jinja2 import Environment
+
+from metrics import metrics
+
+# ---------------------------
+# كاش صفحة لوحة التحكم
+# ---------------------------
+# القالب يُترجم مرة واحدة عند الاستيراد، والصفحة الناتجة تُحفظ لكل رابط
+# (q/page/kw_page/per_page) مع رقم الـ snapshot التي رُسمت منها (version،
+# وserial للتعديل اليدوي الذي لا يغيّر version)، وليس الـ snapshot نفسها حتى
+# لا تبقى نسخة قديمة في الذاكرة. أول طلب على snapshot أحدث يحذف كل الصفحات.
+#
+# ETag = hash محتوى الصفحة (نفسه في كل عمليات launcher.py)، وIf-None-Match
+# المطابق يأخذ 304 بدون جسم. الصفحات الأكبر من min_gzip تُرسل gzip لمن يقبله
+# (تُضغط مرة واحدة وتُحفظ). الصفحة التي فيها أكثر من stream_rows صف تُرسل
+# أثناء رسمها (template.generate) وتُحفظ في الكاش عند انتهائها: الصفحة
+# الافتراضية (50 مجموعة + 50 كلمة) تُرسم كاملة، وأي per_page أكبر يُرسل stream.
+
+HTML_TYPE = "text/html; charset=utf-8"
+CHUNK = 16 << 10
+
+
+class PageCache:
+    def __init__(self, source, context, size=64, min_gzip=2048, stream_rows=100):
+        # context(snap, args) -> متغيرات القالب
+        self.template = Environment(autoescape=True).from_string(source)
+        self.source_tag = hashlib.blake2b(source.encode("utf-8"), digest_size=4).hexdigest()
+        self.context = context
+        self.size = size
+        self.min_gzip = min_gzip
+        self.stream_rows = stream_rows
+        self._pages = OrderedDict()
+        # (version, serial) للصفحات المحفوظة
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _key(self, args):
+        return tuple((args.get(k) or "").strip() for k in ("q", "page", "kw_page", "per_page"))
+
+    def _etag(self, body):
+        return f'"{self.source_tag}-{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+    def _lookup(self, key, snap):
+        with self._lock:
+            if (snap.version, snap.serial) != self._version:
+                return None
+            entry = self._pages.get(key)
+            if entry is not None:
+                self._pages.move_to_end(key)
+            return entry
+
+    def _store(self, key, snap, body):
+        entry = {"body": body, "etag": self._etag(body), "gzip": None}
+        version = (snap.version, snap.serial)
+        with self._lock:
+            if self._version is None or version[1] > self._version[1]:
+                self._pages.clear()
+                self._version = version
+            elif version != self._version:
+                # stream من snapshot قديمة انتهى بعد التعديل: لا يُحفظ
+                return entry
+            self._pages[key] = entry
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.size:
+                self._pages.popitem(last=False)
+        return entry
+
+    def respond(self, snap, args, accept_encoding="", if_none_match=""):
+        # (status, headers, body) حيث body إما bytes أو iterator من bytes (stream)
+        key = self._key(args)
+        gz = "gzip" in (accept_encoding or "")
+        entry = self._lookup(key, snap)
+        if entry is None:
+            ctx = self.context(snap, args)
+            if len(ctx.get("groups", ())) + len(ctx.get("keywords", ())) > self.stream_rows:
+                metrics.inc("dashboard", "stream")
+                return self._stream(key, snap, ctx, gz)
+            entry = self._store(key, snap, self.template.render(**ctx).encode("utf-8"))
+            result = "miss"
+        else:
+            result = "hit"
+        # بعد إعادة التشغيل أو من عملية أخرى: نفس المحتوى = نفس ETag
+        if if_none_match and _matches(if_none_match, entry["etag"]):
+            metrics.inc("dashboard", "not_modified")
+            return 304, [("ETag", entry["etag"]), ("Cache-Control", "no-cache"), ("Vary", "Accept-Encoding")], b""
+        metrics.inc("dashboard", result)
+
+        headers = [("Content-Type", HTML_TYPE), ("ETag", entry["etag"]),
+                   ("Cache-Control", "no-cache"), ("Vary", "Accept-Encoding")]
+        body = entry["body"]
+        if gz and len(body) >= self.min_gzip:
+            if entry["gzip"] is None:
+                entry["gzip"] = gzip.compress(body, 6)
+            body = entry["gzip"]
+            headers.append(("Content-Encoding", "gzip"))
+        headers.append(("Content-Length", str(len(body))))
+        return 200, headers, body
+
+    def _stream(self, key, snap, ctx, gz):
+        headers = [("Content-Type", HTML_TYPE), ("Cache-Control", "no-cache"), ("Vary", "Accept-Encoding")]
+        if gz:
+            headers.append(("Content-Encoding", "gzip"))
+        return 200, headers, self._chunks(key, snap, ctx, gz)
+
+    def _chunks(self, key, snap, ctx, gz):
+        # أجزاء Jinja صغيرة جداً: تُجمع في CHUNK قبل الإرسال
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gz else None
+        parts, pending, size = [], [], 0
+        for text in self.template.generate(**ctx):
+            data = text.encode("utf-8")
+            parts.append(data)
+            pending.append(data)
+            size += len(data)
+            if size >= CHUNK:
+                out = b"".join(pending)
+                pending, size = [], 0
+                out = compressor.compress(out) if compressor else out
+                if out:
+                    yield out
+        out = b"".join(pending)
+        if compressor:
+            out = compressor.compress(out) + compressor.flush()
+        if out:
+            yield out
+        self._store(key, snap, b"".join(parts))
+
+
+def _matches(header, etag):
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return etag in tags or "*" in tags
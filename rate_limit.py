@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------------------
+# حد الردود: مهلة (cooldown) + token bucket
+# ---------------------------
+# في مجموعة نشطة كل رسالة فيها "مساعدة" كانت تأخذ رداً. الحدود تُكتب في
+# config.json وتُعدّل من لوحة التحكم، وكل نطاق مستقل:
+#
+#   "rate_limits": {
+#     "sender":       {"cooldown": 60, "per_minute": 0, "burst": 0},
+#     "group":        {"cooldown": 0,  "per_minute": 6, "burst": 3},
+#     "sender_group": {"cooldown": 300, "per_minute": 0, "burst": 0}
+#   }
+#
+# cooldown: أقل عدد ثوانٍ بين ردين لنفس المفتاح
+# per_minute / burst: معدل التعبئة وسعة الـ bucket (0 = بدون حد)
+# الرد يُسمح فقط إذا سمحت كل النطاقات، وعندها فقط يُخصم من كل نطاق.
+#
+# RateLimiter في ذاكرة العملية (token bucket). limit_ops تضيف نفس الفحص إلى
+# pipeline على runtime_state.py حتى تتشارك عدة workers نفس الحدود: المهلة
+# مفتاح set_nx ينتهي بعد cooldown، والمعدل نافذة ثابتة طولها burst/per_minute
+# دقيقة تسمح بـ burst رد (incr مع limit). مع all_or_nothing لا يُخصم شيء إذا
+# منع أي نطاق.
+
+SCOPES = (
+    ("sender", "لكل مرسل"),
+    ("group", "لكل مجموعة"),
+    ("sender_group", "لكل مرسل داخل مجموعة"),
+)
+FIELDS = ("cooldown", "per_minute", "burst")
+
+
+def _number(value):
+    try:
+        return max(0.0, float(value or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class Limit:
+    __slots__ = ("cooldown", "rate", "burst", "idle")
+
+    def __init__(self, cooldown=0, per_minute=0, burst=0):
+        self.cooldown = _number(cooldown)
+        self.rate = _number(per_minute) / 60.0
+        self.burst = max(1.0, _number(burst)) if self.rate else 1.0
+        # بعد هذه المدة بلا رد يكون المفتاح كأنه جديد، فيمكن حذفه
+        self.idle = max(self.cooldown, self.burst / self.rate if self.rate else 0.0)
+
+    def __bool__(self):
+        return bool(self.cooldown or self.rate)
+
+
+def parse_limits(cfg):
+    # النطاقات المفعلة فقط: {"sender": Limit, ...}
+    raw = cfg.get("rate_limits") or {}
+    limits = {}
+    for scope, _ in SCOPES:
+        opts = raw.get(scope) or {}
+        limit = Limit(*(opts.get(f, 0) for f in FIELDS))
+        if limit:
+            limits[scope] = limit
+    return limits
+
+
+def limits_from_form(form):
+    # حقول اللوحة: rl_<scope>_<field>
+    out = {}
+    for scope, _ in SCOPES:
+        opts = {}
+        for field in FIELDS:
+            value = _number(form.get(f"rl_{scope}_{field}", 0))
+            opts[field] = int(value) if value == int(value) else value
+        out[scope] = opts
+    return out
+
+
+class RateLimiter:
+    def __init__(self, maxsize=100_000):
+        # لكل نطاق: المفتاح -> [tokens، وقت التحديث، وقت آخر رد، ينتهي في]
+        # مرتبة حسب آخر رد، فالأقدم في البداية ويُحذف أولاً
+        self.maxsize = maxsize
+        self._buckets = {scope: OrderedDict() for scope, _ in SCOPES}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(b) for b in self._buckets.values())
+
+    def check(self, limits, sender, group=None, now=None):
+        # يعيد None ويسجل الرد إذا كان مسموحاً، وإلا اسم النطاق الذي منعه
+        if not limits:
+            return None
+        now = now or time.monotonic()
+        keys = {"sender": sender, "group": group,
+                "sender_group": (sender, group) if group is not None else None}
+        with self._lock:
+            taken = []
+            for scope, limit in limits.items():
+                key = keys[scope]
+                if key is None:
+                    continue
+                buckets = self._buckets[scope]
+                entry = buckets.get(key)
+                tokens = limit.burst
+                if entry is not None and entry[3] > now:
+                    if now - entry[2] < limit.cooldown:
+                        return scope
+                    if limit.rate:
+                        tokens = min(limit.burst, entry[0] + (now - entry[1]) * limit.rate)
+                        if tokens < 1:
+                            return scope
+                taken.append((buckets, key, tokens - 1, now + limit.idle))
+
+            for buckets, key, tokens, expires in taken:
+                buckets[key] = [tokens, now, now, expires]
+                buckets.move_to_end(key)
+                while buckets:
+                    head = next(iter(buckets.values()))
+                    if head[3] > now and len(buckets) <= self.maxsize:
+                        break
+                    buckets.popitem(last=False)
+        return None
+
+    def refund(self, limits, sender, group=None):
+        # يعيد ما أخذه check الناجح: token لكل نطاق وإلغاء المهلة، مثلاً عندما
+        # لم يُرسل الرد بعد كل شيء (check نجح فآخر رد قبله كان خارج المهلة)
+        keys = {"sender": sender, "group": group,
+                "sender_group": (sender, group) if group is not None else None}
+        with self._lock:
+            for scope, limit in limits.items():
+                entry = self._buckets[scope].get(keys[scope])
+                if entry is not None:
+                    entry[0] = min(limit.burst, entry[0] + 1)
+                    entry[2] = float("-inf")
+
+
+def limit_ops(batch, limits, sender, group=None, now=None):
+    # يضيف عمليات كل نطاق مفعّل إلى batch؛ يعيد [(النطاق، رقم العملية، الحد)]
+    now = now or time.time()
+    keys = {"sender": sender, "group": group,
+            "sender_group": f"{sender}|{group}" if group is not None else None}
+    checks = []
+    for scope, limit in limits.items():
+        key = keys[scope]
+        if key is None:
+            continue
+        if limit.cooldown:
+            checks.append((scope, len(batch.ops), None))
+            batch.set_nx(f"cd:{scope}:{key}", 1, ttl=limit.cooldown)
+        if limit.rate:
+            window = limit.burst / limit.rate
+            checks.append((scope, len(batch.ops), limit.burst))
+            batch.incr(f"rl:{scope}:{key}:{int(now // window)}", ttl=window, limit=limit.burst)
+    return checks
+
+
+def refund_ops(batch, taken, checks):
+    # يعيد ما أخذه limit_ops في taken (batch طُبق) عبر batch جديد: حذف مفتاح
+    # المهلة وإنقاص عداد النافذة، مثلاً عندما لم يُرسل الرد بعد كل شيء.
+    # decr وليس incr(-1): إذا انتهت النافذة لا يُنشأ عداد -1 يعطي رداً زائداً
+    for scope, index, burst in checks:
+        key = taken.ops[index][1]
+        if burst is None:
+            batch.delete(key)
+        else:
+            batch.decr(key)
+
+
+def blocked_by(checks, results):
+    # اسم أول نطاق منع الرد، أو None
+    for scope, index, burst in checks:
+        result = results[index]
+        if (result is not None) if burst is None else (result > burst):
+            return scope
+    return None
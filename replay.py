@@ -0,0 +1,191 @@
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+
+from config_cache import ConfigSnapshot, read_config
+from reply_templates import reply_values
+
+# ---------------------------
+# تشغيل سجل رسائل واردة على قواعد الرد بدون Flask وبدون إرسال
+# ---------------------------
+# كل سطر في السجل رسالة بحقول Twilio نفسها:
+#   {"Body": "كم السعر", "From": "whatsapp:+2010...", "ProfileName": "Sara"}
+# وملفات audit_log.py (audit.jsonl) تُقرأ كما هي.
+#
+#   python replay.py messages.jsonl                       # عدد مرات كل قاعدة
+#   python replay.py messages.jsonl --against new.json    # الردود التي تتغير
+#
+# نفس خطوات whatsapp_webhook: المجموعة، القاعدة الفائزة، القالب. حدود الردود
+# لا تُطبق (تعتمد على وقت الوصول)، و{time} يبقى كما هو حتى لا يختلف الرد
+# حسب الساعة. الملف يُقسم بالبايت على عدة عمليات، كل عملية تقرأ جزءها مباشرة
+# وتجهّز الإعدادات مرة واحدة، وتعيد عدادات فقط.
+
+NO_MATCH = "(no match)"
+EMPTY = "(empty)"
+CHUNK = 8 << 20
+CACHE_SIZE = 200_000
+
+_snaps = ()
+
+
+def reply(snap, msg, cache=None):
+    # (اسم القاعدة، نص الرد أو None)
+    # cache: dict النص -> القواعد المرشحة (مرور KeywordMatcher)؛ السجلات الحقيقية تتكرر كثيراً
+    body = (msg.get("Body") or "").strip()
+    if not body:
+        return EMPTY, None
+    sender = (msg.get("From") or "").strip()
+    grp = snap.groups.get(sender)
+    if cache is None:
+        ranks = snap.rules.candidates(body)
+    else:
+        ranks = cache.get(body)
+        if ranks is None:
+            if len(cache) >= CACHE_SIZE:
+                cache.clear()
+            ranks = cache[body] = snap.rules.candidates(body)
+    hit = snap.rules.pick(body, ranks, grp.get("id") if grp else None)
+    if not hit:
+        return NO_MATCH, None
+    rule, matched = hit
+    tpl = rule.template or snap.templates.for_group(grp)
+    return rule.match, tpl.render(reply_values(sender, msg.get("ProfileName", ""), grp, matched, "{time}"))
+
+
+def _init(paths):
+    global _snaps
+    _snaps = tuple(ConfigSnapshot(read_config(p)) for p in paths)
+
+
+def _replay_range(task):
+    path, start, end, examples = task
+    hits = [Counter() for _ in _snaps]
+    caches = [{} for _ in _snaps]
+    changes = Counter()
+    samples = []
+    count = errors = diffs = 0
+    decode = json.JSONDecoder().decode
+    # الملفات المضغوطة (أجزاء audit.jsonl المدوّرة) تُقرأ كاملة في مهمة واحدة
+    with (gzip.open if path.endswith(".gz") else open)(path, "rb") as f:
+        if start:
+            # السطر يتبع الجزء الذي يبدأ فيه
+            f.seek(start - 1)
+            f.readline()
+        pos = f.tell()
+        for line in f:
+            if pos >= end:
+                break
+            offset = pos
+            pos += len(line)
+            try:
+                msg = decode(line.decode("utf-8"))
+            except ValueError:
+                errors += 1
+                continue
+            if not isinstance(msg, dict):
+                errors += 1
+                continue
+            if msg.get("dir", "in") != "in":
+                continue  # ردود وفجوات audit_log.py
+            count += 1
+            results = [reply(snap, msg, cache) for snap, cache in zip(_snaps, caches)]
+            for counter, (name, _) in zip(hits, results):
+                counter[name] += 1
+            if len(results) == 2 and results[0] != results[1]:
+                diffs += 1
+                changes[results[0][0], results[1][0]] += 1
+                if len(samples) < examples:
+                    samples.append({"offset": offset, "Body": msg.get("Body"), "From": msg.get("From"),
+                                    "old_rule": results[0][0], "old": results[0][1],
+                                    "new_rule": results[1][0], "new": results[1][1]})
+    return count, errors, hits, diffs, changes, samples
+
+
+def _ranges(path, chunk):
+    if path.endswith(".gz"):
+        return [(0, float("inf"))]
+    size = os.path.getsize(path)
+    return [(start, min(start + chunk, size)) for start in range(0, size, chunk)] or [(0, 0)]
+
+
+def replay(path, configs, workers=None, examples=10, chunk=CHUNK):
+    # configs: مسار واحد، أو مساران للمقارنة (القديم ثم الجديد)
+    tasks = [(path, start, end, examples) for start, end in _ranges(path, chunk)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        _init(configs)
+        parts = map(_replay_range, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_init, initargs=(configs,))
+        parts = pool.imap_unordered(_replay_range, tasks)
+
+    result = {"messages": 0, "errors": 0, "hits": [Counter() for _ in configs],
+              "diffs": 0, "changes": Counter(), "examples": []}
+    try:
+        for count, errors, hits, diffs, changes, samples in parts:
+            result["messages"] += count
+            result["errors"] += errors
+            for total, part in zip(result["hits"], hits):
+                total.update(part)
+            result["diffs"] += diffs
+            result["changes"].update(changes)
+            result["examples"].extend(samples[:examples - len(result["examples"])])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return result
+
+
+def report(result, configs, seconds, top=20):
+    lines = [f"{result['messages']} messages in {seconds:.2f} s "
+             f"({result['messages'] / seconds if seconds else 0:,.0f}/s), {result['errors']} bad lines"]
+    old = result["hits"][0]
+    new = result["hits"][1] if len(configs) == 2 else None
+    lines.append("")
+    lines.append(f"{'rule':<40} {os.path.basename(configs[0]):>12}" +
+                 (f" {os.path.basename(configs[1]):>12} {'change':>8}" if new is not None else ""))
+    names = sorted(set(old) | set(new or ()), key=lambda n: -max(old[n], (new or {}).get(n, 0)))
+    for name in names[:top]:
+        row = f"{name[:40]:<40} {old[name]:>12}"
+        if new is not None:
+            row += f" {new[name]:>12} {new[name] - old[name]:>+8}"
+        lines.append(row)
+    if len(names) > top:
+        lines.append(f"... {len(names) - top} more rules")
+
+    if new is not None:
+        lines.append("")
+        lines.append(f"{result['diffs']} replies change")
+        for (a, b), n in result["changes"].most_common(top):
+            lines.append(f"  {n:>8}  {a} -> {b}")
+        for ex in result["examples"]:
+            lines.append(json.dumps(ex, ensure_ascii=False))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a JSONL log of inbound messages through the reply rules")
+    parser.add_argument("log", help="JSONL file, one Twilio form per line (Body, From, ProfileName)")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--against", help="second config.json: report replies that differ")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--examples", type=int, default=10, help="changed replies to print")
+    parser.add_argument("--top", type=int, default=20, help="rules / changes to list")
+    args = parser.parse_args(argv)
+
+    configs = [args.config] + ([args.against] if args.against else [])
+    t0 = time.perf_counter()
+    result = replay(args.log, configs, args.workers, args.examples)
+    print(report(result, configs, time.perf_counter() - t0, args.top))
+    return 1 if result["diffs"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
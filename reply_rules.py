@@ -0,0 +1,173 @@
+import _sre
+import functools
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # بايثون 3.10 وأقدم
+    import sre_parse
+
+from keyword_matcher import KeywordMatcher
+from reply_templates import ReplyTemplate
+
+# ---------------------------
+# قواعد الرد: كلمة أو regex -> قالب، مع أولوية ونطاق مجموعات
+# ---------------------------
+#   "reply_rules": [
+#     {"match": "سعر", "regex": false, "groups": [], "priority": 10,
+#      "template": "الأسعار هنا {name}"},
+#     {"match": "طلب\\s*#?\\d+", "regex": true, "groups": ["123456789-123456@g.us"],
+#      "priority": 20, "template": "جاري متابعة {keyword}"}
+#   ]
+#
+# groups فارغة = كل المرسلين. template فارغ = قالب المجموعة المعتاد.
+# الأعلى priority يفوز، وعند التساوي الأسبق في القائمة. الكلمات القديمة في
+# "keywords" قواعد بأولوية 0 بعد reply_rules وبقالب المجموعة.
+#
+# تُجهّز مرة واحدة مع ConfigSnapshot: كل الكلمات، ومعها أطول نص ثابت في كل
+# regex، في KeywordMatcher واحد (مرور واحد على الرسالة). المطابقات تُحوّل
+# بجدول إلى أرقام القواعد، ثم تُجرب بالترتيب: أول كلمة في النطاق تفوز، و
+# الـ regex يُنفذ فقط إذا ظهر نصه الثابت في الرسالة.
+
+
+class Rule:
+    __slots__ = ("match", "regex", "groups", "priority", "template", "rank", "pattern")
+
+    def __init__(self, match, regex=False, groups=(), priority=0, template="", rank=0):
+        self.match = match
+        self.regex = bool(regex)
+        self.groups = frozenset(g for g in groups if g) or None
+        self.priority = priority
+        self.template = ReplyTemplate(template) if template else None
+        self.rank = rank
+        self.pattern = None
+
+    def applies(self, group_id):
+        return self.groups is None or group_id in self.groups
+
+
+@functools.lru_cache(maxsize=None)
+def _unfoldable():
+    # حروف يطابقها IGNORECASE مع حرف لا يعطيه lower() (ſ و s، ı و İ و i، ς و σ...)
+    # الرسالة تُطابق بعد lower() فقط، فهذه لا تدخل في النص الثابت
+    chars = set()
+    for i in range(0x1F000):
+        ch = chr(i)
+        low, up = ch.lower(), ch.upper().lower()
+        if low != up or len(low) != 1:
+            chars.update(c for c in (low, up, chr(_sre.unicode_tolower(i))) if len(c) == 1)
+    return frozenset(chars)
+
+
+def _anchor(pattern):
+    # أطول نص ثابت لا بد أن يظهر في أي تطابق، أو "" (يُجرب الـ regex دائماً)
+    best = run = ""
+    unfoldable = _unfoldable()
+    for op, arg in sre_parse.parse(pattern):
+        low = chr(arg).lower() if op is sre_parse.LITERAL else ""
+        if len(low) == 1 and low not in unfoldable:
+            run += chr(arg)
+            if len(run) > len(best):
+                best = run
+        else:
+            run = ""
+    return best if len(best) >= 2 else ""
+
+
+def _priority(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_rules(cfg):
+    # القواعد مرتبة حسب الأولوية؛ rank = الترتيب النهائي
+    # كلمة فارغة ("" من تقسيم الفواصل في app4 أو config قديم) تطابق كل رسالة: تُتجاهل
+    raw = [dict(r) for r in cfg.get("reply_rules") or () if str(r.get("match") or "").strip()]
+    raw += [{"match": kw} for kw in cfg.get("keywords") or () if isinstance(kw, str) and kw.strip()]
+    order = sorted(range(len(raw)), key=lambda i: -_priority(raw[i].get("priority")))
+    rules = []
+    for i in order:
+        r = raw[i]
+        if r.get("regex"):
+            try:
+                re.compile(r["match"])
+            except re.error as e:
+                print(f"⚠️ قاعدة regex غير صالحة {r['match']!r}: {e}")
+                continue
+        rules.append(Rule(r["match"], r.get("regex"), r.get("groups") or (), _priority(r.get("priority")),
+                          r.get("template", ""), len(rules)))
+    return rules
+
+
+def rules_from_form(form):
+    # حقول اللوحة: rule_<field>_<i>، وزر add_rule / del_rule=<i>
+    rules = []
+    drop = form.get("del_rule")
+    i = 0
+    while f"rule_match_{i}" in form:
+        match = form.get(f"rule_match_{i}", "").strip()
+        if match and str(i) != drop:
+            regex = bool(form.get(f"rule_regex_{i}"))
+            if regex:
+                try:
+                    re.compile(match)
+                except re.error as e:
+                    raise ValueError(f"regex غير صالح {match!r}: {e}") from None
+            rules.append({
+                "match": match,
+                "regex": regex,
+                "groups": [g.strip() for g in form.get(f"rule_groups_{i}", "").split(",") if g.strip()],
+                "priority": _priority(form.get(f"rule_priority_{i}")),
+                "template": form.get(f"rule_template_{i}", "").strip(),
+            })
+        i += 1
+    if "add_rule" in form:
+        rules.append({"match": "كلمة جديدة", "regex": False, "groups": [], "priority": 0, "template": ""})
+    return rules
+
+
+class RuleSet:
+    def __init__(self, cfg):
+        self.rules = parse_rules(cfg)
+        # جدول: رقم النص في KeywordMatcher -> rank القاعدة
+        texts, self._ranks, self._always = [], [], []
+        for rule in self.rules:
+            if not rule.regex:
+                texts.append(rule.match)
+                self._ranks.append(rule.rank)
+                continue
+            rule.pattern = re.compile(rule.match, re.IGNORECASE)
+            anchor = _anchor(rule.match)
+            if anchor:
+                texts.append(anchor)
+                self._ranks.append(rule.rank)
+            else:
+                self._always.append(rule.rank)
+        self._matcher = KeywordMatcher(texts)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def candidates(self, text):
+        # أرقام القواعد التي قد تنطبق، مرتبة؛ تعتمد على النص فقط فيمكن تخزينها
+        ranks = {self._ranks[i] for i in self._matcher.positions(text)}
+        ranks.update(self._always)
+        return sorted(ranks)
+
+    def pick(self, text, ranks, group_id=None):
+        # (القاعدة الفائزة، النص المطابق) أو None
+        for rank in ranks:
+            rule = self.rules[rank]
+            if not rule.applies(group_id):
+                continue
+            if not rule.regex:
+                return rule, rule.match
+            m = rule.pattern.search(text)
+            if m:
+                return rule, m.group(0)
+        return None
+
+    def match(self, text, group_id=None):
+        return self.pick(text, self.candidates(text), group_id)
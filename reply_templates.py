@@ -0,0 +1,123 @@
+import re
+import time
+
+# ---------------------------
+# قوالب الرد المجهزة مسبقاً
+# ---------------------------
+# كل قالب (ar/en/custom) يُحلل مرة واحدة عند تحميل الإعدادات إلى أجزاء ثابتة
+# ومتغيرات. غلاف TwiML والأجزاء الثابتة تُجهّز (escape) مرة واحدة، وفي كل
+# طلب نعمل escape للقيم المتغيرة فقط ونلصقها. الناتج مطابق حرفياً لـ
+# str(MessagingResponse()) من مكتبة twilio.
+#
+# المتغيرات المدعومة:
+#   {user}     رقم المرسل (From)
+#   {name}     اسم المرسل في واتساب (ProfileName) أو رقمه
+#   {group}    اسم المجموعة من allowed_groups
+#   {keyword}  الكلمة المفتاحية المطابقة
+#   {time}     الوقت الحالي HH:MM
+# أي {شيء_آخر} يبقى كما هو.
+
+PLACEHOLDERS = ("user", "name", "group", "keyword", "time")
+_PLACEHOLDER = re.compile(r"\{(" + "|".join(PLACEHOLDERS) + r")\}")
+
+XML_DECL = '<?xml version="1.0" encoding="UTF-8"?>'
+EMPTY_RESPONSE = XML_DECL + "<Response />"
+EMPTY_MESSAGE = XML_DECL + "<Response><Message /></Response>"
+EMPTY_BODY = XML_DECL + "<Response><Message><Body /></Message></Response>"
+
+# resp.message(text)            -> <Message>text</Message>
+# resp.message().body(text)     -> <Message><Body>text</Body></Message>
+_ENVELOPES = {
+    False: (XML_DECL + "<Response><Message>", "</Message></Response>", EMPTY_MESSAGE),
+    True: (XML_DECL + "<Response><Message><Body>", "</Body></Message></Response>", EMPTY_BODY),
+}
+
+
+def escape(text):
+    # نفس escape النص في xml.etree (الذي تستخدمه twilio)
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+class ReplyTemplate:
+    __slots__ = ("text", "names", "_parts", "_xml")
+
+    def __init__(self, text):
+        self.text = text or ""
+        parts = []
+        pos = 0
+        for m in _PLACEHOLDER.finditer(self.text):
+            parts.append(self.text[pos:m.start()])
+            parts.append(m.group(1))
+            pos = m.end()
+        parts.append(self.text[pos:])
+        # الأجزاء الزوجية نص ثابت والفردية أسماء متغيرات
+        self._parts = tuple(parts)
+        self._xml = tuple(escape(p) if i % 2 == 0 else p for i, p in enumerate(parts))
+        self.names = frozenset(parts[1::2])
+
+    def render(self, values):
+        parts = self._parts
+        if len(parts) == 1:
+            return parts[0]
+        return "".join(p if i % 2 == 0 else values.get(p, "") for i, p in enumerate(parts))
+
+    def twiml(self, values, body=False):
+        head, tail, empty = _ENVELOPES[body]
+        parts = self._xml
+        if len(parts) == 1:
+            text = parts[0]
+        else:
+            text = "".join(p if i % 2 == 0 else escape(values.get(p, "")) for i, p in enumerate(parts))
+        return head + text + tail if text else empty
+
+
+def reply_values(sender, profile_name="", group=None, keyword="", now=None):
+    # now: نص {time} جاهز (replay.py يثبته حتى لا تختلف الردود حسب الساعة)
+    return {
+        "user": sender,
+        "name": profile_name or sender,
+        "group": group.get("name", "") if group else "",
+        "keyword": keyword or "",
+        "time": time.strftime("%H:%M") if now is None else now,
+    }
+
+
+class TemplateSet:
+    # قالب كل مجموعة محسوم مسبقاً: البحث في الطلب dict واحد
+    def __init__(self, cfg, groups):
+        self.ar = ReplyTemplate(cfg.get("group_reply_template_ar", "تفضل {user}"))
+        self.en = ReplyTemplate(cfg.get("group_reply_template_en"))
+        self.by_id = {gid: self._resolve(grp) for gid, grp in groups.by_id.items()}
+
+    def _resolve(self, grp):
+        kind = grp.get("template", "ar")
+        if kind == "custom" and grp.get("custom_reply"):
+            return ReplyTemplate(grp.get("custom_reply"))
+        if kind == "en":
+            return self.en
+        return self.ar
+
+    def updated(self, changes):
+        # نفس changes في GroupIndex.updated: القوالب العامة كما هي، وby_id
+        # يُنسخ كاملاً (O(عدد المجموعات) كما في GroupIndex.updated)
+        tpl = object.__new__(TemplateSet)
+        tpl.ar = self.ar
+        tpl.en = self.en
+        tpl.by_id = dict(self.by_id)
+        for old_id, grp in changes:
+            if old_id is not None and (grp is None or grp.get("id") != old_id):
+                tpl.by_id.pop(old_id, None)
+            if grp is not None:
+                tpl.by_id[grp.get("id")] = tpl._resolve(grp)
+        return tpl
+
+    def for_group(self, grp):
+        if grp is None:
+            return self.ar
+        return self.by_id.get(grp.get("id"), self.ar)
@@ -0,0 +1,252 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------------------
+# حالة التشغيل المشتركة (MessageSid، مهلة الردود، عدادات الحدود)
+# ---------------------------
+# مع عدة workers (launcher.py) كان لكل عملية عداداتها ومهلها الخاصة، فيختلف
+# الرد حسب الـ worker الذي استلم الطلب. نفس الواجهة بتنفيذين:
+#   MemoryState   في الذاكرة (عملية واحدة، الافتراضي)
+#   SqliteState   ملف SQLite (WAL) لكل عمليات الجهاز: RUNTIME_STATE=runtime_state.db
+#
+# العمليات: get / set / set_nx / incr / decr / delete، مع ttl بالثواني (None = بلا
+# انتهاء). القيم JSON (tuple ترجع list). الـ pipeline ينفذ دفعة عمليات كاملة
+# مرة واحدة (قفل واحد أو transaction واحد) ويعيد نتيجة كل عملية بالترتيب:
+#
+#   batch = state.pipeline(all_or_nothing=True)
+#   batch.set_nx("inbound:SM1", ["", 200], ttl=3600)   # None = أُضيف، وإلا القيمة الموجودة
+#   batch.incr("rl:group:x:123", ttl=30, limit=3)      # القيمة الجديدة
+#   results = batch.execute()
+#
+# decr ينقص عداداً موجوداً فقط ولا ينزل تحت 0: المفتاح المنتهي لا يُنشأ من
+# جديد بقيمة سالبة (None = لم يكن موجوداً).
+#
+# all_or_nothing: إذا وجد set_nx المفتاح موجوداً أو تجاوز incr حده (limit)
+# لا يُطبق شيء من الدفعة (batch.applied = False)، والنتائج تبين السبب.
+# بدونه كل عملية مستقلة: set_nx أو incr المرفوض وحده لا يُطبق.
+
+NO_EXPIRY = float("inf")
+
+
+def _expires(now, ttl):
+    return now + ttl if ttl else NO_EXPIRY
+
+
+def _evaluate(ops, all_or_nothing, now, read):
+    # read(key) -> (القيمة، ينتهي في) أو None؛ يعيد (النتائج، الكتابات، طُبقت؟)
+    # الكتابات: المفتاح -> (القيمة، ينتهي في) أو None للحذف
+    writes = {}
+    results = []
+    ok = True
+    for op, key, value, ttl, limit in ops:
+        entry = writes[key] if key in writes else read(key)
+        current = None if entry is None else entry[0]
+        if op == "get":
+            results.append(current)
+        elif op == "set":
+            writes[key] = (value, _expires(now, ttl))
+            results.append(None)
+        elif op == "set_nx":
+            if entry is None:
+                writes[key] = (value, _expires(now, ttl))
+            else:
+                ok = False
+            results.append(current)
+        elif op == "incr":
+            count = (current or 0) + value
+            if limit is not None and count > limit:
+                ok = False
+            else:
+                # ttl يبدأ عند إنشاء المفتاح فقط (نافذة ثابتة)
+                writes[key] = (count, _expires(now, ttl) if entry is None else entry[1])
+            results.append(count)
+        elif op == "decr":
+            if entry is None:
+                results.append(None)
+            else:
+                count = max(0, current - value)
+                writes[key] = (count, entry[1])
+                results.append(count)
+        else:
+            writes[key] = None
+            results.append(None)
+    applied = ok or not all_or_nothing
+    return results, writes if applied else {}, applied
+
+
+class Pipeline:
+    def __init__(self, state, all_or_nothing=False):
+        self.state = state
+        self.all_or_nothing = all_or_nothing
+        self.ops = []
+        self.applied = None
+
+    def get(self, key):
+        self.ops.append(("get", key, None, None, None))
+        return self
+
+    def set(self, key, value, ttl=None):
+        self.ops.append(("set", key, value, ttl, None))
+        return self
+
+    def set_nx(self, key, value, ttl=None):
+        self.ops.append(("set_nx", key, value, ttl, None))
+        return self
+
+    def incr(self, key, amount=1, ttl=None, limit=None):
+        self.ops.append(("incr", key, amount, ttl, limit))
+        return self
+
+    def decr(self, key, amount=1):
+        self.ops.append(("decr", key, amount, None, None))
+        return self
+
+    def delete(self, key):
+        self.ops.append(("delete", key, None, None, None))
+        return self
+
+    def execute(self):
+        if not self.ops:
+            self.applied = True
+            return []
+        results, self.applied = self.state._execute(self.ops, self.all_or_nothing)
+        return results
+
+
+class _State:
+    def pipeline(self, all_or_nothing=False):
+        return Pipeline(self, all_or_nothing)
+
+    def get(self, key):
+        return self.pipeline().get(key).execute()[0]
+
+    def set(self, key, value, ttl=None):
+        self.pipeline().set(key, value, ttl).execute()
+
+    def set_nx(self, key, value, ttl=None):
+        return self.pipeline().set_nx(key, value, ttl).execute()[0]
+
+    def incr(self, key, amount=1, ttl=None):
+        return self.pipeline().incr(key, amount, ttl).execute()[0]
+
+    def decr(self, key, amount=1):
+        return self.pipeline().decr(key, amount).execute()[0]
+
+    def delete(self, key):
+        self.pipeline().delete(key).execute()
+
+
+class MemoryState(_State):
+    # مرتبة حسب آخر كتابة؛ المنتهي أو الزائد عن maxsize يُحذف من أولها
+    def __init__(self, maxsize=200_000, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _execute(self, ops, all_or_nothing):
+        now = self.clock()
+        data = self._data
+        with self._lock:
+            def read(key):
+                entry = data.get(key)
+                return entry if entry is not None and entry[1] > now else None
+
+            results, writes, applied = _evaluate(ops, all_or_nothing, now, read)
+            for key, entry in writes.items():
+                if entry is None:
+                    data.pop(key, None)
+                else:
+                    data[key] = entry
+                    data.move_to_end(key)
+            while data:
+                head = next(iter(data.values()))
+                if head[1] > now and len(data) <= self.maxsize:
+                    break
+                data.popitem(last=False)
+        return results, applied
+
+
+class SqliteState(_State):
+    # ملف واحد لكل workers الجهاز؛ كل دفعة فيها كتابة = BEGIN IMMEDIATE واحد
+    def __init__(self, path, cleanup_every=1000, clock=time.time):
+        self.path = path
+        self.cleanup_every = cleanup_every
+        # وقت حقيقي مشترك بين العمليات (monotonic يختلف من عملية لأخرى)
+        self.clock = clock
+        self._local = threading.local()
+        self._batches = 0
+        # اتصالات من قبل fork: لا تُغلق في العملية الابن (SQLite لا يدعم ذلك)
+        self._inherited = []
+        self._db().execute("CREATE TABLE IF NOT EXISTS runtime_state ("
+                           "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL) WITHOUT ROWID")
+
+    def _db(self):
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            if getattr(local, "db", None) is not None:
+                self._inherited.append(local.db)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+    def _execute(self, ops, all_or_nothing):
+        db = self._db()
+        now = self.clock()
+        keys = list({op[1] for op in ops})
+        writing = any(op[0] != "get" for op in ops)
+        if writing:
+            db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = {}
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows.update((key, (json.loads(value), NO_EXPIRY if expires is None else expires))
+                            for key, value, expires in db.execute(
+                                "SELECT key, value, expires FROM runtime_state WHERE key IN "
+                                f"({','.join('?' * len(chunk))})", chunk))
+
+            def read(key):
+                entry = rows.get(key)
+                return entry if entry is not None and entry[1] > now else None
+
+            results, writes, applied = _evaluate(ops, all_or_nothing, now, read)
+            if writes:
+                db.executemany("INSERT OR REPLACE INTO runtime_state VALUES (?, ?, ?)",
+                               [(key, json.dumps(e[0], ensure_ascii=False), None if e[1] == NO_EXPIRY else e[1])
+                                for key, e in writes.items() if e is not None])
+                db.executemany("DELETE FROM runtime_state WHERE key = ?",
+                               [(key,) for key, e in writes.items() if e is None])
+            self._batches += 1
+            if writing and self._batches % self.cleanup_every == 0:
+                db.execute("DELETE FROM runtime_state WHERE expires <= ?", (now,))
+        except BaseException:
+            if writing:
+                db.execute("ROLLBACK")
+            raise
+        if writing:
+            db.execute("COMMIT")
+        return results, applied
+
+    def close(self):
+        # اتصال هذا الـ thread فقط
+        local = self._local
+        if getattr(local, "pid", None) == os.getpid():
+            local.db.close()
+            local.db = local.pid = None
+
+
+def make_runtime_state():
+    path = os.environ.get("RUNTIME_STATE")
+    if path:
+        return SqliteState(path)
+    return MemoryState(int(os.environ.get("RUNTIME_STATE_MAX", "200000")))
@@ -0,0 +1,121 @@
+import heapq
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+# ---------------------------
+# طابور الإرسال الخارجي (الردود الخاصة)
+# ---------------------------
+# الـ webhook يضع الرسالة في الطابور ويرجع فوراً، وعدد من الـ workers
+# يرسلها عبر Twilio. الأخطاء المؤقتة (شبكة، 5xx، 429) يعاد إرسالها بعد
+# تأخير أُسّي مع jitter، والأخطاء النهائية (4xx) أو استنفاد المحاولات
+# تذهب إلى dead letters.
+
+
+def is_permanent(exc):
+    # TwilioRestException فيها status؛ أخطاء الشبكة ليس لها status فتعتبر مؤقتة
+    status = getattr(exc, "status", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in (408, 429)
+
+
+class SendQueue:
+    def __init__(self, send, workers=4, maxsize=1000, retries=5,
+                 base_delay=0.5, max_delay=30.0, dead_letter_path=None):
+        self.send = send
+        self.workers = workers
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letter_path = dead_letter_path
+        self.dead_letters = deque(maxlen=1000)
+        self.sent = 0
+        self.failed = 0
+        self.maxsize = maxsize
+        # الحد يُطبّق على الرسائل الجديدة فقط؛ إعادة المحاولة لا تُرفض أبداً
+        self._queue = queue.Queue()
+        self._delayed = []
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._pid = None
+
+    def submit(self, **message):
+        # False إذا كان الطابور ممتلئاً، والقرار للمستدعي
+        if self._pid != os.getpid():
+            self.start()
+        if self.pending() >= self.maxsize:
+            return False
+        self._queue.put((message, 1))
+        return True
+
+    def pending(self):
+        return self._queue.qsize() + len(self._delayed)
+
+    def join(self, timeout=None):
+        # ينتظر انتهاء كل الرسائل بما فيها المؤجلة (للاختبار والإيقاف)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks or self._delayed:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def start(self):
+        # الـ threads لا تنتقل مع fork، لذلك نشغلها مرة في كل عملية
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"send-{i}", daemon=True).start()
+        threading.Thread(target=self._schedule, name="send-retry", daemon=True).start()
+
+    def backoff(self, attempt):
+        # full jitter: رقم عشوائي بين 0 والحد الأُسّي
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _work(self):
+        while True:
+            message, attempt = self._queue.get()
+            try:
+                self.send(**message)
+                # += ليس ذرياً بين الـ workers
+                with self._cond:
+                    self.sent += 1
+            except Exception as e:
+                if is_permanent(e) or attempt >= self.retries:
+                    self._dead_letter(message, attempt, e)
+                else:
+                    self._retry_later(message, attempt + 1, self.backoff(attempt))
+            finally:
+                self._queue.task_done()
+
+    def _retry_later(self, message, attempt, delay):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._delayed, (time.monotonic() + delay, self._seq, message, attempt))
+            self._cond.notify()
+
+    def _schedule(self):
+        while True:
+            with self._cond:
+                while not self._delayed or self._delayed[0][0] > time.monotonic():
+                    timeout = self._delayed[0][0] - time.monotonic() if self._delayed else None
+                    self._cond.wait(timeout)
+                _, _, message, attempt = self._delayed[0]
+                self._queue.put((message, attempt))
+                heapq.heappop(self._delayed)
+
+    def _dead_letter(self, message, attempt, exc):
+        with self._cond:
+            self.failed += 1
+        entry = {"time": time.time(), "attempts": attempt, "error": str(exc),
+                 "status": getattr(exc, "status", None), "message": message}
+        self.dead_letters.append(entry)
+        print("⚠️ فشل إرسال الرد نهائياً:", message.get("to"), exc)
+        if self.dead_letter_path:
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
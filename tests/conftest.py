@@ -0,0 +1,40 @@
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_config(groups=3, keywords=0):
+    return {
+        "keywords": ["مرحبا", "Hello", "مساعدة"] + [f"kw{i}" for i in range(keywords)],
+        "allowed_groups": [
+            {"id": f"{i:09d}-123456@g.us", "name": f"group {i}", "reply_type": "group",
+             "template": "ar", "custom_reply": ""}
+            for i in range(groups)
+        ],
+        "group_reply_template_ar": "تفضل {user}، سيتم التواصل معك.",
+        "group_reply_template_en": "Hi {user}, we will contact you shortly.",
+    }
+
+
+@pytest.fixture
+def load_app(tmp_path, monkeypatch):
+    # يستورد app/app1/app2 من جديد في مجلد مؤقت فيه config.json المعطى
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("TWILIO_ACCOUNT_SID", "AC00000000000000000000000000000000")
+    monkeypatch.setenv("TWILIO_AUTH_TOKEN", "x")
+    monkeypatch.setenv("AUDIT_LOG", "off")
+    monkeypatch.delenv("RUNTIME_STATE", raising=False)
+    monkeypatch.delenv("CONFIG_STORE", raising=False)
+
+    def load(name, cfg):
+        with open("config.json", "w", encoding="utf-8") as f:
+            json.dump(cfg, f, ensure_ascii=False)
+        sys.modules.pop(name, None)
+        return importlib.import_module(name)
+    yield load
@@ -0,0 +1,30 @@
+from conftest import make_config
+
+SENDER = "whatsapp:+966500000001"
+
+
+def private_config():
+    cfg = make_config()
+    cfg["allowed_groups"].append({"id": SENDER, "name": "عميل", "reply_type": "private",
+                                  "template": "ar", "custom_reply": ""})
+    cfg["twilio_whatsapp_number"] = "whatsapp:+14155238886"
+    cfg["rate_limits"] = {"sender": {"cooldown": 60}, "group": {"per_minute": 1, "burst": 1}}
+    return cfg
+
+
+def test_retry_after_full_queue_sends_the_reply(load_app, monkeypatch):
+    app1 = load_app("app1", private_config())
+    client = app1.app.test_client()
+    sent = []
+    monkeypatch.setattr(app1.outbox, "submit", lambda **message: False)
+    form = {"Body": "مساعدة", "From": SENDER, "MessageSid": "SM1"}
+    assert client.post("/webhook", data=form).status_code == 503
+
+    # Twilio يعيد نفس الطلب: لا المهلة ولا الـ bucket يمنعان الرد
+    monkeypatch.setattr(app1.outbox, "submit", lambda **message: sent.append(message) or True)
+    assert client.post("/webhook", data=form).status_code == 200
+    assert [m["to"] for m in sent] == [SENDER]
+
+    # الرسالة التالية من نفس المرسل داخل المهلة ممنوعة كالعادة
+    assert client.post("/webhook", data=dict(form, MessageSid="SM2")).status_code == 200
+    assert len(sent) == 1
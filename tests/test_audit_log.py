@@ -0,0 +1,84 @@
+import gzip
+import json
+import os
+import threading
+
+from audit_log import AuditLog
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_dropped_records_are_counted_exactly(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    audit = AuditLog(str(path), maxsize=100, flush_interval=3600)
+    audit.start()
+
+    def hammer():
+        for i in range(5_000):
+            audit.inbound(f"SM{i}", "whatsapp:+1", "مرحبا")
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    audit.close()
+    assert audit.dropped == 40_000 - 100
+    records = read_records(path)
+    assert len(records) == 101
+    assert records[-1]["dir"] == "gap" and records[-1]["dropped"] == audit.dropped
+
+
+def rotate(audit, times):
+    for i in range(times):
+        audit.inbound(f"SM{i}", "whatsapp:+1", "مرحبا")
+        audit.flush()
+    for t in threading.enumerate():
+        if t.name == "audit-gzip":
+            t.join()
+
+
+def test_rotation_keeps_the_newest_segments(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    audit = AuditLog(str(path), max_bytes=1, keep=3, flush_interval=3600)
+    rotate(audit, 6)
+    # نفس الثانية: audit.jsonl.<stamp> ثم <stamp>-1 ... والأحدث هو الأكبر رقماً
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert len(names) == 3 and all(n.endswith(".gz") for n in names)
+    assert audit.rotations == 6
+    kept = sorted(json.loads(gzip.decompress((tmp_path / n).read_bytes()))["MessageSid"] for n in names)
+    assert kept == ["SM3", "SM4", "SM5"]
+
+
+def test_prune_covers_segments_of_other_and_dead_workers(tmp_path):
+    old = tmp_path / "audit.4194305.jsonl"
+    old.write_text("{}\n")
+    stale = []
+    for name in ["audit.4194305.jsonl.20260101-000000.gz", "audit.4194306.jsonl.20260101-000000-1.gz",
+                              "audit.4194306.jsonl.20260101-000000.gz"]:
+        (tmp_path / name).write_bytes(b"")
+        stale.append(name)
+    for i, p in enumerate([old] + [tmp_path / n for n in stale]):
+        os.utime(p, (1_000_000 + i, 1_000_000 + i))
+
+    audit = AuditLog(str(tmp_path / "audit.{pid}.jsonl"), max_bytes=1, keep=2, flush_interval=3600)
+    audit.start()
+    rotate(audit, 2)
+    remaining = sorted(p.name for p in tmp_path.iterdir())
+    # العملية الحالية: ملفها الحالي لا يُحذف، ومقطعاها الأحدث هما الباقيان
+    own = f"audit.{os.getpid()}.jsonl."
+    assert [n for n in remaining if not n.startswith(own)] == []
+    assert len(remaining) == 2
+
+
+def test_live_files_of_running_workers_are_not_pruned(tmp_path):
+    live = tmp_path / f"audit.{os.getppid()}.jsonl"
+    live.write_text("{}\n")
+    os.utime(live, (1, 1))
+    audit = AuditLog(str(tmp_path / "audit.{pid}.jsonl"), max_bytes=1, keep=1, flush_interval=3600)
+    audit.start()
+    rotate(audit, 3)
+    assert live.exists()
+    assert len([p for p in tmp_path.iterdir() if p != live]) == 1
@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+
+import pytest
+
+from config_cache import ConfigCache, ConfigSnapshot, StaleConfigError, read_config, save_versioned, write_config
+from conftest import make_config
+
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+def test_write_config_replaces_file_without_leftovers(tmp_path):
+    path = str(tmp_path / "config.json")
+    write_config(path, {"keywords": ["مرحبا"]})
+    write_config(path, {"keywords": ["Hello"]})
+    assert read_config(path) == {"keywords": ["Hello"]}
+    assert leftovers(tmp_path) == []
+
+
+def test_failed_write_keeps_old_file(tmp_path):
+    path = str(tmp_path / "config.json")
+    write_config(path, {"keywords": ["مرحبا"]})
+    with pytest.raises(TypeError):
+        write_config(path, {"keywords": [object()]})
+    assert read_config(path) == {"keywords": ["مرحبا"]}
+    assert leftovers(tmp_path) == []
+
+
+def test_readers_never_see_a_partial_file(tmp_path):
+    path = str(tmp_path / "config.json")
+    configs = [make_config(groups=n * 100) for n in (1, 5)]
+    write_config(path, configs[0])
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            i += 1
+            write_config(path, configs[i % 2])
+
+    t = threading.Thread(target=writer)
+    t.start()
+    try:
+        for _ in range(300):
+            with open(path, encoding="utf-8") as f:
+                assert len(json.load(f)["allowed_groups"]) in (100, 500)
+    finally:
+        stop.set()
+        t.join()
+    assert leftovers(tmp_path) == []
+
+
+@pytest.mark.parametrize("name", ["config.json", "config.db"])
+def test_save_versioned_rejects_stale_version(tmp_path, name):
+    path = str(tmp_path / name)
+    assert save_versioned(path, make_config(groups=2)) == 1
+    assert save_versioned(path, make_config(groups=3), expected_version=1) == 2
+
+    with pytest.raises(StaleConfigError) as err:
+        save_versioned(path, make_config(groups=4), expected_version=1)
+    assert (err.value.expected, err.value.current) == (1, 2)
+    cfg = read_config(path)
+    assert cfg["config_version"] == 2 and len(cfg["allowed_groups"]) == 3
+
+    # بدون رقم: الحفظ يمر دائماً
+    assert save_versioned(path, make_config(groups=5)) == 3
+
+
+def test_config_cache_save_and_patch_check_version(tmp_path):
+    path = str(tmp_path / "config.json")
+    write_config(path, make_config(groups=2))
+    cache = ConfigCache(path)
+    assert cache.current.version == 0
+    snap = cache.save(cache.current.to_dict(), expected_version=0)
+    assert snap.version == 1
+    with pytest.raises(StaleConfigError):
+        cache.save(snap.to_dict(), expected_version=0)
+    with pytest.raises(StaleConfigError):
+        cache.patch([{"op": "add", "path": "/keywords/-", "value": "x"}], expected_version=0)
+    assert cache.patch([{"op": "add", "path": "/keywords/-", "value": "x"}], expected_version=1).version == 2
+    assert read_config(path)["config_version"] == 2
+
+
+def test_snapshot_is_read_only():
+    snap = ConfigSnapshot(make_config(groups=1))
+    with pytest.raises(AttributeError):
+        snap.version = 5
+    with pytest.raises(TypeError):
+        snap.cfg["keywords"] = []
+    with pytest.raises(TypeError):
+        snap.cfg["allowed_groups"][0]["name"] = "x"
+    assert isinstance(snap.cfg["keywords"], tuple)
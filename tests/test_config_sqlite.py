@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from config_cache import ConfigCache, read_config, write_config
+from config_sqlite import SQLiteStorage, main
+from conftest import make_config
+
+
+def round_trip(tmp_path, cfg):
+    write_config(str(tmp_path / "config.json"), cfg)
+    assert main(["import", str(tmp_path / "config.json"), str(tmp_path / "config.db")]) == 0
+    assert main(["export", str(tmp_path / "config.db"), str(tmp_path / "out.json")]) == 0
+    return read_config(str(tmp_path / "out.json"))
+
+
+def without_version(cfg):
+    return {k: v for k, v in cfg.items() if k != "config_version"}
+
+
+def test_json_sqlite_json_round_trip(tmp_path):
+    cfg = make_config(groups=50, keywords=20)
+    cfg["reply_rules"] = [
+        {"match": "سعر", "regex": False, "groups": [], "priority": 10, "template": "الأسعار {name}"},
+        {"match": "سعر", "regex": False, "groups": ["000000001-123456@g.us"], "priority": 5, "template": ""},
+        {"match": "طلب\\s*#?\\d+", "regex": True, "groups": [], "priority": 20, "template": ""},
+    ]
+    cfg["group_reply_template_ar"] = "مرحبا {name}"
+    cfg["rate_limits"] = {"sender": {"cooldown": 60, "per_minute": 0, "burst": 0}}
+    out = round_trip(tmp_path, json.loads(json.dumps(cfg)))
+    assert without_version(out) == without_version(cfg)
+    assert out["config_version"] == 1
+
+
+def test_patch_through_config_cache_survives_export(tmp_path):
+    cfg = make_config(groups=5)
+    write_config(str(tmp_path / "config.json"), cfg)
+    main(["import", str(tmp_path / "config.json"), str(tmp_path / "config.db")])
+
+    cache = ConfigCache(SQLiteStorage(str(tmp_path / "config.db")))
+    gid = "000000002-123456@g.us"
+    snap = cache.patch([
+        {"op": "replace", "path": f"/allowed_groups/{gid}", "value": {"id": gid, "name": "renamed"}},
+        {"op": "add", "path": "/keywords/-", "value": "جديد"},
+        {"op": "remove", "path": "/keywords/Hello"},
+    ], expected_version=1)
+    assert snap.version == 2
+
+    # عملية أخرى على نفس الملف ترى التعديل، والتصدير يطابق الـ snapshot
+    other = ConfigCache(SQLiteStorage(str(tmp_path / "config.db")))
+    assert other.current.to_dict() == snap.to_dict()
+    main(["export", str(tmp_path / "config.db"), str(tmp_path / "out.json")])
+    out = read_config(str(tmp_path / "out.json"))
+    assert out == snap.to_dict()
+    assert [g["name"] for g in out["allowed_groups"]] == ["group 0", "group 1", "renamed", "group 3", "group 4"]
+    assert out["keywords"] == ["مرحبا", "مساعدة", "جديد"]
+
+    # ومن JSON إلى SQLite مرة أخرى بدون فرق
+    (tmp_path / "again").mkdir()
+    again = round_trip(tmp_path / "again", out)
+    assert without_version(again) == without_version(out)
+
+
+def test_plain_string_groups_round_trip(tmp_path):
+    # app4.py: أسماء المجموعات فقط
+    cfg = {"keywords": ["مرحبا"], "allowed_groups": ["عائلة", "العمل"], "reply_rules": [], "auto_reply": True}
+    assert without_version(round_trip(tmp_path, cfg)) == cfg
+
+
+@pytest.mark.parametrize("field,items", [
+    ("allowed_groups", [{"id": "1@g.us", "name": "a"}, {"id": "2@g.us"}, {"id": "1@g.us", "name": "b"}]),
+    ("allowed_groups", ["عائلة", "عائلة"]),
+    ("keywords", ["مرحبا", "Hello", "مرحبا"]),
+])
+def test_duplicates_are_rejected_not_dropped(tmp_path, capsys, field, items):
+    cfg = {"keywords": [], "allowed_groups": []}
+    cfg[field] = items
+    write_config(str(tmp_path / "config.json"), cfg)
+    assert main(["import", str(tmp_path / "config.json"), str(tmp_path / "config.db")]) == 1
+    assert "مكرر في " + field in capsys.readouterr().err
+
+    storage = SQLiteStorage(str(tmp_path / "config.db"))
+    with pytest.raises(ValueError):
+        storage.save(dict(cfg))
+    # لا شيء حُفظ
+    assert storage.load()["config_version"] == 0
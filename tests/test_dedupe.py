@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from dedupe import PENDING, Deduplicator, MemoryStore, SqliteStore, StateDeduplicator, TTLCache
+from runtime_state import MemoryState
+
+BUSY = ("", 200)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryStore()
+    return SqliteStore(str(tmp_path / "inbound.db"))
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=60)
+    assert cache.add("SM1", "a", now=100) is None
+    assert cache.add("SM1", "b", now=159) == "a"
+    assert cache.get("SM1", now=160) is None
+    assert len(cache) == 0
+    # المنتهي يُؤخذ من جديد
+    assert cache.add("SM1", "b", now=161) is None
+    assert cache.get("SM1", now=200) == "b"
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=3, ttl=60)
+    for i, sid in enumerate(["SM1", "SM2", "SM3"]):
+        cache.add(sid, sid, now=100 + i)
+    assert cache.get("SM1", now=110) == "SM1"
+    cache.add("SM4", "SM4", now=111)
+    assert len(cache) == 3
+    assert cache.get("SM2", now=112) is None
+    assert [cache.get(sid, now=112) for sid in ("SM1", "SM3", "SM4")] == ["SM1", "SM3", "SM4"]
+
+
+def test_ttl_cache_trims_expired_head_on_write():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.add("SM1", 1, now=100)
+    cache.add("SM2", 2, now=130)
+    cache.set("SM3", 3, now=165)
+    assert len(cache) == 2
+
+
+def test_retry_while_in_flight_gets_pending_response(store):
+    dedupe = Deduplicator(store, BUSY)
+    seen = []
+
+    def handler():
+        seen.append(dedupe.run("SM1", lambda: ("inner", 200)))
+        return "<Response/>", 200
+
+    assert dedupe.run("SM1", handler) == ("<Response/>", 200)
+    assert seen == [BUSY]
+    assert dedupe.run("SM1", lambda: ("again", 200)) == ("<Response/>", 200)
+    assert dedupe.duplicates == 2
+
+
+def test_failed_handling_is_released_for_retry(store):
+    dedupe = Deduplicator(store, BUSY)
+    assert dedupe.run("SM1", lambda: ("busy", 503)) == ("busy", 503)
+
+    def boom():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        dedupe.run("SM1", boom)
+    assert dedupe.run("SM1", lambda: "ok") == ("ok", 200)
+    assert dedupe.run("SM1", lambda: "again") == ("ok", 200)
+    assert dedupe.duplicates == 1
+
+
+def test_missing_sid_is_never_deduplicated(store):
+    dedupe = Deduplicator(store, BUSY)
+    assert dedupe.run("", lambda: "a") == ("a", 200)
+    assert dedupe.run(None, lambda: "b") == ("b", 200)
+    assert dedupe.duplicates == 0
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "inbound.db")
+    a, b = SqliteStore(path, ttl=0.2), SqliteStore(path, ttl=0.2)
+    assert a.claim("SM1") is None
+    assert b.claim("SM1") == PENDING
+    a.complete("SM1", ("<Response/>", 200))
+    assert b.claim("SM1") == ("<Response/>", 200)
+    b.release("SM1")
+    assert a.claim("SM1") is None
+    time.sleep(0.3)
+    # انتهت صلاحيته: يأخذه أحدهما فقط
+    assert b.claim("SM1") is None
+    assert a.claim("SM1") == PENDING
+
+
+def test_duplicates_are_counted_exactly_across_threads():
+    dedupe = Deduplicator(MemoryStore(), ("", 200))
+    dedupe.run("SM1", lambda: ("ok", 200))
+    state = StateDeduplicator(MemoryState())
+
+    def hammer():
+        for _ in range(20_000):
+            dedupe.run("SM1", lambda: ("again", 200))
+            state.replay(["ok", 200])
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert dedupe.duplicates == state.duplicates == 160_000
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from keyword_matcher import SMALL_LIST, KeywordMatcher
+
+
+def naive(keywords, text):
+    # الحلقة القديمة في /webhook
+    return [kw for kw in keywords if kw.lower() in text.lower()]
+
+
+def padded(keywords, path):
+    # الحشو لا يظهر في أي رسالة: ينقل المطابقة إلى الأوتوماتون دون تغيير النتيجة
+    if path == "automaton":
+        return list(keywords) + [f"zzpad{i}" for i in range(SMALL_LIST + 1)]
+    return list(keywords)
+
+
+@pytest.fixture(params=["loop", "automaton"])
+def path(request):
+    return request.param
+
+
+CASES = [
+    (["he", "she", "his", "hers"], "ushers", ["he", "she", "hers"]),
+    (["a", "aa", "aaa"], "aa", ["a", "aa"]),
+    (["abcd", "bc", "c"], "xabcy", ["bc", "c"]),
+    (["abcd", "bcx"], "abcx", ["bcx"]),
+    (["مرحبا", "مرحب", "حبا"], "يا مرحبا بكم", ["مرحبا", "مرحب", "حبا"]),
+    (["Hello", "HELLO world"], "hello WORLD", ["Hello", "HELLO world"]),
+    (["مساعدة", "help"], "لا شيء هنا", []),
+    (["kw", "kw"], "kw", ["kw", "kw"]),
+    (["", "x"], "abc", [""]),
+]
+
+
+@pytest.mark.parametrize("keywords,text,expected", CASES)
+def test_overlapping_matches(path, keywords, text, expected):
+    matcher = KeywordMatcher(padded(keywords, path))
+    assert matcher._small is (path == "loop")
+    assert matcher.find_all(text) == expected
+    assert matcher.first(text) == (expected[0] if expected else None)
+
+
+def test_positions_are_sorted_indices(path):
+    keywords = padded(["c", "b", "a", "abc"], path)
+    assert KeywordMatcher(keywords).positions("abc") == [0, 1, 2, 3]
+
+
+def test_matches_naive_loop_on_random_text(path):
+    rng = random.Random(7)
+    alphabet = "abcAB مر"
+    for _ in range(200):
+        keywords = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 12))]
+        keywords = padded(keywords, path)
+        matcher = KeywordMatcher(keywords)
+        for _ in range(10):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            hits = naive(keywords, text)
+            assert matcher.find_all(text) == hits
+            assert matcher.first(text) == (hits[0] if hits else None)
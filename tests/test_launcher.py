@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import launcher
+from conftest import ROOT, make_config
+
+
+@pytest.mark.parametrize("name", ["app", "app1", "app2"])
+def test_importing_an_app_starts_no_threads(tmp_path, name):
+    # launcher يستورد الوحدة في الـ master ثم fork: أي thread هنا قد يورث قفلاً مغلقاً
+    (tmp_path / "config.json").write_text(json.dumps(make_config()), encoding="utf-8")
+    env = dict(os.environ, TWILIO_ACCOUNT_SID="AC00000000000000000000000000000000", TWILIO_AUTH_TOKEN="x",
+               RUNTIME_STATE="runtime_state.db", AUDIT_LOG="audit.{pid}.jsonl")
+    code = (f"import sys, threading; sys.path.insert(0, {ROOT!r}); import {name}; "
+            "print(','.join(t.name for t in threading.enumerate()))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "MainThread"
+
+
+def test_spawn_refuses_to_fork_with_threads_running():
+    master = launcher.Master("app1", "127.0.0.1", 0, 2)
+    stop = threading.Event()
+    t = threading.Thread(target=stop.wait, name="watcher")
+    t.start()
+    try:
+        with pytest.raises(RuntimeError, match="watcher"):
+            master._spawn(0)
+    finally:
+        stop.set()
+        t.join()
+    assert master.workers == {}
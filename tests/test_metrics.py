@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+from metrics import Metrics
+
+
+def test_running_totals_are_counters():
+    m = Metrics()
+    m.gauge("queue_pending", lambda: 3, "Waiting")
+    m.counter("sent_total", lambda: 7, "Sent since start")
+    text = m.render()
+    assert "# TYPE queue_pending gauge\nqueue_pending 3\n" in text
+    assert "# HELP sent_total Sent since start\n# TYPE sent_total counter\nsent_total 7\n" in text
+
+
+def test_watchers_export_totals_as_counters(monkeypatch):
+    import metrics as module
+    m = Metrics()
+    monkeypatch.setattr(module, "metrics", m)
+    module.watch_outbound(SimpleNamespace(pending=lambda: 0, sent=5, failed=1))
+    module.watch_inbound(SimpleNamespace(duplicates=2))
+    module.watch_audit(SimpleNamespace(pending=lambda: 0, written=9, dropped=0))
+    text = m.render()
+    for name in ("twilio_sent_messages_total", "twilio_dead_letters_total", "webhook_duplicate_retries_total",
+                 "audit_log_written_total", "audit_log_dropped_total"):
+        assert f"# TYPE {name} counter" in text
+    for name in ("twilio_send_queue_pending", "audit_log_pending"):
+        assert f"# TYPE {name} gauge" in text
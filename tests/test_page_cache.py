@@ -0,0 +1,82 @@
+import gzip
+
+import pytest
+
+from conftest import make_config
+from metrics import metrics
+
+
+def dashboard_count(result):
+    return metrics.snapshot().counters.get(("dashboard", result), 0)
+
+
+@pytest.mark.parametrize("name", ["app", "app1", "app2"])
+def test_default_page_is_rendered_whole(load_app, name):
+    mod = load_app(name, make_config(groups=200, keywords=200))
+    client = mod.app.test_client()
+    streams = dashboard_count("stream")
+    r = client.get("/")
+    assert r.status_code == 200
+    assert "Content-Length" in r.headers
+    assert dashboard_count("stream") == streams
+    assert client.get("/", headers={"If-None-Match": r.headers["ETag"]}).status_code == 304
+
+
+@pytest.mark.parametrize("name", ["app", "app1", "app2"])
+def test_large_page_streams_through_dashboard(load_app, name):
+    mod = load_app(name, make_config(groups=200, keywords=200))
+    client = mod.app.test_client()
+    streams = dashboard_count("stream")
+    r = client.get("/?per_page=100")
+    assert r.status_code == 200
+    assert "Content-Length" not in r.headers and "ETag" not in r.headers
+    assert dashboard_count("stream") == streams + 1
+    html = r.get_data(as_text=True)
+    assert "000000099-123456@g.us" in html and "000000100-123456@g.us" not in html
+    assert html.rstrip().endswith("</html>")
+
+    # بعد الـ stream تُحفظ الصفحة: الطلب التالي من الكاش بنفس المحتوى
+    hits = dashboard_count("hit")
+    again = client.get("/?per_page=100")
+    assert dashboard_count("hit") == hits + 1
+    assert again.headers["Content-Length"] == str(len(again.get_data()))
+    assert again.get_data(as_text=True) == html
+    assert client.get("/?per_page=100", headers={"If-None-Match": again.headers["ETag"]}).status_code == 304
+
+
+def test_large_page_streams_gzip(load_app):
+    mod = load_app("app2", make_config(groups=200, keywords=200))
+    client = mod.app.test_client()
+    r = client.get("/?per_page=100", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in r.headers
+    html = gzip.decompress(r.get_data()).decode("utf-8")
+    assert "000000099-123456@g.us" in html
+    assert html == client.get("/?per_page=100").get_data(as_text=True)
+
+
+def test_pages_are_keyed_by_snapshot_version():
+    from config_cache import ConfigSnapshot
+    from config_patch import normalize
+    from page_cache import PageCache
+
+    cache = PageCache("{{ name }} v{{ v }}", lambda snap, args: {"name": snap.cfg["name"], "v": snap.version})
+    old = ConfigSnapshot({"name": "a", "config_version": 1})
+    assert cache.respond(old, {})[2] == b"a v1"
+    assert cache.respond(old, {})[2] == b"a v1"
+    assert cache.respond(old, {"q": "x"})[2] == b"a v1"
+
+    new = old.patched(normalize([{"op": "replace", "path": "/name", "value": "b"}]))
+    assert cache.respond(new, {})[2] == b"b v2"
+    # الصفحات القديمة حُذفت، ولا يبقى مرجع للـ snapshot
+    assert len(cache._pages) == 1
+    assert all("snap" not in entry for entry in cache._pages.values())
+
+    # تعديل يدوي على الملف بنفس config_version
+    edited = ConfigSnapshot({"name": "c", "config_version": 2})
+    assert cache.respond(edited, {})[2] == b"c v2"
+
+    # stream قديم انتهى بعد التعديل لا يحل محل الصفحة الحالية
+    cache._store(("late", "", "", ""), new, b"stale")
+    assert ("late", "", "", "") not in cache._pages
+    assert cache.respond(edited, {})[2] == b"c v2"
@@ -0,0 +1,124 @@
+import re
+
+import pytest
+
+from keyword_matcher import SMALL_LIST
+from reply_rules import RuleSet, _anchor
+
+G1 = "000000001-123456@g.us"
+G2 = "000000002-123456@g.us"
+
+# كلمات حشو لا تظهر في الرسائل: تنقل RuleSet من الحلقة إلى الأوتوماتون
+FILLER = [f"zzfiller{i}" for i in range(SMALL_LIST + 1)]
+
+
+@pytest.fixture(params=["loop", "automaton"])
+def ruleset(request):
+    def build(cfg):
+        cfg = dict(cfg)
+        if request.param == "automaton":
+            cfg["keywords"] = list(cfg.get("keywords") or ()) + FILLER
+        return RuleSet(cfg)
+    return build
+
+
+# (pattern, anchor متوقع أو None = أي نص ثابت صحيح، رسالة تطابق)
+ANCHORS = [
+    ("طلب\\s*#?\\d+", "طلب", "طلب #42"),
+    ("foo|bar", "", "xx BAR"),
+    ("(?:order|ordre) #\\d+", None, "ORDRE #5"),
+    ("(?:abc)+d", None, "abcabcd"),
+    ("ab+c", "", "abbbc"),
+    ("colou?r", "colo", "COLOR"),
+    ("a{2}b", "", "aab"),
+    ("x{0}abc", "abc", "abc"),
+    ("(ab)?cd", "cd", "cd"),
+    ("(?x) a b c", "abc", "ABC"),
+    ("(?i)hello world", "hello world", "HELLO WORLD"),
+    ("مرحبا يا (\\w+)", "مرحبا يا ", "مرحبا يا أحمد"),
+    # IGNORECASE يطابق حروفاً لا يوحدها lower(): لا تدخل في النص الثابت
+    ("stop", None, "ſtop"),
+    ("sigma", None, "ſigma"),
+    ("ist", None, "İST"),
+    ("İst", None, "ist"),
+    ("ıst", None, "IST"),
+    ("σς", None, "ΣΣ"),
+    ("kilo", None, "Kilo"),
+]
+
+
+@pytest.mark.parametrize("pattern,anchor,message", ANCHORS)
+def test_regex_anchor_never_hides_a_match(ruleset, pattern, anchor, message):
+    assert re.search(pattern, message, re.IGNORECASE)
+    if anchor is not None:
+        assert _anchor(pattern) == anchor
+    # النص الثابت يجب أن يظهر في الرسالة بعد lower()، وإلا فالقاعدة لا تُجرب أبداً
+    assert _anchor(pattern).lower() in message.lower()
+    rules = ruleset({"reply_rules": [{"match": pattern, "regex": True}]})
+    hit = rules.match(message)
+    assert hit is not None and hit[0].match == pattern
+
+
+@pytest.mark.parametrize("pattern,message", [
+    ("طلب\\s*#?\\d+", "طلب بدون رقم"),
+    ("colou?r", "colr"),
+    ("foo|bar", "baz"),
+])
+def test_regex_rule_does_not_match(ruleset, pattern, message):
+    assert ruleset({"reply_rules": [{"match": pattern, "regex": True}]}).match(message) is None
+
+
+RULES = [
+    {"match": "سعر", "priority": 10, "template": "price"},
+    {"match": "سعر الشحن", "priority": 20, "template": "shipping"},
+    {"match": "طلب\\s*#?\\d+", "regex": True, "priority": 10, "template": "order"},
+    {"match": "vip", "groups": [G1], "priority": 30, "template": "vip"},
+    {"match": "سعر", "priority": 5, "template": "late"},
+]
+
+# (رسالة، مجموعة، match الفائز، النص المطابق)
+PICKS = [
+    ("كم سعر الشحن؟", None, "سعر الشحن", "سعر الشحن"),
+    ("كم الثمن", None, None, None),
+    ("كم سعر هذا", None, "سعر", "سعر"),
+    # نفس الأولوية: الأسبق في القائمة يفوز
+    ("سعر طلب #7", None, "سعر", "سعر"),
+    ("متابعة طلب 12", None, "طلب\\s*#?\\d+", "طلب 12"),
+    # نطاق المجموعات: vip لـ G1 فقط، وغيرها يسقط للقاعدة التالية
+    ("vip سعر", G1, "vip", "vip"),
+    ("vip سعر", G2, "سعر", "سعر"),
+    ("VIP", G1, "vip", "vip"),
+    ("vip", G2, None, None),
+    ("vip", None, None, None),
+    # keywords القديمة بأولوية 0 بعد reply_rules
+    ("مرحبا سعر", None, "سعر", "سعر"),
+    ("مرحبا", None, "مرحبا", "مرحبا"),
+]
+
+
+@pytest.mark.parametrize("message,group,winner,text", PICKS)
+def test_priority_and_group_scoping(ruleset, message, group, winner, text):
+    rules = ruleset({"reply_rules": RULES, "keywords": ["مرحبا", ""]})
+    hit = rules.match(message, group)
+    if winner is None:
+        assert hit is None
+    else:
+        assert (hit[0].match, hit[1]) == (winner, text)
+
+
+def test_rules_are_ordered_by_priority_then_position():
+    rules = RuleSet({"reply_rules": RULES, "keywords": ["مرحبا"]}).rules
+    assert [(r.match, r.priority) for r in rules] == [
+        ("vip", 30), ("سعر الشحن", 20), ("سعر", 10), ("طلب\\s*#?\\d+", 10), ("سعر", 5), ("مرحبا", 0),
+    ]
+    assert [r.rank for r in rules] == list(range(len(rules)))
+
+
+def test_invalid_regex_and_empty_match_are_skipped(capsys):
+    rules = RuleSet({"reply_rules": [
+        {"match": "(", "regex": True},
+        {"match": "  "},
+        {"match": "ok"},
+    ], "keywords": [""]})
+    assert [r.match for r in rules.rules] == ["ok"]
+    assert "(" in capsys.readouterr().out
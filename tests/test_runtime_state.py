@@ -0,0 +1,139 @@
+import pytest
+
+from rate_limit import RateLimiter, blocked_by, limit_ops, parse_limits, refund_ops
+from runtime_state import MemoryState, SqliteState
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def state(request, tmp_path):
+    clock = Clock()
+    if request.param == "memory":
+        st = MemoryState(clock=clock)
+    else:
+        st = SqliteState(str(tmp_path / "state.db"), clock=clock)
+    st.clock_ = clock
+    yield st
+    if request.param == "sqlite":
+        st.close()
+
+
+def test_set_nx_conflict_applies_nothing(state):
+    state.set("inbound:SM1", ["ok", 200])
+    batch = state.pipeline(all_or_nothing=True)
+    batch.incr("count")
+    batch.set_nx("inbound:SM1", ["again", 200])
+    batch.set("other", 1)
+    assert batch.execute() == [1, ["ok", 200], None]
+    assert batch.applied is False
+    assert state.get("count") is None and state.get("other") is None
+    assert state.get("inbound:SM1") == ["ok", 200]
+
+
+def test_incr_over_limit_applies_nothing(state):
+    for _ in range(3):
+        assert state.pipeline(all_or_nothing=True).incr("rl", limit=3).set_nx("cd", 1).execute()
+        state.delete("cd")
+    batch = state.pipeline(all_or_nothing=True).incr("rl", limit=3).set_nx("cd", 1)
+    assert batch.execute() == [4, None]
+    assert batch.applied is False
+    assert state.get("rl") == 3 and state.get("cd") is None
+
+
+def test_without_all_or_nothing_only_the_rejected_op_is_skipped(state):
+    state.set("taken", 1)
+    batch = state.pipeline()
+    assert batch.set_nx("taken", 2).incr("rl", limit=0).set("free", 3).execute() == [1, 1, None]
+    assert batch.applied is True
+    assert (state.get("taken"), state.get("rl"), state.get("free")) == (1, None, 3)
+
+
+def test_ttl_expires_and_incr_keeps_its_window(state):
+    state.incr("rl", ttl=30)
+    state.clock_.now += 20
+    assert state.incr("rl", ttl=30) == 2
+    state.clock_.now += 11
+    # النافذة بدأت عند الإنشاء: انتهت بعد 30 ثانية وليس بعد آخر incr
+    assert state.get("rl") is None
+    assert state.set_nx("rl", "new", ttl=5) is None
+    assert state.get("rl") == "new"
+
+
+def test_decr_never_creates_or_goes_negative(state):
+    assert state.decr("missing") is None
+    assert state.get("missing") is None
+    state.incr("rl", ttl=30)
+    assert state.decr("rl") == 0
+    assert state.decr("rl") == 0
+    state.clock_.now += 31
+    assert state.decr("rl") is None
+    assert state.get("rl") is None
+
+
+def test_sqlite_state_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "state.db")
+    a, b = SqliteState(path), SqliteState(path)
+    assert a.set_nx("inbound:SM1", ["ok", 200], ttl=60) is None
+    assert b.set_nx("inbound:SM1", ["again", 200], ttl=60) == ["ok", 200]
+    a.incr("rl")
+    assert b.incr("rl") == 2
+    a.close()
+    b.close()
+
+
+LIMITS = parse_limits({"rate_limits": {
+    "sender": {"cooldown": 60},
+    "group": {"per_minute": 6, "burst": 2},
+}})
+
+
+def take(state, now, sender="whatsapp:+1", group="g1"):
+    batch = state.pipeline(all_or_nothing=True)
+    checks = limit_ops(batch, LIMITS, sender, group, now)
+    return batch, checks, blocked_by(checks, batch.execute())
+
+
+def test_refund_gives_back_cooldown_and_window_token(state):
+    now = 1000.0
+    batch, checks, blocked = take(state, now)
+    assert blocked is None
+    assert take(state, now)[2] == "sender"
+    undo = state.pipeline()
+    refund_ops(undo, batch, checks)
+    undo.execute()
+    assert take(state, now)[2] is None
+    assert take(state, now, "whatsapp:+2")[2] is None
+    assert take(state, now, "whatsapp:+3")[2] == "group"
+
+
+def test_refund_on_expired_window_grants_no_extra_token(state):
+    now = 1000.0
+    batch, checks, blocked = take(state, now)
+    assert blocked is None
+    # الإرسال تأخر حتى انتهت نافذة الـ rate ومهلة المرسل
+    state.clock_.now += 61
+    undo = state.pipeline()
+    refund_ops(undo, batch, checks)
+    undo.execute()
+    window_key = batch.ops[checks[-1][1]][1]
+    assert state.get(window_key) is None
+    # لا عداد -1: النافذة تسمح بـ burst ردود فقط
+    allowed = [take(state, now, f"whatsapp:+{i}")[2] for i in range(4)]
+    assert allowed == [None, None, "group", "group"]
+
+
+def test_in_process_refund_restores_token_and_cooldown():
+    limiter = RateLimiter()
+    assert limiter.check(LIMITS, "whatsapp:+1", "g1", now=100.0) is None
+    assert limiter.check(LIMITS, "whatsapp:+1", "g1", now=101.0) == "sender"
+    limiter.refund(LIMITS, "whatsapp:+1", "g1")
+    assert limiter.check(LIMITS, "whatsapp:+1", "g1", now=101.0) is None
+    assert limiter.check(LIMITS, "whatsapp:+2", "g1", now=101.0) is None
+    assert limiter.check(LIMITS, "whatsapp:+3", "g1", now=101.0) == "group"
@@ -0,0 +1,120 @@
+import json
+import threading
+
+import pytest
+
+from send_queue import SendQueue
+from twilio_stub import start_stub
+from twilio_transport import make_twilio_client
+
+FROM = "whatsapp:+14155238886"
+
+
+class Rejected(Exception):
+    status = 400
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = start_stub(fail_first=2)
+    monkeypatch.setenv("TWILIO_API_BASE_URL", server.base_url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub):
+    return make_twilio_client("AC00000000000000000000000000000000", "token", {"twilio_pool_size": 2})
+
+
+def make_outbox(send, tmp_path, **kwargs):
+    options = dict(workers=2, retries=3, base_delay=0.01, max_delay=0.02,
+                   dead_letter_path=str(tmp_path / "dead_letters.jsonl"))
+    options.update(kwargs)
+    return SendQueue(send, **options)
+
+
+def dead_letters(tmp_path):
+    path = tmp_path / "dead_letters.jsonl"
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_sends_through_the_pooled_client(stub, client, tmp_path):
+    outbox = make_outbox(client.send, tmp_path)
+    for i in range(20):
+        assert outbox.submit(body=f"رد {i}", from_=FROM, to=f"whatsapp:+1{i:010d}")
+    assert outbox.join(timeout=10)
+    assert outbox.sent == 20 and outbox.failed == 0
+    assert sorted(m["body"] for m in stub.state.messages) == sorted(f"رد {i}" for i in range(20))
+    # keep-alive: الاتصالات لا تزيد عن حجم الـ pool
+    stats = client.stats.snapshot()
+    assert stats["requests"] == 20 and stats["connections"] <= 2
+    assert stub.state.connections <= 2
+
+
+@pytest.mark.parametrize("to", ["whatsapp:+5000000001", "whatsapp:+4290000001"])
+def test_retries_server_errors_and_rate_limits(stub, client, tmp_path, to):
+    outbox = make_outbox(client.send, tmp_path)
+    assert outbox.submit(body="مرحبا", from_=FROM, to=to)
+    assert outbox.join(timeout=10)
+    assert stub.state.attempts[to] == 3
+    assert outbox.sent == 1 and outbox.failed == 0
+    assert [m["to"] for m in stub.state.messages] == [to]
+    assert dead_letters(tmp_path) == []
+
+
+def test_dead_letter_after_max_attempts(stub, client, tmp_path):
+    stub.state.fail_first = 10
+    outbox = make_outbox(client.send, tmp_path)
+    assert outbox.submit(body="مرحبا", from_=FROM, to="whatsapp:+5000000002")
+    assert outbox.join(timeout=10)
+    assert stub.state.attempts["whatsapp:+5000000002"] == 3
+    assert outbox.sent == 0 and outbox.failed == 1
+    [entry] = dead_letters(tmp_path)
+    assert entry["attempts"] == 3 and entry["status"] == 500
+    assert entry["message"]["to"] == "whatsapp:+5000000002"
+    assert list(outbox.dead_letters) == [entry]
+
+
+def test_permanent_error_is_not_retried(stub, client, tmp_path):
+    outbox = make_outbox(client.send, tmp_path)
+    assert outbox.submit(body="مرحبا", from_=FROM, to="whatsapp:+4000000001")
+    assert outbox.join(timeout=10)
+    assert stub.state.attempts["whatsapp:+4000000001"] == 1
+    [entry] = dead_letters(tmp_path)
+    assert entry["attempts"] == 1 and entry["status"] == 400
+
+
+def test_submit_returns_false_when_the_queue_is_full(stub, client, tmp_path):
+    release = threading.Event()
+
+    def slow_send(**message):
+        release.wait()
+        return client.send(**message)
+
+    outbox = make_outbox(slow_send, tmp_path, workers=1, maxsize=3)
+    accepted = 0
+    while outbox.submit(body="مرحبا", from_=FROM, to=f"whatsapp:+1{accepted:010d}"):
+        accepted += 1
+        assert accepted <= 4
+    assert outbox.pending() == 3
+    release.set()
+    assert outbox.join(timeout=10)
+    assert outbox.sent == accepted == len(stub.state.messages)
+    assert outbox.submit(body="مرحبا", from_=FROM, to="whatsapp:+19999999999")
+
+
+def test_totals_are_exact_with_many_workers():
+    def send(to, **_):
+        if to.endswith("7"):
+            raise Rejected("invalid number")
+
+    outbox = SendQueue(send, workers=16, maxsize=100_000)
+    for i in range(20_000):
+        assert outbox.submit(body="x", from_="whatsapp:+1", to=f"whatsapp:+{i}")
+    assert outbox.join(timeout=30)
+    assert outbox.failed == 2_000
+    assert outbox.sent == 18_000
@@ -0,0 +1,149 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import wa_browser
+import wa_ingest
+from wa_ingest import MessageFeed, send_message
+from conftest import ROOT
+from whatsapp_stub import FakeDriver
+
+SUPPORT = "120363000000000001@g.us"
+SALES = "120363000000000002@g.us"
+KHALED = "201000000004@c.us"
+
+
+def texts(messages):
+    return [m["text"] for m in messages]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_scripts_are_valid_webdriver_bodies():
+    # execute_script يرسل النص كجسم دالة: return و arguments مسموحان
+    scripts = {name: getattr(wa_ingest, name) for name in ("OBSERVER_JS", "DRAIN_JS", "SCAN_JS", "OPEN_JS", "SEND_JS")}
+    scripts["READY_JS"] = wa_browser.READY_JS
+    check = ("const s = " + json.dumps(scripts) + ";"
+             "for (const k in s) { try { new Function(s[k]); } catch (e) { console.log(k + ': ' + e.message); } }")
+    out = subprocess.run(["node", "-e", check], capture_output=True, text=True, check=True).stdout
+    assert out == ""
+
+
+def test_poll_returns_each_message_once_and_skips_own_replies(tmp_path):
+    driver = FakeDriver()
+    driver.receive(SUPPORT, "Sara", "قبل التثبيت")
+    feed = MessageFeed(driver, str(tmp_path / "state.json"))
+    assert feed.install() == []
+
+    driver.receive(SUPPORT, "Sara", "مرحبا")
+    driver.receive(SUPPORT, "Ali", "مساعدة")
+    batch = feed.poll()
+    assert texts(batch) == ["مرحبا", "مساعدة"]
+    assert batch[0]["sender"] == "Sara" and batch[0]["group"] and batch[0]["chat"] == SUPPORT
+    for _ in batch:
+        assert send_message(driver, "تفضل")
+    assert feed.poll() == []
+    assert driver.sent == [(SUPPORT, "تفضل"), (SUPPORT, "تفضل")]
+
+
+def test_reload_reinstalls_the_observer(tmp_path):
+    driver = FakeDriver()
+    feed = MessageFeed(driver, str(tmp_path / "state.json"))
+    feed.install()
+    driver.receive(SUPPORT, "Sara", "1")
+    assert texts(feed.poll()) == ["1"]
+    driver.get("https://web.whatsapp.com")
+    driver.receive(SUPPORT, "Sara", "2")
+    # بعد التحميل يضيع الطابور: poll يعيد التثبيت ويأخذ ما بعد الـ watermark
+    assert texts(feed.poll()) == ["2"]
+    assert feed.poll() == []
+
+
+def test_restart_replies_to_offline_messages_once(tmp_path):
+    state = str(tmp_path / "state.json")
+    driver = FakeDriver()
+    feed = MessageFeed(driver, state)
+    feed.install()
+    driver.receive(SUPPORT, "Sara", "1")
+    assert texts(feed.poll()) == ["1"]
+
+    # البوت متوقف: رسائل جديدة، ثم تشغيل بنفس ملف الحالة
+    driver.receive(SUPPORT, "Sara", "2")
+    driver.receive(SUPPORT, "Ali", "3")
+    assert texts(MessageFeed(driver, state).install()) == ["2", "3"]
+    assert MessageFeed(driver, state).install() == []
+
+
+def test_missing_watermark_treats_visible_history_as_read(tmp_path):
+    driver = FakeDriver()
+    driver.receive(SUPPORT, "Sara", "قديمة")
+    (tmp_path / "state.json").write_text('{"%s": "false_gone"}' % SUPPORT, encoding="utf-8")
+    assert MessageFeed(driver, str(tmp_path / "state.json")).install() == []
+
+
+def test_scan_reports_unread_chats_and_open_reads_them(tmp_path):
+    driver = FakeDriver()
+    feed = MessageFeed(driver, str(tmp_path / "state.json"))
+    feed.install()
+    driver.receive(SALES, "Ali", "1")
+    driver.receive(SALES, "Ali", "2")
+    driver.receive(KHALED, "Khaled", "3")
+    chats, messages = feed.scan()
+    assert messages == []
+    assert [(c["chat"], c["unread"], c["group"]) for c in wa_ingest.order_chats(chats)] == [
+        (SALES, 2, True), (KHALED, 1, False)]
+    assert [c["chat"] for c in wa_ingest.order_chats(chats, [{"id": KHALED, "name": ""}])] == [KHALED, SALES]
+
+    assert feed.open_chat(wa_ingest.order_chats(chats)[0])
+    chats, messages = feed.scan()
+    assert texts(messages) == ["1", "2"] and messages[0]["chat_title"] == "Sales team"
+    assert [c["chat"] for c in chats] == [KHALED]
+    assert feed.open_chat({"title": "لا توجد", "unread": 1}) is False
+
+
+def test_message_arriving_right_after_open_does_not_hide_unread_history(tmp_path):
+    # بدون watermark يُعتبر آخر <غير المقروء> من التاريخ جديداً؛ رسالة تصل بين
+    # الفتح والـ scan التالي ليست من التاريخ فلا تدفع رسالة غير مقروءة خارج العد
+    driver = FakeDriver()
+    driver.receive(KHALED, "Khaled", "قديمة")
+    feed = MessageFeed(driver, str(tmp_path / "state.json"))
+    feed.install()
+    driver.chats[KHALED]["unread"] = 0
+    driver.receive(KHALED, "Khaled", "1")
+    chats, _ = feed.scan()
+    feed.open_chat(chats[0])
+    driver.receive(KHALED, "Khaled", "2")
+    assert texts(feed.scan()[1]) == ["1", "2"]
+
+
+def test_reply_to_another_chat_does_not_repeat_its_history(tmp_path):
+    driver = FakeDriver()
+    feed = MessageFeed(driver, str(tmp_path / "state.json"))
+    feed.install()
+    driver.receive(SALES, "Ali", "1")
+    chats, _ = feed.scan()
+    feed.open_chat(chats[0])
+    assert texts(feed.scan()[1]) == ["1"]
+
+    # wa_pool يفتح المحادثة للرد بـ unread=0، ثم يعود
+    assert feed.open_chat({"title": "مجموعة الدعم", "unread": 0})
+    send_message(driver, "تفضل")
+    assert feed.open_chat({"title": "Sales team", "unread": 0})
+    driver.receive(SALES, "Ali", "2")
+    assert texts(feed.scan()[1]) == ["2"]
+    # فتح المحادثة المفتوحة أصلاً لا يعيد عرض شيء
+    assert feed.open_chat({"title": "Sales team", "unread": 0})
+    assert feed.scan()[1] == []
+
+
+def test_bench_ingest_runs_on_fake_driver():
+    proc = subprocess.run([sys.executable, os.path.join(ROOT, "benchmarks", "bench_ingest.py"),
+                           "--fake", "--rounds", "60", "--burst", "4", "--seed", "3"],
+                          capture_output=True, text=True, check=True)
+    lines = proc.stdout.splitlines()
+    batched = next(line for line in lines if "batched scan" in line)
+    assert " 0 missed" in batched and " 0 processed again" in batched
+    assert "(ok)" in next(line for line in lines if line.startswith("restart"))
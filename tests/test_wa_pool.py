@@ -0,0 +1,84 @@
+import time
+from functools import partial
+
+from wa_pool import BrowserPool, chat_shard
+from whatsapp_stub import DEFAULT_CHATS, fake_session
+
+KEYWORD = "مساعدة"
+CHATS = list(DEFAULT_CHATS)
+
+
+def decide(msg):
+    return ["تفضل"] if KEYWORD in msg["text"] else []
+
+
+def traffic(count, seconds, offset=0):
+    # رسائل موزعة على المحادثات الثلاث بعد بدء الجلسات
+    return [(seconds * i / count, CHATS[(i + offset) % len(CHATS)], "User", f"msg {i} {KEYWORD}")
+            for i in range(count)]
+
+
+def run_pool(specs, done, tmp_path, timeout=30.0):
+    sent = []
+    pool = BrowserPool(specs, decide, state_dir=str(tmp_path), heartbeat_timeout=5.0,
+                       on_sent=lambda name, payload: sent.append((name, payload)))
+    pool.start()
+    try:
+        deadline = time.monotonic() + timeout
+        while not done(pool, sent) and time.monotonic() < deadline:
+            pool.supervise_once()
+            time.sleep(0.05)
+    finally:
+        pool.stop()
+    return pool, sent
+
+
+def test_dispatcher_replies_to_each_message_once(tmp_path):
+    start = time.time() + 1.5
+    specs = [{"name": f"s{i}", "factory": partial(fake_session, traffic(12, 1.0, i), start)} for i in range(2)]
+    pool, sent = run_pool(specs, lambda pool, sent: len(sent) >= 24, tmp_path)
+    replies = [(name, p["message_id"]) for name, p in sent]
+    assert len(replies) == len(set(replies)) == 24
+    assert {name for name, _ in replies} == {"s0", "s1"}
+    assert pool.stats["messages"] == pool.stats["replies"] == pool.stats["sent"] == 24
+    assert pool.restarts == {"s0": 0, "s1": 0}
+
+
+def test_crashed_session_resumes_from_its_watermark(tmp_path):
+    start = time.time() + 1.5
+    messages = traffic(30, 3.0)
+    specs = [{"name": "s0", "factory": partial(fake_session, messages, start, 0.0, 40)}]
+
+    before_crash = []
+
+    def done(pool, sent):
+        if pool.restarts["s0"] and not before_crash:
+            # انهيار واحد يكفي: الإعادة التالية بدون crash_after
+            pool.sessions["s0"]["factory"] = partial(fake_session, messages, start)
+            before_crash.append(len(sent))
+        return any(p["message_id"].split("_")[2] == "FAKE29" for _, p in sent)
+
+    pool, sent = run_pool(specs, done, tmp_path)
+    assert pool.restarts["s0"] == 1
+    assert 0 < before_crash[0] < 30
+    ids = [p["message_id"] for _, p in sent]
+    assert len(ids) == len(set(ids))
+    # الـ watermark يُحفظ قبل الرد: الانهيار قد يفوّت رداً لكنه لا يكرره، وما
+    # وصل بعد الإعادة يُرد عليه كله
+    assert len(ids) >= 25
+    assert (tmp_path / "ingest_state.s0.json").exists()
+
+
+def test_shard_chats_splits_one_account_between_sessions(tmp_path):
+    start = time.time() + 1.5
+    messages = traffic(18, 1.0)
+    specs = [{"name": f"s{i}", "factory": partial(fake_session, messages, start), "shard": (i, 2)}
+             for i in range(2)]
+    pool, sent = run_pool(specs, lambda pool, sent: len(sent) >= 18, tmp_path)
+    ids = [p["message_id"] for _, p in sent]
+    assert len(ids) == len(set(ids)) == 18
+    for name, payload in sent:
+        assert chat_shard(payload["chat_title"], 2) == int(name[1:])
+    titles = {DEFAULT_CHATS[jid] for jid in CHATS}
+    owners = {chat_shard(title, 2) for title in titles}
+    assert owners == {0, 1}, "the default chats should land on both shards"
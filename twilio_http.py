@@ -0,0 +1,73 @@
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+from twilio.http.response import Response
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from twilio_transport import TransportStats
+
+# ---------------------------
+# HTTP clients لـ Twilio (pool ثابت الحجم، أو HTTP/2 عبر httpx)
+# ---------------------------
+# تستورد twilio و requests، فلا تُحمّل إلا عند أول إرسال (twilio_transport.py)
+
+
+def _counting(pool_cls, stats):
+    class CountingPool(pool_cls):
+        def _new_conn(self):
+            stats.connect()
+            return super()._new_conn()
+    return CountingPool
+
+
+class PooledAdapter(HTTPAdapter):
+    def __init__(self, stats, pool_size):
+        self.stats = stats
+        super().__init__(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting(HTTPConnectionPool, self.stats),
+            "https": _counting(HTTPSConnectionPool, self.stats),
+        }
+
+
+class PooledHttpClient(TwilioHttpClient):
+    def __init__(self, pool_size=8, timeout=10.0, stats=None):
+        super().__init__(pool_connections=True, timeout=timeout)
+        self.stats = stats or TransportStats()
+        adapter = PooledAdapter(self.stats, pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, *args, **kwargs):
+        self.stats.request()
+        return super().request(*args, **kwargs)
+
+
+class Http2Client(TwilioHttpClient):
+    # نفس واجهة TwilioHttpClient لكن عبر httpx مع HTTP/2
+    def __init__(self, pool_size=8, timeout=10.0, stats=None):
+        import httpx
+        super().__init__(pool_connections=False, timeout=timeout)
+        self.stats = stats or TransportStats()
+        self.client = httpx.Client(
+            http2=True,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    def _trace(self, event, info):
+        if event == "connection.connect_tcp.complete":
+            self.stats.connect()
+
+    def request(self, method, url, params=None, data=None, headers=None, auth=None,
+                timeout=None, allow_redirects=False):
+        self.stats.request()
+        resp = self.client.request(
+            method.upper(), url, params=params, data=data, headers=headers, auth=auth,
+            timeout=timeout if timeout is not None else self.timeout,
+            follow_redirects=allow_redirects, extensions={"trace": self._trace},
+        )
+        self._test_only_last_response = Response(resp.status_code, resp.text, resp.headers)
+        return self._test_only_last_response
@@ -0,0 +1,123 @@
+import argparse
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+# ---------------------------
+# سيرفر محلي يقلّد Twilio Messages API
+# ---------------------------
+# يكفي لتجربة الإرسال (SendQueue، اتصالات keep-alive) بدون حساب Twilio:
+#   python twilio_stub.py --port 8099
+#   TWILIO_API_BASE_URL=http://127.0.0.1:8099 python app2.py
+#
+# أرقام خاصة في To لتجربة الأخطاء:
+#   whatsapp:+400...  -> 400 دائماً (خطأ نهائي)
+#   whatsapp:+500...  -> 500 لأول fail_first محاولة ثم ينجح
+#   whatsapp:+429...  -> 429 (Too Many Requests) لأول fail_first محاولة ثم ينجح
+
+MESSAGES_PATH = re.compile(r"^/2010-04-01/Accounts/([^/]+)/Messages\.json$")
+
+
+class StubState:
+    def __init__(self, delay=0.0, fail_first=2):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.messages = []
+        self.attempts = {}
+        self.connections = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def record(self, to):
+        with self._lock:
+            n = self.attempts.get(to, 0) + 1
+            self.attempts[to] = n
+            return n
+
+    def next_sid(self):
+        return "SM%032x" % next(self._ids)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive مثل api.twilio.com
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.state._lock:
+            self.server.state.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        state = self.server.state
+        length = int(self.headers.get("Content-Length") or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+        m = MESSAGES_PATH.match(self.path)
+        if not m:
+            return self._reply(404, {"code": 20404, "message": "The requested resource was not found", "status": 404})
+        if state.delay:
+            time.sleep(state.delay)
+
+        to = form.get("To", "")
+        attempt = state.record(to)
+        if not to or to.startswith("whatsapp:+400"):
+            return self._reply(400, {"code": 21211, "message": f"The 'To' number {to} is not valid.", "status": 400})
+        if to.startswith("whatsapp:+500") and attempt <= state.fail_first:
+            return self._reply(500, {"code": 20500, "message": "Internal Server Error", "status": 500})
+        if to.startswith("whatsapp:+429") and attempt <= state.fail_first:
+            return self._reply(429, {"code": 20429, "message": "Too Many Requests", "status": 429})
+
+        msg = {
+            "sid": state.next_sid(),
+            "account_sid": m.group(1),
+            "from": form.get("From"),
+            "to": to,
+            "body": form.get("Body"),
+            "status": "queued",
+            "num_segments": "1",
+            "direction": "outbound-api",
+            "api_version": "2010-04-01",
+            "uri": f"/2010-04-01/Accounts/{m.group(1)}/Messages.json",
+        }
+        with state._lock:
+            state.messages.append(msg)
+        self._reply(201, msg)
+
+
+def start_stub(host="127.0.0.1", port=0, **kwargs):
+    # يشغّل السيرفر في thread ويعيده مع عنوانه
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.base_url = "http://%s:%d" % server.server_address[:2]
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Twilio Messages API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+    srv = start_stub(args.host, args.port, delay=args.delay)
+    print("🧪 Twilio stub:", srv.base_url)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,98 @@
+import os
+import threading
+
+# ---------------------------
+# اتصال Twilio: pool ثابت الحجم مع keep-alive
+# ---------------------------
+# الإرسال المتتابع يعيد استخدام نفس الاتصالات بدل فتح TCP + TLS لكل رسالة.
+# HTTP/2 يحتاج httpx[http2]؛ إن لم تكن مثبتة نبقى على HTTP/1.1 keep-alive.
+#
+# الإعدادات من config.json أو البيئة:
+#   twilio_pool_size / TWILIO_POOL_SIZE   عدد الاتصالات المفتوحة (افتراضي 8)
+#   twilio_timeout   / TWILIO_TIMEOUT     مهلة كل طلب بالثواني (افتراضي 10)
+#   twilio_http2     / TWILIO_HTTP2       1 لتجربة HTTP/2
+#   TWILIO_API_BASE_URL                   لتوجيه الطلبات لسيرفر محلي (twilio_stub.py)
+#
+# twilio و requests لا تُستورد هنا: make_twilio_client يعيد LazyClient يبني
+# Client الحقيقي (twilio_http.py) عند أول إرسال، فالعمليات التي ترد بـ TwiML
+# فقط أو تعرض لوحة التحكم تبدأ بدونها.
+
+
+class TransportStats:
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def request(self):
+        with self._lock:
+            self.requests += 1
+
+    def connect(self):
+        with self._lock:
+            self.connections += 1
+
+    def snapshot(self):
+        reused = max(self.requests - self.connections, 0)
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "reused": reused,
+            "reuse_ratio": reused / self.requests if self.requests else 0.0,
+        }
+
+
+def _setting(cfg, key, default):
+    value = os.environ.get(key.upper())
+    if value is None:
+        value = cfg.get(key, default)
+    return value
+
+
+def make_http_client(cfg=None, stats=None):
+    from twilio_http import Http2Client, PooledHttpClient
+    cfg = cfg or {}
+    pool_size = int(_setting(cfg, "twilio_pool_size", 8))
+    timeout = float(_setting(cfg, "twilio_timeout", 10))
+    if str(_setting(cfg, "twilio_http2", "")).lower() in ("1", "true", "yes"):
+        try:
+            import h2  # noqa: F401 (httpx يحتاجها لـ HTTP/2)
+            return Http2Client(pool_size, timeout, stats)
+        except ImportError:
+            print("⚠️ HTTP/2 يحتاج httpx[http2]، سيتم استخدام HTTP/1.1")
+    return PooledHttpClient(pool_size, timeout, stats)
+
+
+class LazyClient:
+    # نفس واجهة twilio Client؛ يُبنى عند أول وصول لأي خاصية (أول إرسال)
+    def __init__(self, build):
+        self._build = build
+        self._client = None
+        self._lock = threading.Lock()
+        # متاحة قبل البناء (metrics.watch_outbound)
+        self.stats = TransportStats()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._build(self.stats)
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def send(self, **message):
+        # للـ SendQueue بدل twilio_client.messages.create (الذي يبني Client فوراً)
+        return self.client.messages.create(**message)
+
+
+def make_twilio_client(account_sid, auth_token, cfg=None):
+    def build(stats):
+        from twilio.rest import Client
+        client = Client(account_sid, auth_token, http_client=make_http_client(cfg, stats))
+        if os.environ.get("TWILIO_API_BASE_URL"):
+            client.api.base_url = os.environ["TWILIO_API_BASE_URL"]
+        return client
+    return LazyClient(build)
@@ -0,0 +1,141 @@
+import json
+import os
+import time
+
+from config_cache import write_config
+
+# ---------------------------
+# تشغيل Chrome لواتساب ويب بسرعة
+# ---------------------------
+# - مسار chromedriver يُحفظ في .chromedriver.json بعد أول تنزيل، فلا يتصل
+#   ChromeDriverManager بالشبكة في كل تشغيل (أو حدده مباشرة: CHROMEDRIVER=/path)
+# - مجلد user-data-dir ثابت (chrome_profile/) يحفظ جلسة واتساب كاملة بدل
+#   cookies.json، فلا حاجة لمسح QR بعد أول مرة
+# - بدل sleep ثابت ننتظر جاهزية الصفحة فعلاً مع فحص يتباعد تدريجياً
+#
+#   driver, kind, timings = start_browser()
+#   print(startup_report(kind, timings))   # warm أو cold مع زمن كل مرحلة
+
+WHATSAPP_URL = "https://web.whatsapp.com"
+DRIVER_CACHE = ".chromedriver.json"
+PROFILE_DIR = "chrome_profile"
+
+# "ready" بعد تسجيل الدخول، "qr" إذا كانت الصفحة تنتظر المسح، "" أثناء التحميل
+READY_JS = r"""
+if (document.querySelector('#pane-side')) return 'ready';
+if (document.querySelector('canvas[aria-label], div[data-ref]')) return 'qr';
+return '';
+"""
+
+
+class Backoff:
+    # فترة انتظار تبدأ قصيرة وتتضاعف حتى maximum؛ reset() عند وجود عمل
+    def __init__(self, initial=0.1, maximum=3.0, factor=1.5):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.delay = initial
+
+    def reset(self):
+        self.delay = self.initial
+
+    def step(self):
+        # يعيد الانتظار الحالي ويضاعف التالي
+        delay = self.delay
+        self.delay = min(self.maximum, self.delay * self.factor)
+        return delay
+
+    def wait(self):
+        time.sleep(self.step())
+
+
+def wait_until(check, timeout, initial=0.05, maximum=1.0):
+    # يعيد أول قيمة truthy من check()، أو TimeoutError بعد timeout ثانية
+    backoff = Backoff(initial, maximum)
+    deadline = time.monotonic() + timeout
+    while True:
+        value = check()
+        if value:
+            return value
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"not ready after {timeout:g}s")
+        backoff.wait()
+
+
+def resolve_driver(cache_path=DRIVER_CACHE):
+    # يعيد (المسار، المصدر): env أو cached أو downloaded
+    path = os.environ.get("CHROMEDRIVER")
+    if path:
+        return path, "env"
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            path = json.load(f)["path"]
+    except (OSError, ValueError, KeyError):
+        path = None
+    if path and os.access(path, os.X_OK):
+        return path, "cached"
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    write_config(cache_path, {"path": path, "resolved_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+    return path, "downloaded"
+
+
+def chrome_options(profile_dir=PROFILE_DIR, headless=True):
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
+    return options
+
+
+def start_browser(profile_dir=PROFILE_DIR, headless=True, url=WHATSAPP_URL,
+                  load_timeout=60, qr_timeout=120, cache_path=DRIVER_CACHE):
+    # يعيد (driver، "warm" أو "cold"، أزمنة المراحل بالثواني)
+    # selenium يُستورد هنا فقط، فـ Backoff و wait_until تعمل بدونه (wa_pool، FakeDriver)
+    from selenium import webdriver
+    from selenium.common.exceptions import SessionNotCreatedException
+    from selenium.webdriver.chrome.service import Service
+
+    timings = {}
+    warm_profile = os.path.isdir(profile_dir) and bool(os.listdir(profile_dir))
+
+    t = time.perf_counter()
+    path, source = resolve_driver(cache_path)
+    timings["driver"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    try:
+        driver = webdriver.Chrome(service=Service(path), options=chrome_options(profile_dir, headless))
+    except SessionNotCreatedException:
+        if source != "cached":
+            raise
+        # Chrome تحدّث والـ driver المحفوظ قديم: نزّل المناسب مرة واحدة
+        os.remove(cache_path)
+        path, source = resolve_driver(cache_path)
+        driver = webdriver.Chrome(service=Service(path), options=chrome_options(profile_dir, headless))
+    timings["chrome"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    driver.get(url)
+    state = wait_until(lambda: driver.execute_script(READY_JS), load_timeout)
+    timings["page"] = time.perf_counter() - t
+
+    if state == "qr":
+        print(f"🔑 امسح QR Code من الهاتف (حتى {qr_timeout} ثانية)...")
+        t = time.perf_counter()
+        wait_until(lambda: driver.execute_script(READY_JS) == "ready", qr_timeout, maximum=2.0)
+        timings["login"] = time.perf_counter() - t
+        print("✅ تم تسجيل الدخول، الجلسة محفوظة في", profile_dir)
+
+    kind = "warm" if warm_profile and source != "downloaded" and state == "ready" else "cold"
+    return driver, kind, timings
+
+
+def startup_report(kind, timings):
+    parts = "، ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items())
+    return f"⏱️ تشغيل {kind}: {parts} (المجموع {sum(timings.values()):.1f} s)"
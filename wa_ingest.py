@@ -0,0 +1,285 @@
+import json
+import os
+from collections import deque
+
+from config_cache import write_config
+
+# ---------------------------
+# استقبال رسائل واتساب ويب بدون مسح الصفحة كل مرة
+# ---------------------------
+# بدلاً من find_elements("span.selectable-text") كل 3 ثوانٍ (ثم قراءة آخر
+# رسالة فقط) نحقن MutationObserver في الصفحة يضع كل رسالة جديدة في طابور
+# داخل المتصفح، ثم نسحب الطابور كله بطلب WebDriver واحد.
+#
+# كل رسالة لها data-id ثابت من واتساب: "<fromMe>_<chat>_<msgId>[_<participant>]"
+# آخر رسالة معالجة لكل محادثة (watermark) تُحفظ في ingest_state.json قبل
+# الرد عليها، فإعادة تشغيل البوت لا تكرر الرد (على الأكثر مرة واحدة).
+#
+#   feed = MessageFeed(driver)
+#   for msg in feed.install():   # ما وصل بعد آخر watermark أثناء توقف البوت
+#       ...
+#   while True:
+#       chats, messages = feed.scan()   # طلب واحد: المحادثات غير المقروءة + الرسائل الجديدة
+#       for msg in messages:
+#           msg["id"], msg["chat"], msg["chat_title"], msg["group"], msg["sender"], msg["text"]
+#       if chats:
+#           feed.open_chat(order_chats(chats)[0])   # تُقرأ رسائلها في الدورة التالية
+#
+# واتساب يعرض رسائل المحادثة المفتوحة فقط، فالمحادثات الأخرى تُعرف من عداد
+# غير المقروء في القائمة الجانبية وتُفتح واحدة كل دورة حسب الأولوية.
+
+STATE_FILE = "ingest_state.json"
+
+_PARSE_JS = r"""
+function __waParse(row) {
+  var id = row.getAttribute('data-id');
+  if (!id) return null;
+  var parts = id.split('_');
+  var textEl = row.querySelector('span.selectable-text');
+  var meta = row.querySelector('[data-pre-plain-text]');
+  var title = document.querySelector('header span[title]');
+  var author = meta ? meta.getAttribute('data-pre-plain-text')
+      .replace(/^\[[^\]]*\]\s*/, '').replace(/:\s*$/, '') : '';
+  return {
+    id: id,
+    chat: parts[1] || '',
+    from_me: parts[0] === 'true',
+    group: /@g\.us$/.test(parts[1] || ''),
+    chat_title: title ? title.getAttribute('title') : '',
+    sender: author,
+    text: textEl ? textEl.innerText : ''
+  };
+}
+function __waRows(node) {
+  if (node.nodeType !== 1) return [];
+  if (node.hasAttribute('data-id')) return [node];
+  return Array.prototype.slice.call(node.querySelectorAll('[data-id]'));
+}
+"""
+
+# arguments[0] = {chat: آخر id معالج}؛ يعيد الرسائل الموجودة بعد الـ watermark
+OBSERVER_JS = _PARSE_JS + r"""
+var marks = arguments[0] || {};
+if (window.__waObserver) window.__waObserver.disconnect();
+var seen = {};
+var backlog = [];
+var byChat = {};
+__waRows(document.body).forEach(function (row) {
+  var m = __waParse(row);
+  if (!m) return;
+  seen[m.id] = 1;
+  (byChat[m.chat] = byChat[m.chat] || []).push(m);
+});
+Object.keys(byChat).forEach(function (chat) {
+  // بدون watermark أو إذا لم يعد ظاهراً نعتبر كل الموجود قديماً
+  var rows = byChat[chat];
+  for (var i = 0; i < rows.length; i++) {
+    if (rows[i].id === marks[chat]) {
+      backlog = backlog.concat(rows.slice(i + 1));
+      break;
+    }
+  }
+});
+window.__waQueue = [];
+window.__waObserver = new MutationObserver(function (mutations) {
+  // أول رسائل تظهر في المحادثة التي فتحها OPEN_JS هي تاريخها وليست رسائل وصلت الآن
+  var opened = window.__waOpened;
+  var header = document.querySelector('header span[title]');
+  var history = !!opened && !!header && header.getAttribute('title') === opened;
+  var rendered = false;
+  for (var i = 0; i < mutations.length; i++) {
+    var added = mutations[i].addedNodes;
+    for (var j = 0; j < added.length; j++) {
+      var rows = __waRows(added[j]);
+      for (var k = 0; k < rows.length; k++) {
+        var m = __waParse(rows[k]);
+        if (!m) continue;
+        rendered = true;
+        if (!seen[m.id]) {
+          seen[m.id] = 1;
+          if (history) m.history = true;
+          window.__waQueue.push(m);
+        }
+      }
+    }
+  }
+  if (history && rendered) window.__waOpened = null;
+});
+window.__waObserver.observe(document.body, {childList: true, subtree: true});
+return backlog;
+"""
+
+# null إذا أعيد تحميل الصفحة (ضاع الـ observer) فنعيد التثبيت
+DRAIN_JS = r"""
+var q = window.__waQueue;
+if (!q) return null;
+window.__waQueue = [];
+return q;
+"""
+
+# المحادثات التي فيها عداد غير مقروء + تفريغ الطابور، في طلب واحد
+SCAN_JS = r"""
+var q = window.__waQueue;
+if (!q) return null;
+window.__waQueue = [];
+var chats = [];
+var items = document.querySelectorAll('#pane-side [role="listitem"]');
+for (var i = 0; i < items.length; i++) {
+  var badge = items[i].querySelector('span[aria-label*="unread"]');
+  if (!badge) continue;
+  var title = items[i].querySelector('span[title]');
+  var jid = items[i].getAttribute('data-chat') || '';
+  chats.push({
+    title: title ? title.getAttribute('title') : '',
+    chat: jid,
+    group: /@g\.us$/.test(jid) || !!items[i].querySelector('span[data-icon="default-group"]'),
+    unread: parseInt(badge.textContent, 10) || 1
+  });
+}
+return {chats: chats, messages: q};
+"""
+
+# واتساب يفتح المحادثة على mousedown وليس click. يعيد عداد غير المقروء لحظة
+# الفتح (قد يزيد عن آخر scan)، أو null إذا لم توجد المحادثة.
+# __waOpened: الـ observer يعلّم أول عرض لرسائلها بـ history
+OPEN_JS = r"""
+var items = document.querySelectorAll('#pane-side [role="listitem"]');
+for (var i = 0; i < items.length; i++) {
+  var title = items[i].querySelector('span[title]');
+  if (title && title.getAttribute('title') === arguments[0]) {
+    var badge = items[i].querySelector('span[aria-label*="unread"]');
+    var unread = badge ? (parseInt(badge.textContent, 10) || 1) : 0;
+    var header = document.querySelector('header span[title]');
+    // المحادثة المفتوحة أصلاً لا يُعاد عرضها
+    if (!header || header.getAttribute('title') !== arguments[0]) window.__waOpened = arguments[0];
+    ['mousedown', 'mouseup', 'click'].forEach(function (type) {
+      items[i].dispatchEvent(new MouseEvent(type, {bubbles: true, cancelable: true, view: window}));
+    });
+    return unread;
+  }
+}
+return null;
+"""
+
+# كتابة الرد والضغط على إرسال في طلب واحد بدل find_element + send_keys + click
+SEND_JS = r"""
+var box = document.querySelector("div[title='Type a message']") ||
+    document.querySelector('footer div[contenteditable="true"]');
+if (!box) return false;
+box.focus();
+document.execCommand('insertText', false, arguments[0]);
+// زر الإرسال يظهر بعد كتابة النص
+var btn = document.querySelector("span[data-icon='send']");
+if (!btn) return false;
+(btn.closest('button') || btn).click();
+return true;
+"""
+
+
+def order_chats(chats, preferred=()):
+    # المحادثات المذكورة في preferred أولاً وبنفس ترتيبها، ثم الأكثر رسائل غير مقروءة
+    # preferred: أسماء/معرفات، أو عناصر allowed_groups بصيغة {"id", "name"}
+    rank = {}
+    for i, entry in enumerate(preferred):
+        names = (entry.get("id"), entry.get("name")) if isinstance(entry, dict) else (entry,)
+        for name in names:
+            if name:
+                rank.setdefault(name, i)
+    last = len(preferred)
+    return sorted(chats, key=lambda c: (min(rank.get(c["title"], last), rank.get(c["chat"], last)), -c["unread"]))
+
+
+def send_message(driver, text):
+    return driver.execute_script(SEND_JS, text)
+
+
+class MessageFeed:
+    def __init__(self, driver, state_path=STATE_FILE, remember=5000):
+        self.driver = driver
+        self.state_path = state_path
+        self.watermarks = self._load()
+        # ids معالجة حديثاً، لأن إعادة التثبيت أو تمرير المحادثة يعيد عرض رسائل قديمة
+        self._recent = deque(maxlen=remember)
+        self._recent_ids = set()
+        # محادثات فُتحت للتو: عنوان المحادثة -> عدد غير المقروء فيها
+        self._opening = {}
+        self.calls = 0  # عدد طلبات WebDriver
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError:
+            return {}
+
+    def install(self):
+        self.calls += 1
+        return self._accept(self.driver.execute_script(OBSERVER_JS, self.watermarks) or [])
+
+    def poll(self):
+        self.calls += 1
+        batch = self.driver.execute_script(DRAIN_JS)
+        if batch is None:
+            return self.install()
+        return self._accept(batch)
+
+    def scan(self):
+        self.calls += 1
+        result = self.driver.execute_script(SCAN_JS)
+        if result is None:
+            return [], self.install()
+        return result["chats"], self._accept(result["messages"])
+
+    def open_chat(self, chat):
+        self.calls += 1
+        unread = self.driver.execute_script(OPEN_JS, chat["title"])
+        if unread is None:
+            return False
+        self._opening[chat["title"]] = max(unread, chat["unread"])
+        return True
+
+    def _history(self, batch):
+        # فتح محادثة يعرض تاريخها كله كعناصر جديدة (history)؛ الجديد فعلاً هو ما بعد
+        # الـ watermark، أو آخر <عدد غير المقروء> إذا لم يكن الـ watermark ظاهراً.
+        # ما وصل بعد الفتح (بدون history) جديد دائماً ولا يدخل في هذا العد
+        rows = {}
+        for msg in batch:
+            if msg.get("history") and msg["chat_title"] in self._opening:
+                rows.setdefault(msg["chat_title"], []).append(msg)
+        old = set()
+        for title, msgs in rows.items():
+            unread = self._opening.pop(title)
+            ids = [m["id"] for m in msgs]
+            mark = self.watermarks.get(msgs[0]["chat"])
+            if mark in ids:
+                keep = ids.index(mark) + 1
+            elif mark in self._recent_ids:
+                # الـ observer رأى الـ watermark سابقاً فلا يعيده؛ كل ما بعده جديد
+                keep = 0
+            else:
+                keep = max(0, len(ids) - unread)
+            old.update(ids[:keep])
+        return old
+
+    def _accept(self, batch):
+        old = self._history(batch) if self._opening else ()
+        fresh = []
+        for msg in batch:
+            if msg["id"] in self._recent_ids:
+                continue
+            if len(self._recent) == self._recent.maxlen:
+                self._recent_ids.discard(self._recent[0])
+            self._recent.append(msg["id"])
+            self._recent_ids.add(msg["id"])
+            if msg.get("from_me"):
+                continue
+            # الـ watermark رسالة واردة فقط؛ ردودنا قد لا تظهر في تاريخ جهاز آخر
+            self.watermarks[msg["chat"]] = msg["id"]
+            if msg["id"] not in old:
+                fresh.append(msg)
+        if batch:
+            # يُحفظ قبل الرد: الانهيار بعد هذه النقطة يفوّت رداً ولا يكرره
+            write_config(self.state_path, self.watermarks)
+        return fresh
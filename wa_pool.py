@@ -0,0 +1,216 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+
+from wa_browser import Backoff
+from wa_ingest import MessageFeed, order_chats, send_message
+
+# ---------------------------
+# عدة جلسات متصفح في عمليات منفصلة (app4)
+# ---------------------------
+# كل جلسة عملية مستقلة لها Chrome و user-data-dir خاص بها، وتقرأ رسائلها
+# بـ MessageFeed ثم ترسلها للـ dispatcher في العملية الرئيسية. الـ dispatcher
+# وحده يملك قواعد الرد وحدود الردود (RateLimiter واحد لكل الجلسات)، ويرد على
+# الجلسة بأمر "reply" أو "open".
+#
+#   "browser_sessions": [{"name": "a", "profile": "chrome_profile/a"},
+#                        {"name": "b", "profile": "chrome_profile/b"}],
+#   "shard_chats": false
+#
+# حسابات مختلفة: كل جلسة ترد على محادثات حسابها. shard_chats=true: نفس
+# الحساب مربوط على عدة أجهزة، وكل محادثة تتبع جلسة واحدة حسب crc32(العنوان).
+#
+# الجلسة التي تنتهي عمليتها أو تتوقف نبضاتها تُعاد (بانتظار يتضاعف حتى 30
+# ثانية)، وملف ingest_state.<name>.json يمنع تكرار الرد بعد الإعادة.
+#
+# رسائل العمال للـ dispatcher (طابور واحد): (النوع، الجلسة، البيانات)
+#   ready / heartbeat / message / unread / sent
+# أوامر الـ dispatcher للعامل (طابور لكل جلسة): (الأمر، البيانات)
+#   reply {"chat_title", "text", "message_id"} / open {chat أو None} / stop
+
+HEARTBEAT = 1.0
+
+
+def chat_shard(title, count):
+    return zlib.crc32(title.encode("utf-8")) % count
+
+
+def chrome_session(profile_dir):
+    # factory الجلسات الحقيقية؛ selenium يُستورد داخل العملية الفرعية فقط
+    from wa_browser import start_browser, startup_report
+    driver, kind, timings = start_browser(profile_dir)
+    print(f"[{os.path.basename(os.path.normpath(profile_dir))}]", startup_report(kind, timings))
+    return driver
+
+
+def worker_main(name, factory, shard, inbound, commands, state_path):
+    driver = factory()
+    feed = MessageFeed(driver, state_path)
+    if shard is None:
+        owns = lambda title: True  # noqa: E731
+    else:
+        owns = lambda title: chat_shard(title, shard[1]) == shard[0]  # noqa: E731
+    inbound.put(("ready", name, os.getpid()))
+
+    pending, unread = feed.install(), []
+    current = None   # عنوان المحادثة المفتوحة
+    asked = False    # أرسلنا قائمة غير المقروء وننتظر أمر "open"
+    idle = Backoff(0.05, 1.0)
+    beat = 0.0
+    while True:
+        busy = bool(pending)
+        for msg in pending:
+            current = msg["chat_title"] or current
+            if owns(msg["chat_title"]):
+                inbound.put(("message", name, msg))
+
+        while True:
+            try:
+                cmd, payload = commands.get_nowait()
+            except queue.Empty:
+                break
+            busy = True
+            if cmd == "stop":
+                driver.quit()
+                return
+            if cmd == "open":
+                asked = False
+                if payload and payload["title"] != current:
+                    feed.open_chat(payload)
+                    current = payload["title"]
+            elif cmd == "reply":
+                if payload["chat_title"] != current:
+                    feed.open_chat({"title": payload["chat_title"], "unread": 0})
+                    current = payload["chat_title"]
+                send_message(driver, payload["text"])
+                inbound.put(("sent", name, payload))
+
+        owned = [c for c in unread if owns(c["title"])]
+        if owned and not asked:
+            inbound.put(("unread", name, owned))
+            asked = busy = True
+
+        now = time.monotonic()
+        if now - beat >= HEARTBEAT:
+            inbound.put(("heartbeat", name, None))
+            beat = now
+        if busy:
+            idle.reset()
+        idle.wait()
+        unread, pending = feed.scan()
+
+
+class BrowserPool:
+    def __init__(self, sessions, decide, choose_chat=None, state_dir=".",
+                 startup_timeout=300.0, heartbeat_timeout=30.0, on_sent=None):
+        # sessions: [{"name", "factory", "shard": (index, count) أو None}]
+        # decide(msg) -> قائمة نصوص الرد، choose_chat(chats) -> محادثة أو None
+        self.ctx = multiprocessing.get_context("spawn")
+        self.inbound = self.ctx.Queue()
+        self.sessions = {s["name"]: s for s in sessions}
+        self.decide = decide
+        self.choose_chat = choose_chat or (lambda chats: order_chats(chats)[0] if chats else None)
+        self.on_sent = on_sent
+        self.state_dir = state_dir
+        self.startup_timeout = startup_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.procs = {}
+        self.commands = {}
+        self.last_seen = {}
+        self.ready = set()
+        self.started_at = {}
+        self.restart_at = {}
+        self.restarts = {name: 0 for name in self.sessions}
+        self._backoff = {name: Backoff(1.0, 30.0, 2.0) for name in self.sessions}
+        self.stats = {"messages": 0, "replies": 0, "sent": 0}
+        self.running = False
+        self._dispatcher = None
+
+    def _spawn(self, name):
+        session = self.sessions[name]
+        commands = self.ctx.Queue()
+        state_path = os.path.join(self.state_dir, f"ingest_state.{name}.json")
+        proc = self.ctx.Process(
+            target=worker_main, name=f"wa-{name}", daemon=True,
+            args=(name, session["factory"], session.get("shard"), self.inbound, commands, state_path),
+        )
+        proc.start()
+        self.procs[name] = proc
+        self.commands[name] = commands
+        self.ready.discard(name)
+        self.started_at[name] = self.last_seen[name] = time.monotonic()
+
+    def start(self):
+        self.running = True
+        for name in self.sessions:
+            self._spawn(name)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="wa-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch(self):
+        while self.running:
+            try:
+                kind, name, payload = self.inbound.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.last_seen[name] = time.monotonic()
+            commands = self.commands.get(name)
+            if kind == "message":
+                self.stats["messages"] += 1
+                for text in self.decide(payload):
+                    commands.put(("reply", {"chat_title": payload["chat_title"], "text": text,
+                                            "message_id": payload["id"]}))
+                    self.stats["replies"] += 1
+            elif kind == "unread":
+                commands.put(("open", self.choose_chat(payload)))
+            elif kind == "sent":
+                self.stats["sent"] += 1
+                if self.on_sent:
+                    self.on_sent(name, payload)
+            elif kind == "ready":
+                self.ready.add(name)
+                print(f"✅ جلسة {name} جاهزة (pid {payload})")
+
+    def supervise_once(self):
+        now = time.monotonic()
+        for name, proc in list(self.procs.items()):
+            if name in self.restart_at:
+                if now >= self.restart_at[name]:
+                    del self.restart_at[name]
+                    self._spawn(name)
+                continue
+            limit = self.heartbeat_timeout if name in self.ready else self.startup_timeout
+            if proc.is_alive() and now - self.last_seen[name] <= limit:
+                if now - self.started_at[name] > 60:
+                    self._backoff[name].reset()
+                continue
+            if proc.is_alive():
+                proc.kill()
+            proc.join(5)
+            self.restarts[name] += 1
+            delay = self._backoff[name].step()
+            self.restart_at[name] = now + delay
+            print(f"⚠️ جلسة {name} توقفت (exit {proc.exitcode})، إعادة تشغيل بعد {delay:.0f} ثانية")
+
+    def run(self):
+        self.start()
+        try:
+            while self.running:
+                self.supervise_once()
+                time.sleep(0.5)
+        finally:
+            self.stop()
+
+    def stop(self, timeout=5.0):
+        if not self.running:
+            return
+        self.running = False
+        for commands in self.commands.values():
+            commands.put(("stop", None))
+        for proc in self.procs.values():
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.kill()
@@ -0,0 +1,134 @@
+import os
+import time
+
+from wa_ingest import DRAIN_JS, OBSERVER_JS, OPEN_JS, SCAN_JS, SEND_JS
+
+# ---------------------------
+# driver وهمي يقلّد واتساب ويب (بدون Chrome ولا حساب)
+# ---------------------------
+# يفهم نفس السكربتات التي يرسلها wa_ingest عبر execute_script (observer،
+# scan، فتح محادثة، إرسال) ويطبقها على محادثات في الذاكرة، فيمكن تجربة
+# MessageFeed و wa_pool كاملين:
+#
+#   traffic = [(0.5, "120363000000000001@g.us", "Sara", "أحتاج مساعدة"), ...]
+#   driver = FakeDriver(traffic, start=time.time(), latency=0.02)
+#
+# الرسالة تصل عند start + أول رقم، فإعادة إنشاء الـ driver بنفس start
+# (بعد انهيار worker مثلاً) تجد ما وصل سابقاً في التاريخ كما في واتساب.
+# latency: زمن كل طلب WebDriver، crash_after: ينهي العملية بعد عدد من الطلبات.
+
+DEFAULT_CHATS = {
+    "120363000000000001@g.us": "مجموعة الدعم",
+    "120363000000000002@g.us": "Sales team",
+    "201000000004@c.us": "Khaled",
+}
+
+
+class FakeDriver:
+    def __init__(self, traffic=(), start=None, latency=0.0, crash_after=None, chats=None):
+        self.traffic = sorted(traffic, key=lambda t: t[0])
+        self.start = time.time() if start is None else start
+        self.latency = latency
+        self.crash_after = crash_after
+        self.calls = 0
+        self.sent = []
+        self.titles = dict(chats or DEFAULT_CHATS)
+        self.chats = {jid: {"messages": [], "unread": 0} for jid in self.titles}
+        self.open = next(iter(self.titles))
+        self.queue = None  # None حتى يُحقن الـ observer، كما بعد تحميل الصفحة
+        self.seen = set()
+        self._next = 0
+        self._sends = 0
+        self._deliver()
+
+    # ---- الصفحة ----
+
+    def _row(self, jid, m, history=False):
+        row = {
+            "id": m["id"], "chat": jid, "from_me": m["out"], "group": jid.endswith("@g.us"),
+            "chat_title": self.titles[self.open], "sender": m["author"], "text": m["text"],
+        }
+        if history:
+            row["history"] = True
+        return row
+
+    def _show(self, jid, m, history=False):
+        if self.queue is not None and m["id"] not in self.seen:
+            self.seen.add(m["id"])
+            self.queue.append(self._row(jid, m, history))
+
+    def _deliver(self):
+        now = time.time() - self.start
+        while self._next < len(self.traffic) and self.traffic[self._next][0] <= now:
+            _, jid, author, text = self.traffic[self._next]
+            suffix = "_201000000009@c.us" if jid.endswith("@g.us") else ""
+            m = {"id": f"false_{jid}_FAKE{self._next}{suffix}", "author": author, "text": text, "out": False}
+            self._next += 1
+            self.chats[jid]["messages"].append(m)
+            if jid == self.open:
+                self._show(jid, m)
+            else:
+                self.chats[jid]["unread"] += 1
+
+    def receive(self, jid, author, text):
+        # رسالة فورية (للتجارب اليدوية)
+        self.traffic.insert(self._next, (time.time() - self.start, jid, author, text))
+        self._deliver()
+
+    # ---- واجهة WebDriver ----
+
+    def get(self, url):
+        self.queue = None
+
+    def quit(self):
+        pass
+
+    def execute_script(self, script, *args):
+        self.calls += 1
+        if self.crash_after is not None and self.calls >= self.crash_after:
+            os._exit(3)
+        if self.latency:
+            time.sleep(self.latency)
+        self._deliver()
+
+        if script is OBSERVER_JS:
+            marks = args[0] if args else {}
+            rows = self.chats[self.open]["messages"]
+            self.seen = {m["id"] for m in rows}
+            ids = [m["id"] for m in rows]
+            mark = marks.get(self.open)
+            backlog = rows[ids.index(mark) + 1:] if mark in ids else []
+            self.queue = []
+            return [self._row(self.open, m) for m in backlog]
+        if script is DRAIN_JS or script is SCAN_JS:
+            if self.queue is None:
+                return None
+            batch, self.queue = self.queue, []
+            if script is DRAIN_JS:
+                return batch
+            unread = [{"title": self.titles[jid], "chat": jid, "group": jid.endswith("@g.us"), "unread": c["unread"]}
+                      for jid, c in self.chats.items() if c["unread"]]
+            return {"chats": unread, "messages": batch}
+        if script is OPEN_JS:
+            for jid, title in self.titles.items():
+                if title == args[0]:
+                    unread, self.chats[jid]["unread"] = self.chats[jid]["unread"], 0
+                    if jid != self.open:
+                        self.open = jid
+                        for m in self.chats[jid]["messages"]:
+                            self._show(jid, m, history=True)
+                    return unread
+            return None
+        if script is SEND_JS:
+            self._sends += 1
+            m = {"id": f"true_{self.open}_FAKES{self._sends}", "author": "Bot", "text": args[0], "out": True}
+            self.chats[self.open]["messages"].append(m)
+            self._show(self.open, m)
+            self.sent.append((self.open, args[0]))
+            return True
+        raise NotImplementedError("FakeDriver does not understand this script")
+
+
+def fake_session(traffic=(), start=None, latency=0.0, crash_after=None, chats=None):
+    # factory للـ BrowserPool (دالة على مستوى الوحدة حتى تنتقل للعملية الفرعية)
+    return FakeDriver(traffic, start, latency, crash_after, chats)